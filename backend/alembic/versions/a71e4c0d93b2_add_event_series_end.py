@@ -0,0 +1,75 @@
+"""add event series_end
+
+Revision ID: a71e4c0d93b2
+Revises: 3f1c2a9b7d10
+Create Date: 2022-11-16 10:41:09.275104
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+from app.models.event import get_series_end
+from app.schemas.recurrence import RecurrenceSchema
+
+# revision identifiers, used by Alembic.
+revision = "a71e4c0d93b2"
+down_revision = "3f1c2a9b7d10"
+branch_labels = None
+depends_on = None
+
+event = sa.table(
+    "event",
+    sa.column("id", sa.BigInteger),
+    sa.column("start", sa.DateTime(timezone=True)),
+    sa.column("duration_minutes", sa.Integer),
+    sa.column("recurrence", postgresql.JSONB),
+    sa.column("series_end", sa.DateTime(timezone=True)),
+)
+
+
+def upgrade():
+    op.add_column(
+        "event", sa.Column("series_end", sa.DateTime(timezone=True), nullable=True)
+    )
+    op.create_index(op.f("ix_event_series_end"), "event", ["series_end"], unique=False)
+
+    # single events end with their only occurrence, API stores them as JSON null
+    op.execute(
+        event.update()
+        .where(
+            event.c.recurrence.is_(None)
+            | (sa.func.jsonb_typeof(event.c.recurrence) == "null")
+        )
+        .values(
+            series_end=event.c.start
+            + sa.func.make_interval(0, 0, 0, 0, 0, event.c.duration_minutes)
+        )
+    )
+
+    # finite series have `count` or `until`, infinite ones are left NULL
+    description = event.c.recurrence["description"]
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(
+            event.c.id, event.c.start, event.c.duration_minutes, event.c.recurrence
+        ).where(
+            description["count"].astext.isnot(None)
+            | description["until"].astext.isnot(None)
+        )
+    )
+    for id_, start, duration_minutes, recurrence in rows:
+        connection.execute(
+            event.update()
+            .where(event.c.id == id_)
+            .values(
+                series_end=get_series_end(
+                    start, duration_minutes, RecurrenceSchema.parse_obj(recurrence)
+                )
+            )
+        )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_event_series_end"), table_name="event")
+    op.drop_column("event", "series_end")
@@ -0,0 +1,26 @@
+"""add user calendar_version
+
+Revision ID: c5d2e8f41a67
+Revises: a71e4c0d93b2
+Create Date: 2022-11-18 14:02:37.512093
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c5d2e8f41a67"
+down_revision = "a71e4c0d93b2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "users",
+        sa.Column("calendar_version", sa.Integer(), server_default="0", nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column("users", "calendar_version")
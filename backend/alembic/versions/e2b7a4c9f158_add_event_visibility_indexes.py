@@ -0,0 +1,35 @@
+"""add event visibility indexes
+
+Revision ID: e2b7a4c9f158
+Revises: c5d2e8f41a67
+Create Date: 2022-11-21 11:17:45.830216
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e2b7a4c9f158"
+down_revision = "c5d2e8f41a67"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_event_owner_id_start", "event", ["owner_id", "start"], unique=False
+    )
+    op.create_index(
+        "ix_event_invite_user_id_event_id_accepted",
+        "event_invite",
+        ["user_id", "event_id"],
+        unique=False,
+        postgresql_where=sa.text("is_accepted"),
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_event_invite_user_id_event_id_accepted", table_name="event_invite"
+    )
+    op.drop_index("ix_event_owner_id_start", table_name="event")
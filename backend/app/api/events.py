@@ -1,27 +1,47 @@
-from typing import Any, Optional
+import itertools
+from typing import Any, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
 from pydantic.error_wrappers import ErrorWrapper
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio.session import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 
+from app.api.responses import FastJSONResponse
+from app.core.config import settings
 from app.deps.db import get_async_session
 from app.deps.users import current_user
 from app.models import EventInvite
 from app.models.event import Event
 from app.models.user import User
 from app.schemas.event import (
+    AgendaRequestSchema,
+    AgendaResponseSchema,
+    CompactEventListResponseSchema,
     EventCreateSchema,
     EventInviteSchema,
     EventListRequestSchema,
     EventListResponseSchema,
     EventSchema,
+    IntervalSchema,
     InviteUpdateSchema,
 )
-from app.schemas.free_spot import FindFreeSpotRequestParams, FindFreeSpotResponse
+from app.schemas.free_spot import (
+    AvailabilityHeatmapRequestParams,
+    AvailabilityHeatmapResponse,
+    FindFreeSpotBatchRequest,
+    FindFreeSpotBatchResponse,
+    FindFreeSpotRequestParams,
+    FindFreeSpotResponse,
+    FreeBusyRequestParams,
+    FreeBusyResponse,
+)
+from app.services import calendar_version, occurrences
+from app.services.busy_cache import busy_cache
 from app.services.event import EventService
+from app.services.free_spot import merge_busy_intervals
 
 router = APIRouter(prefix="/events")
 
@@ -66,7 +86,8 @@ async def create_event(
 
     await validate_user_ids(item_in.invitee_ids, session, "invitee_ids")
 
-    event_kwargs = {**item_in.dict(), "owner_id": user.id}
+    # keep recurrence a model, `dict()` would convert it to dict too
+    event_kwargs = {**dict(item_in), "owner_id": user.id}
     invitee_ids = event_kwargs.pop("invitee_ids")
     event = Event(**event_kwargs)
 
@@ -77,7 +98,14 @@ async def create_event(
     ]
 
     session.add(event)
+    if occurrences.is_enabled():
+        await session.flush()
+        await occurrences.write_occurrences(session, event, occurrences.get_horizon())
+    # invites are not accepted yet, only owner lists the event
+    await calendar_version.bump(session, {user.id})
     await session.commit()
+    # invites are not accepted yet, only owner becomes busy
+    busy_cache.invalidate_event(event, {user.id})
     # TODO: there should be a better way to do it other than `event.__dict__`
     return event
 
@@ -95,23 +123,146 @@ async def find_free_spot(
     - **before**: end time of interval to search
     - **duration_minutes**: event duration
     - **user_ids**: list of user ids to check for availability
+    - **max_results**: number of earliest non-overlapping spots to return
+    - **min_gap_minutes**: minimal gap between end of one spot and start of the next one
+    - **granularity_minutes**: search resolution, spots start at multiples of it
+    - **working_hours**: working hours in local timezone applied to all users
+    - **user_working_hours**: working hours of specific users, override **working_hours**
+    - **optional_user_ids**: list of user ids of optional attendees
+    - **min_available**: minimal number of free attendees, required ones from
+    **user_ids** must be free anyway, optional ones are not needed by default
 
 
     - **before** must be greater than **after** + **duration_minutes**
     - **after** and **before** must not include seconds and milliseconds, must include timezone info
 
+    **timeslot** is the earliest spot, **timeslots** are all spots found.
+    """
+    await validate_user_ids(
+        request_params.user_ids | request_params.optional_user_ids,
+        session,
+        "user_ids",
+    )
+
+    # `dict()` keeps nested working hours as hashable models
+    timeslots = await event_service.find_event_spots(**dict(request_params))
+    return {"timeslot": timeslots[0] if timeslots else None, "timeslots": timeslots}
+
+
+@router.post(
+    "/find-free-spot/batch", response_model=FindFreeSpotBatchResponse, status_code=200
+)
+async def find_free_spot_batch(
+    request_params: FindFreeSpotBatchRequest,
+    event_service: EventService = Depends(EventService),
+    session: AsyncSession = Depends(get_async_session),
+) -> Any:
+    """
+    Run several find free spot queries at once:
+
+    - **queries**: list of find free spot queries, see `find_free_spot`
+
+    Events of all users are loaded once, results are returned in **queries** order.
+    """
+    user_ids = set().union(
+        *(query.user_ids | query.optional_user_ids for query in request_params.queries)
+    )
+    await validate_user_ids(user_ids, session, "queries")
+
+    results = await event_service.find_event_spots_batch(
+        [dict(query) for query in request_params.queries]
+    )
+    return {
+        "results": [
+            {"timeslot": timeslots[0] if timeslots else None, "timeslots": timeslots}
+            for timeslots in results
+        ]
+    }
+
+
+@router.post(
+    "/availability-heatmap",
+    response_model=AvailabilityHeatmapResponse,
+    status_code=200,
+)
+async def get_availability_heatmap(
+    request_params: AvailabilityHeatmapRequestParams,
+    event_service: EventService = Depends(EventService),
+    session: AsyncSession = Depends(get_async_session),
+) -> Any:
+    """
+    Count free users in every slot of interval:
+
+    - **after**: start time of interval
+    - **before**: end time of interval
+    - **user_ids**: list of user ids
+    - **granularity_minutes**: slot length
+    - **working_hours**: working hours in local timezone applied to all users
+    - **user_working_hours**: working hours of specific users, override **working_hours**
+
+    **available** has number of users free for the whole slot, slot i starts at
+    **origin** + i * **granularity_minutes**. Users are not free outside working hours.
     """
     await validate_user_ids(request_params.user_ids, session, "user_ids")
 
-    timeslot = await event_service.find_event_spot(**request_params.dict())
-    return {"timeslot": timeslot}
+    origin, available = await event_service.get_availability_heatmap(
+        **dict(request_params)
+    )
+    return {
+        "origin": origin,
+        "granularity_minutes": request_params.granularity_minutes,
+        "available": available,
+    }
 
 
-@router.get("", response_model=EventListResponseSchema)
+@router.post("/free-busy", response_model=FreeBusyResponse, status_code=200)
+async def get_free_busy(
+    request_params: FreeBusyRequestParams,
+    event_service: EventService = Depends(EventService),
+    session: AsyncSession = Depends(get_async_session),
+) -> Any:
+    """
+    Get busy intervals of users:
+
+    - **after**: start time of interval
+    - **before**: end time of interval
+    - **user_ids**: list of user ids
+    - **merge_users**: return intervals when any of users is busy instead of per user ones
+
+    Intervals are sorted, do not overlap or touch and are clipped to **after**-**before**.
+    **busy_by_user** has intervals of every user, **busy** has merged intervals
+    if **merge_users** is set.
+    """
+    await validate_user_ids(request_params.user_ids, session, "user_ids")
+
+    busy_by_user = await event_service.get_busy_intervals(
+        request_params.user_ids, request_params.after, request_params.before
+    )
+
+    def to_schema(intervals):
+        return [{"start": start, "end": end} for start, end in intervals]
+
+    if request_params.merge_users:
+        busy = merge_busy_intervals(itertools.chain(*busy_by_user.values()))
+        return {"busy": to_schema(busy)}
+
+    return {
+        "busy_by_user": {
+            user_id: to_schema(intervals) for user_id, intervals in busy_by_user.items()
+        }
+    }
+
+
+@router.get(
+    "",
+    response_model=Union[EventListResponseSchema, CompactEventListResponseSchema],
+)
 async def get_events(
+    response: Response,
     request_params: EventListRequestSchema = Depends(),
     session: AsyncSession = Depends(get_async_session),
     user: User = Depends(current_user),
+    if_none_match: Optional[str] = Header(None),
 ) -> Any:
     """
     List events for current user.
@@ -121,23 +272,118 @@ async def get_events(
 
     Response is paginated. To request next batch use offset provided in response.
     offset=null means there are no more events.
+
+    **occurrence_format=compact** returns occurrences as the first start and
+    minute offsets from it, see `CompactOccurrencesSchema.to_datetimes` to decode them.
+
+    Response has `ETag`, unchanged events are not sent again if it is in `If-None-Match`.
     """
+    etag = calendar_version.make_etag(
+        user.id, user.calendar_version, request_params.json()
+    )
+    if calendar_version.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    # one more event tells if there is the next page
     events_with_occurrences = await EventService().list_events_for_user(
         user_id=user.id,
         after=request_params.after,
         before=request_params.before,
         event_id_gt=request_params.offset,
+        limit=request_params.limit + 1,
+        occurrence_format=request_params.occurrence_format,
     )
 
-    events_with_occurrences = sorted(events_with_occurrences, key=lambda e: e.id)
-
     offset_is_needed = len(events_with_occurrences) > request_params.limit
     events_with_occurrences = events_with_occurrences[: request_params.limit]
 
-    return {
+    content = {
         "events_with_occurrences": events_with_occurrences,
         "offset": events_with_occurrences[-1].id if offset_is_needed else None,
     }
+    if settings.EVENTS_FAST_JSON_RESPONSE:
+        # events are already built from response schemas, skip validating them again
+        return FastJSONResponse(content, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return content
+
+
+@router.get("/agenda", response_model=AgendaResponseSchema)
+async def get_agenda(
+    response: Response,
+    request_params: AgendaRequestSchema = Depends(),
+    user: User = Depends(current_user),
+    if_none_match: Optional[str] = Header(None),
+) -> Any:
+    """
+    List occurrences of events for current user in chronological order.
+
+    - **before** must be greater than **after**
+    - **after** and **before** must not include seconds and milliseconds, must include timezone info
+
+    Occurrences are ordered by start and event id, **events** are events of
+    returned occurrences. To request next batch pass **cursor** of response as
+    **cursor_start** and **cursor_event_id**. cursor=null means there are no more occurrences.
+
+    Response has `ETag`, unchanged agenda is not sent again if it is in `If-None-Match`.
+    """
+    etag = calendar_version.make_etag(
+        "agenda", user.id, user.calendar_version, request_params.json()
+    )
+    if calendar_version.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    cursor = None
+    if request_params.cursor_start is not None:
+        cursor = (request_params.cursor_start, request_params.cursor_event_id)
+
+    # one more occurrence tells if there is the next page
+    agenda = await EventService().list_agenda_for_user(
+        user_id=user.id,
+        after=request_params.after,
+        before=request_params.before,
+        limit=request_params.limit + 1,
+        cursor=cursor,
+    )
+
+    cursor_is_needed = len(agenda) > request_params.limit
+    occurrences = [
+        {"start": start, "event_id": event.id}
+        for start, event in agenda[: request_params.limit]
+    ]
+    events = {event.id: event for _, event in agenda[: request_params.limit]}
+
+    response.headers["ETag"] = etag
+    return {
+        "occurrences": occurrences,
+        "events": sorted(events.values(), key=lambda e: e.id),
+        "cursor": occurrences[-1] if cursor_is_needed else None,
+    }
+
+
+@router.get("/stream")
+async def stream_events(
+    request_params: IntervalSchema = Depends(),
+    user: User = Depends(current_user),
+) -> Any:
+    """
+    Stream all events for current user as newline delimited JSON.
+
+    - **before** must be greater than **after**
+    - **after** and **before** must not include seconds and milliseconds, must include timezone info
+
+    Each line is an event with occurrences, same as in `events_with_occurrences` of
+    `GET /events`. Events are ordered by id and sent as soon as they are expanded.
+    """
+    events_with_occurrences = EventService().stream_events_for_user(
+        user_id=user.id, after=request_params.after, before=request_params.before
+    )
+
+    async def lines():
+        async for event in events_with_occurrences:
+            yield event.json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.patch("/{event_id}/invite", response_model=EventInviteSchema)
@@ -160,15 +406,37 @@ async def accept_event(
 
     invite.is_accepted = invite_in.is_accepted
     session.add(invite)
+    event = await session.get(Event, event_id, options=[selectinload(Event.invites)])
+    # invites are a part of the event, it changes for everyone listing it
+    await calendar_version.bump(
+        session, calendar_version.get_viewer_ids(event) | {user.id}
+    )
     await session.commit()
+    busy_cache.invalidate_event(event, {user.id})
     return invite
 
 
 @router.get("/{event_id}", response_model=EventSchema)
 async def get_event(
     event_id: int,
+    response: Response,
     session: AsyncSession = Depends(get_async_session),
+    if_none_match: Optional[str] = Header(None),
 ) -> Any:
+    """
+    Get event by id.
+
+    Response has `ETag`, unchanged event is not sent again if it is in `If-None-Match`.
+    """
+    # every change of event bumps calendar version of its owner
+    version = await calendar_version.get_event_version(session, event_id)
+    if version is None:
+        raise HTTPException(404)
+
+    etag = calendar_version.make_etag(event_id, version)
+    if calendar_version.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
     event: Optional[Event] = (
         await session.scalars(
             select(Event)
@@ -179,6 +447,7 @@ async def get_event(
     if not event:
         raise HTTPException(404)
 
+    response.headers["ETag"] = etag
     return event
 
 
@@ -188,11 +457,16 @@ async def delete_event(
     session: AsyncSession = Depends(get_async_session),
     user: User = Depends(current_user),
 ) -> Any:
-    item: Optional[Event] = await session.get(Event, event_id)
+    item: Optional[Event] = await session.get(
+        Event, event_id, options=[selectinload(Event.invites)]
+    )
 
     if not item or item.owner_id != user.id:
         raise HTTPException(404)
 
+    busy_user_ids = calendar_version.get_viewer_ids(item)
     await session.delete(item)
+    await calendar_version.bump(session, busy_user_ids)
     await session.commit()
+    busy_cache.invalidate_event(item, busy_user_ids)
     return {"success": True}
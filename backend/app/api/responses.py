@@ -0,0 +1,28 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def encode_default(obj: Any) -> Any:
+    """Convert objects orjson does not support natively, same way `jsonable_encoder` does."""
+    if isinstance(obj, BaseModel):
+        # nested models are passed to `encode_default` again
+        return dict(obj)
+    if isinstance(obj, (set, frozenset)):
+        # response model validation rebuilds sets from their items, it may change order
+        return list(type(obj)(list(obj)))
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson.
+
+    Output is byte-compatible with `JSONResponse` of FastAPI, but content is not
+    validated against `response_model`, so it must be built from response schemas.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=encode_default)
@@ -1,5 +1,5 @@
 import sys
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from dateutil.relativedelta import relativedelta
 from pydantic import BaseSettings, HttpUrl, PostgresDsn, validator
@@ -29,6 +29,41 @@ class Settings(BaseSettings):
 
     MAX_INTERVAL_DURATION_MINUTES = 60 * 24 * 90
 
+    # see `app.services.free_spot.FREE_SPOT_FINDERS`
+    FREE_SPOT_STRATEGY: Literal["bitarray", "interval", "lazy"] = "bitarray"
+    # see `app.services.spot_search.SEARCH_BACKENDS`
+    FREE_SPOT_SEARCH_BACKEND: Literal["loop", "runs", "shift"] = "runs"
+    # default resolution of free spot search, spots are aligned to it
+    FREE_SPOT_GRANULARITY_MINUTES: int = 1
+    # size of window chunk "lazy" free spot strategy advances by
+    FREE_SPOT_LAZY_CHUNK_MINUTES: int = 60 * 24
+    # number of (user, day) busy bitmaps cached in process, 0 disables cache,
+    # see `app.services.busy_cache.BusyBitmapCache` before enabling it
+    BUSY_CACHE_MAX_ENTRIES: int = 0
+    # number of compiled working hours masks cached in process
+    WORKING_HOURS_MASK_CACHE_SIZE: int = 1024
+    # number of worker processes free spot search is offloaded to, 0 runs it in the
+    # event loop, see `app.services.executor`
+    FREE_SPOT_EXECUTOR_WORKERS: int = 0
+    # number of compiled recurrence rules cached in process, 0 disables cache
+    RRULE_CACHE_MAX_ENTRIES: int = 4096
+    # number of distinct values of `PydanticType` columns parsed and cached in process
+    PYDANTIC_TYPE_CACHE_SIZE: int = 4096
+    # days ahead occurrences of events are materialized in `event_occurrence` table
+    # (for example 180), 0 disables materialization, see `app.services.occurrences`
+    OCCURRENCE_HORIZON_DAYS: int = 0
+    # how often materialized occurrences are extended to the horizon, 0 disables it
+    OCCURRENCE_MAINTENANCE_INTERVAL_SECONDS: int = 60 * 60
+    # number of events loaded at once when listing events without limit
+    EVENT_LIST_BATCH_SIZE: int = 100
+    # number of events fetched from the cursor at once when streaming events
+    EVENT_STREAM_BATCH_SIZE: int = 100
+    # encode events list with orjson, skipping response model validation
+    EVENTS_FAST_JSON_RESPONSE: bool = False
+    # expand events of free spot search in batch with NumPy,
+    # see `app.services.occurrence_batch`
+    FREE_SPOT_COLUMNAR_EXPANSION: bool = False
+
     @validator("DATABASE_URL", pre=True)
     def build_test_database_url(cls, v: Optional[str], values: Dict[str, Any]):
         """Overrides DATABASE_URL with TEST_DATABASE_URL in test environment."""
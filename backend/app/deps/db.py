@@ -1,10 +1,13 @@
+import functools
 import json
 from typing import AsyncGenerator, Generator
 
 import sqlalchemy.dialects.postgresql
+import sqlalchemy.types
 from pydantic.json import pydantic_encoder
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
+from app.core.config import settings
 from app.db import SessionLocal, async_session_maker
 
 
@@ -24,29 +27,45 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
         await session.close()
 
 
-class PydanticType(sqlalchemy.dialects.postgresql.JSONB):
+class PydanticType(sqlalchemy.types.TypeDecorator):
     """Pydantic type.
     SAVING:
-    - Uses SQLAlchemy JSON type under the hood.
-    - Acceps the pydantic model and converts it to a dict on save.
+    - Uses SQLAlchemy JSONB type under the hood.
+    - Acceps the pydantic model (or dict, which is validated) and converts it to a dict on save.
     - SQLAlchemy engine JSON-encodes the dict to a string.
     RETRIEVING:
     - Pulls the string from the database.
     - SQLAlchemy engine JSON-decodes the string to a dict.
-    - Uses the dict to create a pydantic model.
+    - Uses the dict to create a pydantic model, once per distinct value.
+
+    Models should be immutable (`frozen`), as they are shared between rows.
     """
 
     impl = sqlalchemy.dialects.postgresql.JSONB
+    cache_ok = True
 
     def __init__(self, pydantic_type):
         super().__init__()
         self.pydantic_type = pydantic_type
+        self.parse = functools.lru_cache(maxsize=settings.PYDANTIC_TYPE_CACHE_SIZE)(
+            self.parse_json
+        )
 
     def process_bind_param(self, value, dialect):
-        return value.dict() if value else None
+        if not value:
+            return None
+        if isinstance(value, dict):
+            value = self.pydantic_type.parse_obj(value)
+        return value.dict()
 
     def process_result_value(self, value, dialect):
-        return self.pydantic_type.parse_obj(value) if value else None
+        if not value:
+            return None
+        # canonical JSON of value is the cache key
+        return self.parse(json.dumps(value, sort_keys=True))
+
+    def parse_json(self, value: str):
+        return self.pydantic_type.parse_raw(value)
 
 
 def json_serializer(*args, **kwargs) -> str:
@@ -20,6 +20,8 @@ def create_app():
     )
     setup_routers(app, fastapi_users)
     init_db_hooks(app)
+    init_executor_hooks(app)
+    init_occurrence_hooks(app)
     setup_cors_middleware(app)
     return app
 
@@ -88,3 +90,31 @@ def init_db_hooks(app: FastAPI) -> None:
     @app.on_event("shutdown")
     async def shutdown():
         await database.disconnect()
+
+
+def init_executor_hooks(app: FastAPI) -> None:
+    from app.services.executor import shutdown_executor
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        shutdown_executor()
+
+
+def init_occurrence_hooks(app: FastAPI) -> None:
+    import asyncio
+
+    from app.services import occurrences
+
+    tasks = []
+
+    @app.on_event("startup")
+    async def startup():
+        interval = settings.OCCURRENCE_MAINTENANCE_INTERVAL_SECONDS
+        if occurrences.is_enabled() and interval:
+            tasks.append(asyncio.create_task(occurrences.run_maintenance(interval)))
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        for task in tasks:
+            task.cancel()
+        tasks.clear()
@@ -2,4 +2,5 @@
 from app.db import Base  # noqa # pylint: disable=unused-import
 from app.models.event import Event
 from app.models.invite import EventInvite
+from app.models.occurrence import EventOccurrence
 from app.models.user import User
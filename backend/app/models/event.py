@@ -1,19 +1,24 @@
 import datetime
+from typing import Optional
 
-from dateutil.relativedelta import relativedelta
 from fastapi_users_db_sqlalchemy import GUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import inspect
+from sqlalchemy.event import listens_for
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql.functions import func
-from sqlalchemy.sql.schema import Column, ForeignKey
+from sqlalchemy.sql.schema import Column, ForeignKey, Index
 from sqlalchemy.sql.sqltypes import BigInteger, DateTime, Integer, Text
 
 from app.db import Base
 from app.deps.db import PydanticType
-from app.schemas.recurrence import RecurrenceSchema
+from app.schemas.recurrence import RecurrenceSchema, generate_rule_occurrences
+from app.services.rrule_cache import rrule_cache
 
 
 class Event(Base):
     __tablename__ = "event"
+    # events of owners in time range, see `EventService.get_visibility_filter`
+    __table_args__ = (Index("ix_event_owner_id_start", "owner_id", "start"),)
 
     id = Column(BigInteger, primary_key=True)
     owner_id = Column(GUID, ForeignKey("users.id"), nullable=False)
@@ -31,27 +36,95 @@ class Event(Base):
     start = Column(DateTime(timezone=True), nullable=False)
     duration_minutes = Column(Integer, nullable=False)
     recurrence = Column(PydanticType(RecurrenceSchema), nullable=True)
+    # end of the last occurrence, NULL for infinite series, see `get_series_end`
+    series_end = Column(DateTime(timezone=True), nullable=True, index=True)
+
+    # materialized occurrences starting up to this time are in `event_occurrence`,
+    # NULL if they are not written yet or are stale
+    occurrences_until = Column(DateTime(timezone=True), nullable=True)
 
     invites = relationship(
         "EventInvite", back_populates="event", cascade="all, delete-orphan"
     )
+    materialized_occurrences = relationship(
+        "EventOccurrence",
+        back_populates="event",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+    @validates("recurrence")
+    def validate_recurrence(self, key, value):
+        """Keep recurrence a model, dicts are validated as on save."""
+        if isinstance(value, dict):
+            return RecurrenceSchema.parse_obj(value)
+        return value
 
     def generate_for_timeperiod(
         self, after: datetime.datetime, before: datetime.datetime
     ):
-        if self.start > before:
-            return
-
-        if self.recurrence:
-            # TODO: fix auto conversion to pydantic for some reason not working
-            recurrence = RecurrenceSchema(**self.recurrence)
-            yield from recurrence.generate_for_timeperiod(
-                after, before, self.start, self.duration_minutes
-            )
-            return
-
-        if (
-            self.start >= after
-            or self.start + relativedelta(minutes=self.duration_minutes) >= after
-        ):
-            yield self.start
+        return generate_event_occurrences(
+            self.start, self.duration_minutes, self.recurrence, after, before
+        )
+
+
+@listens_for(Event.start, "set")
+@listens_for(Event.duration_minutes, "set")
+@listens_for(Event.recurrence, "set")
+def invalidate_occurrences(target: Event, value, oldvalue, initiator):
+    """Mark materialized occurrences of changed event as stale."""
+    if value != oldvalue:
+        target.occurrences_until = None
+
+
+@listens_for(Event, "before_insert")
+@listens_for(Event, "before_update")
+def set_series_end(mapper, connection, target: Event):
+    state = inspect(target)
+    if state.persistent and not any(
+        state.attrs[name].history.has_changes()
+        for name in ("start", "duration_minutes", "recurrence")
+    ):
+        return
+
+    target.series_end = get_series_end(
+        target.start, target.duration_minutes, target.recurrence
+    )
+
+
+def get_series_end(
+    start: datetime.datetime,
+    duration_minutes: int,
+    recurrence: Optional[RecurrenceSchema],
+) -> Optional[datetime.datetime]:
+    """Return end of the last occurrence of event, None if series is infinite."""
+    duration = datetime.timedelta(minutes=duration_minutes)
+    if not recurrence:
+        return start + duration
+
+    description = recurrence.description
+    if not description.count and not description.until:
+        return None
+
+    last = description.get_last_occurrence(start)
+    return last and last + duration
+
+
+def generate_event_occurrences(
+    start: datetime.datetime,
+    duration_minutes: int,
+    recurrence: Optional[RecurrenceSchema],
+    after: datetime.datetime,
+    before: datetime.datetime,
+):
+    """Generate starts of event occurrences overlapping `after`-`before` interval."""
+    if start > before:
+        return
+
+    if recurrence:
+        rule = rrule_cache.get_rule(recurrence, start)
+        yield from generate_rule_occurrences(rule, after, before, duration_minutes)
+        return
+
+    if start >= after or start + datetime.timedelta(minutes=duration_minutes) >= after:
+        yield start
@@ -1,5 +1,5 @@
 from fastapi_users_db_sqlalchemy import GUID
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.functions import func
 
@@ -18,5 +18,15 @@ class EventInvite(Base):
 
     is_accepted = Column(Boolean, nullable=True, default=None)
 
+    # events of accepted invites of users, event_id lookups use primary key
+    __table_args__ = (
+        Index(
+            "ix_event_invite_user_id_event_id_accepted",
+            "user_id",
+            "event_id",
+            postgresql_where=is_accepted,
+        ),
+    )
+
     event = relationship("Event", back_populates="invites")
     user = relationship("User", back_populates="invites")
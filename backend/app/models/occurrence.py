@@ -0,0 +1,23 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+
+from app.db import Base
+
+
+class EventOccurrence(Base):
+    """
+    Materialized occurrence of event, see `app.services.occurrences`.
+
+    Rows are valid only up to `Event.occurrences_until`.
+    """
+
+    __tablename__ = "event_occurrence"
+    __table_args__ = (Index("ix_event_occurrence_event_id_end", "event_id", "end"),)
+
+    event_id = Column(
+        BigInteger, ForeignKey("event.id", ondelete="CASCADE"), primary_key=True
+    )
+    start = Column(DateTime(timezone=True), primary_key=True)
+    end = Column(DateTime(timezone=True), nullable=False)
+
+    event = relationship("Event", back_populates="materialized_occurrences")
@@ -1,5 +1,5 @@
 from fastapi_users_db_sqlalchemy import SQLAlchemyBaseUserTableUUID
-from sqlalchemy import Column, DateTime
+from sqlalchemy import Column, DateTime, Integer
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.functions import func
 
@@ -13,6 +13,8 @@ class User(SQLAlchemyBaseUserTableUUID, Base):
     updated = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+    # bumped on every change of events visible to user, see `calendar_version` service
+    calendar_version = Column(Integer, nullable=False, default=0, server_default="0")
     events = relationship("Event", back_populates="owner", cascade="all, delete")
 
     invites = relationship("EventInvite", back_populates="user")
@@ -1,4 +1,5 @@
 import datetime
+import enum
 import uuid
 from typing import Optional
 
@@ -7,6 +8,8 @@ from pydantic import BaseModel, conint, conset, constr, validator
 from app.core.config import settings
 from app.schemas.recurrence import RecurrenceSchema
 
+MINUTE = datetime.timedelta(minutes=1)
+
 
 def validate_dt(dt: datetime.datetime):
     if not dt.tzinfo:
@@ -41,10 +44,28 @@ class EventBaseSchema(BaseModel):
 class EventCreateSchema(EventBaseSchema):
     invitee_ids: conset(uuid.UUID, max_items=100)
 
+    @validator("start")
+    def normalize_start(cls, start: datetime.datetime):
+        """
+        Convert start to UTC, as it is read back from DB.
+
+        Weekly and monthly rules keep weekday and time of start, so series end
+        and materialized occurrences must be computed from the same offset.
+        """
+        if start.tzinfo is None:
+            return start
+        return start.astimezone(datetime.timezone.utc)
+
+
+class OccurrenceFormat(str, enum.Enum):
+    full = "full"
+    compact = "compact"
+
 
 class EventListRequestSchema(IntervalSchema):
     offset: int = 0
     limit: conint(ge=1, le=50) = 10
+    occurrence_format: OccurrenceFormat = OccurrenceFormat.full
 
 
 class EventUpdateSchema(EventCreateSchema):
@@ -85,3 +106,75 @@ class EventWithOccurrencesSchema(EventSchema):
 class EventListResponseSchema(BaseModel):
     events_with_occurrences: list[EventWithOccurrencesSchema]
     offset: Optional[int]
+
+
+class AgendaRequestSchema(IntervalSchema):
+    limit: conint(ge=1, le=50) = 10
+    cursor_start: Optional[datetime.datetime] = None
+    cursor_event_id: int = 0
+
+
+class AgendaItemSchema(BaseModel):
+    start: datetime.datetime
+    event_id: int
+
+
+class AgendaResponseSchema(BaseModel):
+    occurrences: list[AgendaItemSchema]
+    events: list[EventSchema]
+    cursor: Optional[AgendaItemSchema]
+
+
+class CompactOccurrencesSchema(BaseModel):
+    """
+    Occurrence starts as the `first` one and minute offsets from it.
+
+    Regular series are described by `step_minutes`, others by `offsets_minutes`.
+    """
+
+    first: datetime.datetime
+    count: int
+    step_minutes: Optional[int] = None
+    offsets_minutes: Optional[list[int]] = None
+
+    @classmethod
+    def from_datetimes(
+        cls, occurrences: list[datetime.datetime]
+    ) -> "CompactOccurrencesSchema":
+        first = occurrences[0]
+        # offsets are absolute, wall clock may shift by DST within a series
+        first_timestamp = first.timestamp()
+        offsets = [
+            int(occurrence.timestamp() - first_timestamp) // 60
+            for occurrence in occurrences
+        ]
+
+        step = offsets[1] if len(offsets) > 1 else 0
+        if all(offset == i * step for i, offset in enumerate(offsets)):
+            return cls(first=first, count=len(offsets), step_minutes=step)
+        return cls(first=first, count=len(offsets), offsets_minutes=offsets)
+
+    def to_datetimes(self) -> list[datetime.datetime]:
+        """Return occurrence starts in timezone of `first`."""
+        if self.offsets_minutes is not None:
+            offsets = self.offsets_minutes
+        else:
+            offsets = [i * self.step_minutes for i in range(self.count)]
+
+        first_utc = self.first.astimezone(datetime.timezone.utc)
+        return [
+            (first_utc + offset * MINUTE).astimezone(self.first.tzinfo)
+            for offset in offsets
+        ]
+
+
+class EventWithCompactOccurrencesSchema(EventSchema):
+    occurrences: CompactOccurrencesSchema
+
+    class Config:
+        orm_mode = True
+
+
+class CompactEventListResponseSchema(BaseModel):
+    events_with_occurrences: list[EventWithCompactOccurrencesSchema]
+    offset: Optional[int]
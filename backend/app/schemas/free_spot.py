@@ -1,39 +1,139 @@
 import datetime
 import uuid
+import zoneinfo
 from typing import Optional
 
-from pydantic import BaseModel, conint, conset, root_validator
+from pydantic import BaseModel, conint, conlist, conset, root_validator, validator
 
 from app.core.config import settings
 from app.schemas.event import IntervalSchema
+from app.schemas.recurrence import Weekdays
 
 
-class FindFreeSpotRequestParams(IntervalSchema):
-    duration_minutes: conint(ge=1, le=settings.MAX_EVENT_DURATION_MINUTES)
-    user_ids: conset(uuid.UUID, max_items=100)
+class WorkingHoursSchema(BaseModel):
+    timezone: str
+    start: datetime.time
+    end: datetime.time
+    weekdays: frozenset[Weekdays] = frozenset(
+        {Weekdays.mon, Weekdays.tue, Weekdays.wed, Weekdays.thu, Weekdays.fri}
+    )
 
-    @root_validator
-    def validate_before_after(cls, values):
-        if "before" not in values or "after" not in values:
-            return values
+    @validator("timezone")
+    def validate_timezone(cls, v):
+        try:
+            zoneinfo.ZoneInfo(v)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"unknown timezone {v}")
+        return v
 
-        delta = (values["before"] - values["after"]) / datetime.timedelta(minutes=1)
+    @validator("start", "end")
+    def validate_time(cls, v):
+        if v.tzinfo:
+            raise ValueError("must not contain timezone info, use `timezone`")
+        return v
 
-        if delta > cls.Config.MAX_DELTA:
-            raise ValueError(
-                f"after-before interval should not exceed {settings.MAX_INTERVAL_DURATION_MINUTES} minutes"
-            )
+    @validator("end")
+    def validate_end(cls, v, values):
+        if "start" in values and v <= values["start"]:
+            raise ValueError("`end` must be greater than `start`")
+        return v
+
+    class Config:
+        # hashable, so compiled masks can be cached
+        frozen = True
 
-        if "duration_minutes" in values and delta < values["duration_minutes"]:
-            raise ValueError("`before` must be greater than `after + duration_minutes`")
-        elif delta <= 0:
-            raise ValueError("`before` must be greater than `after`")
 
+def validate_before_after(cls, values):
+    if "before" not in values or "after" not in values:
         return values
 
+    delta = (values["before"] - values["after"]) / datetime.timedelta(minutes=1)
+
+    if delta > cls.Config.MAX_DELTA:
+        raise ValueError(
+            f"after-before interval should not exceed {settings.MAX_INTERVAL_DURATION_MINUTES} minutes"
+        )
+
+    if "duration_minutes" in values and delta < values["duration_minutes"]:
+        raise ValueError("`before` must be greater than `after + duration_minutes`")
+    elif delta <= 0:
+        raise ValueError("`before` must be greater than `after`")
+
+    return values
+
+
+class FindFreeSpotRequestParams(IntervalSchema):
+    duration_minutes: conint(ge=1, le=settings.MAX_EVENT_DURATION_MINUTES)
+    user_ids: conset(uuid.UUID, max_items=100)
+    max_results: conint(ge=1, le=50) = 1
+    min_gap_minutes: conint(ge=0, le=settings.MAX_INTERVAL_DURATION_MINUTES) = 0
+    granularity_minutes: Optional[conint(ge=1, le=60)] = None
+    working_hours: Optional[WorkingHoursSchema] = None
+    user_working_hours: dict[uuid.UUID, WorkingHoursSchema] = {}
+    optional_user_ids: conset(uuid.UUID, max_items=100) = set()
+    min_available: Optional[conint(ge=1)] = None
+
+    _validate_before_after = root_validator(allow_reuse=True)(validate_before_after)
+
+    @validator("min_available")
+    def validate_min_available(cls, v, values):
+        if v is None or "user_ids" not in values or "optional_user_ids" not in values:
+            return v
+
+        if v > len(values["user_ids"] | values["optional_user_ids"]):
+            raise ValueError("must not exceed number of attendees")
+        return v
+
     class Config:
         MAX_DELTA = settings.MAX_INTERVAL_DURATION_MINUTES
 
 
 class FindFreeSpotResponse(BaseModel):
     timeslot: Optional[datetime.datetime]
+    timeslots: list[datetime.datetime]
+
+
+class FindFreeSpotBatchRequest(BaseModel):
+    queries: conlist(FindFreeSpotRequestParams, min_items=1, max_items=50)
+
+
+class FindFreeSpotBatchResponse(BaseModel):
+    results: list[FindFreeSpotResponse]
+
+
+class FreeBusyRequestParams(IntervalSchema):
+    user_ids: conset(uuid.UUID, min_items=1, max_items=100)
+    merge_users: bool = False
+
+    _validate_before_after = root_validator(allow_reuse=True)(validate_before_after)
+
+    class Config:
+        MAX_DELTA = settings.MAX_INTERVAL_DURATION_MINUTES
+
+
+class BusyIntervalSchema(BaseModel):
+    start: datetime.datetime
+    end: datetime.datetime
+
+
+class FreeBusyResponse(BaseModel):
+    busy_by_user: dict[uuid.UUID, list[BusyIntervalSchema]] = {}
+    busy: Optional[list[BusyIntervalSchema]] = None
+
+
+class AvailabilityHeatmapRequestParams(IntervalSchema):
+    user_ids: conset(uuid.UUID, min_items=1, max_items=100)
+    granularity_minutes: conint(ge=1, le=24 * 60) = 30
+    working_hours: Optional[WorkingHoursSchema] = None
+    user_working_hours: dict[uuid.UUID, WorkingHoursSchema] = {}
+
+    _validate_before_after = root_validator(allow_reuse=True)(validate_before_after)
+
+    class Config:
+        MAX_DELTA = settings.MAX_INTERVAL_DURATION_MINUTES
+
+
+class AvailabilityHeatmapResponse(BaseModel):
+    origin: datetime.datetime
+    granularity_minutes: int
+    available: list[int]
@@ -1,10 +1,10 @@
 import calendar
 import datetime
 import enum
-from typing import Literal, Optional, Union
+import math
+from typing import Iterable, Iterator, Literal, Optional, Union
 
 from dateutil import rrule
-from dateutil.relativedelta import relativedelta
 from pydantic import BaseModel, conint
 
 
@@ -26,15 +26,288 @@ class MonthlyRecurrenceMode(str, enum.Enum):
     by_weekday = "by_weekday"
 
 
+class SkipAheadRule:
+    """
+    Native recurrence rule computing the first period to look at directly.
+
+    Occurrences are grouped in periods of `interval` days, weeks, months or years,
+    so occurrences after `dt` are generated starting from the period of `dt`,
+    not from `start`, and cost does not depend on the age of the series.
+
+    Implements `xafter` of `dateutil.rrule.rrule` and yields the same occurrences,
+    dateutil rules are kept as a fallback for cases not supported here.
+    """
+
+    # periods may have no occurrence, then `cycle` periods have the same occurrences
+    may_skip = False
+    cycle = 1
+
+    def __init__(
+        self,
+        start: datetime.datetime,
+        interval: int,
+        count: Optional[int] = None,
+        until: Optional[datetime.datetime] = None,
+    ):
+        # dateutil drops microseconds and builds occurrences from wall clock time
+        self.start = start.replace(microsecond=0)
+        self.time = self.start.timetz().replace(fold=0)
+        self.interval = interval
+        self.count = count
+        self.until = until
+
+    def xafter(
+        self, dt: datetime.datetime, count: Optional[int] = None, inc: bool = False
+    ) -> Iterator[datetime.datetime]:
+        """Generate occurrences after `dt`, including `dt` if `inc`, up to `count` of them."""
+        if self.start.tzinfo is not None:
+            dt_local = dt.astimezone(self.start.tzinfo)
+        else:
+            dt_local = dt
+
+        period = max(self.get_period(dt_local) // self.interval, 0)
+        index = self.count_before(period) if self.count else 0
+        yielded = 0
+
+        while True:
+            try:
+                occurrences = self.get_period_occurrences(period * self.interval)
+            except (OverflowError, ValueError):
+                # out of range of datetime
+                return
+
+            for occurrence in occurrences:
+                if self.count and index >= self.count:
+                    return
+                if self.until and occurrence > self.until:
+                    return
+                index += 1
+
+                if occurrence > dt or (inc and occurrence == dt):
+                    yield occurrence
+                    yielded += 1
+                    if count and yielded >= count:
+                        return
+
+            period += 1
+
+    def combine(self, date: datetime.date) -> datetime.datetime:
+        return datetime.datetime.combine(date, self.time)
+
+    def get_period(self, dt: datetime.datetime) -> int:
+        """Return number of days, weeks, ... between `start` and `dt` rounded down."""
+        raise NotImplementedError
+
+    def get_period_occurrences(self, offset: int) -> list[datetime.datetime]:
+        """Return occurrences of period `offset` days, weeks, ... after `start`."""
+        raise NotImplementedError
+
+    def count_before(self, period: int) -> int:
+        """Return number of occurrences in periods before `period`."""
+        return period
+
+    def skip_to(self, index: int) -> tuple[int, int]:
+        """Return period holding occurrence `index` or preceding it, and index in it."""
+        if not self.may_skip:
+            return index, 0
+
+        # skipped periods repeat every `cycle` periods, count occurrences of one cycle
+        periods = self.cycle // math.gcd(self.cycle, self.interval)
+        per_cycle = sum(
+            len(self.get_period_occurrences(period * self.interval))
+            for period in range(periods)
+        )
+        cycles, index = divmod(index, per_cycle)
+        return cycles * periods, index
+
+    def get_occurrence(self, index: int) -> Optional[datetime.datetime]:
+        """Return occurrence number `index` ignoring `count` and `until`, None if out of range."""
+        try:
+            period, index = self.skip_to(index)
+            while True:
+                occurrences = self.get_period_occurrences(period * self.interval)
+                if index < len(occurrences):
+                    return occurrences[index]
+                index -= len(occurrences)
+                period += 1
+        except (OverflowError, ValueError):
+            return None
+
+    def get_last_until(self) -> Optional[datetime.datetime]:
+        """Return the last occurrence not after `until`, None if there is none."""
+        until = self.until
+        if until.tzinfo is not None:
+            until = until.astimezone(self.start.tzinfo)
+
+        for period in range(max(self.get_period(until) // self.interval, 0), -1, -1):
+            try:
+                occurrences = self.get_period_occurrences(period * self.interval)
+            except (OverflowError, ValueError):
+                # out of range of datetime
+                continue
+
+            for occurrence in reversed(occurrences):
+                if self.start <= occurrence <= self.until:
+                    return occurrence
+        return None
+
+    def get_last(self) -> Optional[datetime.datetime]:
+        """
+        Return the last occurrence of finite rule, None if it is out of range of datetime.
+
+        The occurrence is found from `count` and `until` directly, without generating
+        the series, so cost does not depend on its length.
+        """
+        last = self.get_occurrence(self.count - 1) if self.count else None
+        if self.until and (last is None or last > self.until):
+            last = self.get_last_until() or self.start
+        return last
+
+
+class DailyRule(SkipAheadRule):
+    def get_period(self, dt):
+        return (dt.date() - self.start.date()).days
+
+    def get_period_occurrences(self, offset):
+        return [self.combine(self.start.date() + datetime.timedelta(days=offset))]
+
+
+class WeeklyRule(SkipAheadRule):
+    def __init__(self, start, interval, count, until, weekdays: Iterable[int]):
+        super().__init__(start, interval, count, until)
+        wkst = calendar.firstweekday()
+        self.week_start = self.start.date() - datetime.timedelta(
+            days=(self.start.weekday() - wkst) % 7
+        )
+        self.day_offsets = sorted({(wd - wkst) % 7 for wd in weekdays})
+        self.first_week_count = len(self.get_period_occurrences(0))
+
+    def get_period(self, dt):
+        return (dt.date() - self.week_start).days // 7
+
+    def get_period_occurrences(self, offset):
+        week_start = self.week_start + datetime.timedelta(weeks=offset)
+        return [
+            self.combine(week_start + datetime.timedelta(days=day_offset))
+            for day_offset in self.day_offsets
+            if week_start + datetime.timedelta(days=day_offset) >= self.start.date()
+        ]
+
+    def count_before(self, period):
+        if period == 0:
+            return 0
+        return self.first_week_count + (period - 1) * len(self.day_offsets)
+
+    def skip_to(self, index):
+        if index < self.first_week_count:
+            return 0, index
+        period, index = divmod(index - self.first_week_count, len(self.day_offsets))
+        return period + 1, index
+
+
+class MonthlyRule(SkipAheadRule):
+    """
+    Occurs on `start` day of month, or on nth weekday of month of `start` if `by_weekday`.
+
+    Months without such day are skipped.
+    """
+
+    def __init__(self, start, interval, count, until, by_weekday: bool):
+        super().__init__(start, interval, count, until)
+        self.by_weekday = by_weekday
+        self.month = self.start.year * 12 + self.start.month - 1
+        self.nth = (self.start.day - 1) // 7
+
+    # 400 years of Gregorian calendar repeat days of month and weekdays
+    cycle = 400 * 12
+
+    @property
+    def may_skip(self) -> bool:
+        return self.nth == 4 if self.by_weekday else self.start.day > 28
+
+    def get_period(self, dt):
+        return dt.year * 12 + dt.month - 1 - self.month
+
+    def get_period_occurrences(self, offset):
+        year, month = divmod(self.month + offset, 12)
+        month += 1
+
+        if self.by_weekday:
+            first_weekday = calendar.weekday(year, month, 1)
+            day = 1 + (self.start.weekday() - first_weekday) % 7 + 7 * self.nth
+        else:
+            day = self.start.day
+
+        if day > calendar.monthrange(year, month)[1]:
+            return []
+        return [self.combine(datetime.date(year, month, day))]
+
+
+class YearlyRule(SkipAheadRule):
+    """Occurs on `start` day of year, years without Feb 29 are skipped for Feb 29."""
+
+    cycle = 400
+
+    @property
+    def may_skip(self) -> bool:
+        return (self.start.month, self.start.day) == (2, 29)
+
+    def get_period(self, dt):
+        return dt.year - self.start.year
+
+    def get_period_occurrences(self, offset):
+        year = self.start.year + offset
+        if self.may_skip and not calendar.isleap(year):
+            return []
+        return [self.combine(self.start.date().replace(year=year))]
+
+
 class BaseRecurrenceSchema(BaseModel):
     interval: conint(ge=1)
     count: Optional[conint(ge=2)] = None
     until: Optional[datetime.datetime] = None
 
+    class Config:
+        # hashable and shared between events, see `PydanticType`
+        frozen = True
+
+    def get_rule(self, start: datetime.datetime):
+        """Return native rule, or dateutil rule if native rule does not support params."""
+        if self.until and (self.until.tzinfo is None) != (start.tzinfo is None):
+            # let dateutil raise its error
+            return self.get_rrule(start)
+
+        rule = self.get_native_rule(start)
+        # skipped periods make index of occurrence unknown
+        if self.count and getattr(rule, "may_skip", False):
+            return self.get_rrule(start)
+
+        return rule
+
+    def get_last_occurrence(
+        self, start: datetime.datetime
+    ) -> Optional[datetime.datetime]:
+        """Return the last occurrence of finite series, None if it is out of range."""
+        if self.until and (self.until.tzinfo is None) != (start.tzinfo is None):
+            # let dateutil raise its error
+            self.get_rrule(start)
+
+        # skipped periods are handled, unlike in `get_rule` with `count`
+        return self.get_native_rule(start).get_last()
+
+    def get_native_rule(self, start: datetime.datetime) -> SkipAheadRule:
+        raise NotImplementedError
+
+    def get_rrule(self, start: datetime.datetime) -> rrule.rrule:
+        raise NotImplementedError
+
 
 class DailyRecurrenceSchema(BaseRecurrenceSchema):
     type: Literal["daily"]
 
+    def get_native_rule(self, start: datetime.datetime):
+        return DailyRule(start, self.interval, self.count, self.until)
+
     def get_rrule(self, start: datetime.datetime):
         return rrule.rrule(
             freq=rrule.DAILY,
@@ -47,7 +320,16 @@ class DailyRecurrenceSchema(BaseRecurrenceSchema):
 
 class WeeklyRecurrenceSchema(BaseRecurrenceSchema):
     type: Literal["weekly"]
-    weekdays: set[Weekdays]
+    weekdays: frozenset[Weekdays]
+
+    def get_native_rule(self, start: datetime.datetime):
+        return WeeklyRule(
+            start,
+            self.interval,
+            self.count,
+            self.until,
+            [WEEKDAY_TO_INT[wd] for wd in self.weekdays],
+        )
 
     def get_rrule(self, start: datetime.datetime):
         int_weekdays = [WEEKDAY_TO_INT[wd] for wd in self.weekdays]
@@ -66,6 +348,15 @@ class MonthlyRecurrenceSchema(BaseRecurrenceSchema):
     type: Literal["monthly"]
     mode: MonthlyRecurrenceMode
 
+    def get_native_rule(self, start: datetime.datetime):
+        return MonthlyRule(
+            start,
+            self.interval,
+            self.count,
+            self.until,
+            self.mode == MonthlyRecurrenceMode.by_weekday,
+        )
+
     def get_rrule(self, start: datetime.datetime):
         if self.mode == MonthlyRecurrenceMode.by_day:
             return rrule.rrule(
@@ -91,6 +382,9 @@ class MonthlyRecurrenceSchema(BaseRecurrenceSchema):
 class YearlyRecurrenceSchema(BaseRecurrenceSchema):
     type: Literal["yearly"]
 
+    def get_native_rule(self, start: datetime.datetime):
+        return YearlyRule(start, self.interval, self.count, self.until)
+
     def get_rrule(self, start: datetime.datetime):
         return rrule.rrule(
             freq=rrule.YEARLY,
@@ -109,6 +403,9 @@ class RecurrenceSchema(BaseModel):
         YearlyRecurrenceSchema,
     ]
 
+    class Config:
+        frozen = True
+
     def generate_for_timeperiod(
         self,
         after: datetime.datetime,
@@ -116,9 +413,23 @@ class RecurrenceSchema(BaseModel):
         start: datetime.datetime,
         duration_minutes: int,
     ):
-        rule = self.description.get_rrule(start)
-        # we have to use `after - duration_minutes` because if event starts before `after`
-        # and ends after `after`, `between` won't generate it
-        yield from rule.between(
-            after - relativedelta(minutes=duration_minutes), before, inc=True
-        )
+        rule = self.description.get_rule(start)
+        return generate_rule_occurrences(rule, after, before, duration_minutes)
+
+
+def generate_rule_occurrences(
+    rule: Union[SkipAheadRule, rrule.rrule],
+    after: datetime.datetime,
+    before: datetime.datetime,
+    duration_minutes: int,
+):
+    """Generate occurrences of compiled `rule` overlapping `after`-`before` interval."""
+    # we have to use `after - duration_minutes` because if event starts before `after`
+    # and ends after `after`, it won't be generated otherwise.
+    # `xafter` is lazy, so occurrences are generated only as far as they are consumed
+    for occurrence in rule.xafter(
+        after - datetime.timedelta(minutes=duration_minutes), inc=True
+    ):
+        if occurrence > before:
+            return
+        yield occurrence
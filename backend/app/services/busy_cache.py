@@ -0,0 +1,151 @@
+import bisect
+import datetime
+import uuid
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from bitarray import bitarray, frozenbitarray
+
+from app.core.config import settings
+from app.models import Event
+
+MINUTES_IN_DAY = 24 * 60
+DAY = datetime.timedelta(days=1)
+
+
+def get_day_start(day: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc)
+
+
+def get_days(
+    after: datetime.datetime, before: datetime.datetime
+) -> list[datetime.date]:
+    """Return UTC days overlapping `after`-`before` interval."""
+    day = after.astimezone(datetime.timezone.utc).date()
+    last_day = before.astimezone(datetime.timezone.utc).date()
+
+    days = []
+    while day <= last_day:
+        days.append(day)
+        day += DAY
+
+    return days
+
+
+def get_event_days(event: Event) -> Optional[list[datetime.date]]:
+    """Return days occupied by event, None if event is recurring."""
+    if event.recurrence:
+        return None
+
+    return get_days(
+        event.start, event.start + datetime.timedelta(minutes=event.duration_minutes)
+    )
+
+
+def make_day_bitmap(
+    day: datetime.date,
+    intervals: list[tuple[datetime.datetime, datetime.datetime]],
+) -> bitarray:
+    """Return bitmap of busy minutes of the day, `intervals` should be sorted and merged."""
+    day_start = get_day_start(day)
+    day_end = day_start + DAY
+
+    bitmap = bitarray(MINUTES_IN_DAY)
+    bitmap.setall(0)
+
+    i = bisect.bisect_right(intervals, day_start, key=lambda interval: interval[1])
+    for start, end in intervals[i:]:
+        if start >= day_end:
+            break
+
+        # partially occupied minutes are busy
+        start_minute = int((start - day_start).total_seconds()) // 60
+        end_minute = -(-int((end - day_start).total_seconds()) // 60)
+        bitmap[max(start_minute, 0) : end_minute] = 1
+
+    return bitmap
+
+
+class BusyBitmapCache:
+    """
+    LRU cache of busy minutes of users, one bitmap of `MINUTES_IN_DAY` bits per (user_id, UTC day).
+
+    Cache is per process and is invalidated by API handlers changing events,
+    so it is only safe when all writes go through the same process.
+    Cache is disabled when `max_entries` is 0.
+
+    Every invalidation bumps generation of user, bitmaps built from events read
+    before that are not cached, see `get_generation`.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.bitmaps: OrderedDict[
+            tuple[uuid.UUID, datetime.date], frozenbitarray
+        ] = OrderedDict()
+        self.days_by_user: dict[uuid.UUID, set[datetime.date]] = {}
+        self.generations: dict[uuid.UUID, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, user_id: uuid.UUID, day: datetime.date) -> Optional[frozenbitarray]:
+        bitmap = self.bitmaps.get((user_id, day))
+        if bitmap is not None:
+            self.bitmaps.move_to_end((user_id, day))
+        return bitmap
+
+    def get_generation(self, user_id: uuid.UUID) -> int:
+        """Return generation of user to pass to `set` of bitmaps built from events read after it."""
+        return self.generations.get(user_id, 0)
+
+    def set(
+        self,
+        user_id: uuid.UUID,
+        day: datetime.date,
+        bitmap: bitarray,
+        generation: Optional[int] = None,
+    ):
+        """Cache bitmap, unless user was invalidated since `generation`."""
+        if generation is not None and generation != self.get_generation(user_id):
+            return
+
+        self.bitmaps[user_id, day] = frozenbitarray(bitmap)
+        self.bitmaps.move_to_end((user_id, day))
+        self.days_by_user.setdefault(user_id, set()).add(day)
+
+        while len(self.bitmaps) > self.max_entries:
+            (old_user_id, old_day), _ = self.bitmaps.popitem(last=False)
+            self.forget_day(old_user_id, old_day)
+
+    def invalidate(
+        self,
+        user_ids: Iterable[uuid.UUID],
+        days: Optional[Iterable[datetime.date]] = None,
+    ):
+        """Drop bitmaps of `user_ids` for `days`, for all days if `days` is None."""
+        for user_id in user_ids:
+            self.generations[user_id] = self.get_generation(user_id) + 1
+            user_days = self.days_by_user.get(user_id, set())
+            for day in list(user_days) if days is None else user_days & set(days):
+                del self.bitmaps[user_id, day]
+                self.forget_day(user_id, day)
+
+    def invalidate_event(self, event: Event, user_ids: Iterable[uuid.UUID]):
+        """Drop bitmaps of `user_ids` for days occupied by `event`."""
+        self.invalidate(user_ids, get_event_days(event))
+
+    def clear(self):
+        self.bitmaps.clear()
+        self.days_by_user.clear()
+        self.generations.clear()
+
+    def forget_day(self, user_id: uuid.UUID, day: datetime.date):
+        user_days = self.days_by_user[user_id]
+        user_days.discard(day)
+        if not user_days:
+            del self.days_by_user[user_id]
+
+
+busy_cache = BusyBitmapCache(settings.BUSY_CACHE_MAX_ENTRIES)
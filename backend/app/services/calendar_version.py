@@ -0,0 +1,64 @@
+"""
+Per-user calendar versions for conditional requests.
+
+`User.calendar_version` is bumped in the same transaction as every change of
+events visible to user, so `ETag` of a response can be computed from version and
+request params only, and `If-None-Match` is answered before events are loaded.
+"""
+import hashlib
+import uuid
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from app.models import Event, User
+
+
+def get_viewer_ids(event: Event) -> set[uuid.UUID]:
+    """Return ids of users listing `event`: owner and users accepted invite."""
+    return {event.owner_id} | {
+        invite.user_id for invite in event.invites if invite.is_accepted
+    }
+
+
+async def bump(session: AsyncSession, user_ids: Iterable[uuid.UUID]):
+    """Increment calendar versions of `user_ids`, changes are committed by caller."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    await session.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(calendar_version=User.calendar_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def get_event_version(session: AsyncSession, event_id: int) -> Optional[int]:
+    """Return calendar version of event owner, None if event does not exist."""
+    return await session.scalar(
+        select(User.calendar_version)
+        .join(Event, Event.owner_id == User.id)
+        .where(Event.id == event_id)
+    )
+
+
+def make_etag(*parts) -> str:
+    """Return weak ETag of `parts`, responses may differ in insignificant bytes."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of `etag` with `If-None-Match` header value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def opaque(tag: str) -> str:
+        return tag.strip().removeprefix("W/")
+
+    return opaque(etag) in {opaque(tag) for tag in if_none_match.split(",")}
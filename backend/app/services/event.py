@@ -1,102 +1,523 @@
 import datetime
+import heapq
+import itertools
 import uuid
-from typing import Iterable
+from typing import AsyncIterator, Iterable, Iterator, Optional, Union
 
-from bitarray import bitarray
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
+from sqlalchemy import or_, select, union_all
+from sqlalchemy.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import selectinload
 
+from app.core.config import settings
 from app.deps.db import get_async_session
-from app.models import Event, EventInvite
-from app.schemas.event import EventWithOccurrencesSchema
+from app.models import Event, EventInvite, EventOccurrence
+from app.schemas.event import (
+    CompactOccurrencesSchema,
+    EventWithCompactOccurrencesSchema,
+    EventWithOccurrencesSchema,
+    OccurrenceFormat,
+)
+from app.schemas.free_spot import WorkingHoursSchema
+from app.services import occurrences
+from app.services.busy_cache import busy_cache, get_day_start, get_days, make_day_bitmap
+from app.services.executor import CompactEvent, get_executor, run_in_executor
+from app.services.free_spot import (
+    FREE_SPOT_FINDERS,
+    BaseFreeSpotFinder,
+    CountingFreeSpotFinder,
+    merge_busy_intervals,
+)
+from app.services.occurrence_batch import EventColumns
+from app.services.working_hours import get_allowed_mask
 
 
-class FreeSpotFinder:
-    """
-    Finder of free spots in schedule of multiple events.
+def iter_agenda(
+    event: Event,
+    after: datetime.datetime,
+    before: datetime.datetime,
+    cursor: Optional[tuple[datetime.datetime, int]] = None,
+) -> Iterator[tuple[datetime.datetime, int, Event]]:
+    """Generate (start, event id, event) of `event` occurrences ordered after `cursor`."""
+    occurrences = (
+        (start, event.id, event)
+        for start in event.generate_for_timeperiod(after, before)
+    )
+    if cursor is None:
+        return occurrences
+    return itertools.dropwhile(lambda item: item[:2] <= cursor, occurrences)
 
-    Works by iterating over events and removing occupied spots from bitarray.
-    """
 
-    def __init__(
-        self, after: datetime.datetime, before: datetime.datetime, duration: int
-    ):
-        self.after = after
-        self.before = before
-        self.duration = duration
-        self.bitarray = None
+class EventService:
+    async def find_event_spot(
+        self,
+        user_ids: set[uuid.UUID],
+        after: datetime.datetime,
+        before: datetime.datetime,
+        duration_minutes: int,
+        strategy: Optional[str] = None,
+    ) -> Optional[datetime.datetime]:
+        """Find first free spot of `duration_minutes` for all `user_ids`."""
+        spots = await self.find_event_spots(
+            user_ids, after, before, duration_minutes, strategy=strategy
+        )
+        return spots[0] if spots else None
+
+    async def find_event_spots(
+        self,
+        user_ids: set[uuid.UUID],
+        after: datetime.datetime,
+        before: datetime.datetime,
+        duration_minutes: int,
+        max_results: int = 1,
+        min_gap_minutes: int = 0,
+        granularity_minutes: Optional[int] = None,
+        working_hours: Optional[WorkingHoursSchema] = None,
+        user_working_hours: Optional[dict[uuid.UUID, WorkingHoursSchema]] = None,
+        strategy: Optional[str] = None,
+        optional_user_ids: Optional[set[uuid.UUID]] = None,
+        min_available: Optional[int] = None,
+    ) -> list[datetime.datetime]:
+        """
+        Find up to `max_results` earliest free spots for all `user_ids`.
 
-    def find(self, events: Iterable[Event]):
-        self.init_array()
+        `granularity_minutes` defaults to `FREE_SPOT_GRANULARITY_MINUTES` setting,
+        `strategy` picks one of `FREE_SPOT_FINDERS`, defaults to `FREE_SPOT_STRATEGY` setting.
+        Spots are looked up only within working hours, see `restrict_to_working_hours`.
 
-        for event in events:
-            for event_start in event.generate_for_timeperiod(self.after, self.before):
-                self.remove_event_from_array(event_start, event.duration_minutes)
+        With `optional_user_ids` or `min_available`, spots need all `user_ids` and
+        at least `min_available` attendees in total to be free, see `get_counting_spot_finder`.
 
-        return self.find_spot_in_array()
+        When `busy_cache` is enabled, occupancy is built from cached busy bitmaps,
+        when occurrences are materialized, they are read from `event_occurrence`,
+        otherwise events are expanded and searched in `executor` worker process,
+        in batch if `FREE_SPOT_COLUMNAR_EXPANSION` is set.
+        """
+        assert before > after
 
-    def init_array(self):
-        self.bitarray = bitarray(
-            self.get_diff_in_minutes(
-                self.before - relativedelta(minutes=self.duration - 1), self.after
+        if optional_user_ids or min_available is not None:
+            optional_user_ids = optional_user_ids or set()
+            busy_by_user = await self.get_busy_intervals(
+                user_ids | optional_user_ids, after, before
+            )
+            spot_finder = self.get_counting_spot_finder(
+                busy_by_user,
+                after,
+                before,
+                duration_minutes,
+                user_ids,
+                optional_user_ids,
+                min_available,
+                granularity_minutes,
+                working_hours,
+                user_working_hours,
+            )
+            return spot_finder.search_spots(max_results, min_gap_minutes)
+
+        async for session in get_async_session():
+            spot_finder = self.get_spot_finder(
+                after, before, duration_minutes, granularity_minutes, strategy
+            )
+            self.restrict_to_working_hours(
+                spot_finder, user_ids, working_hours, user_working_hours
             )
-        )
-        self.bitarray.setall(0)
-
-    def remove_event_from_array(self, start: datetime.datetime, duration_minutes: int):
-        bias = self.get_diff_in_minutes(start, self.after)
-        if bias < 0:
-            duration_minutes += bias
-            bias = 0
-
-        self.bitarray[bias : bias + duration_minutes] = 1
-
-    def find_spot_in_array(self):
-        """Return free spot start_time in bitarray."""
-        current_len = 0
-        start = None
-
-        for i, val in enumerate(self.bitarray):
-            if val == 0:
-                if start is None:
-                    start = i
-                current_len += 1
-            else:
-                start = None
-                current_len = 0
 
-            if current_len == self.duration:
-                break
-        else:
-            return None
+            if busy_cache.enabled:
+                spot_finder.init_occupancy()
+                await self.add_cached_busy_bitmaps(
+                    session, spot_finder, user_ids, after, before
+                )
+                return spot_finder.search_spots(max_results, min_gap_minutes)
+
+            if occurrences.is_enabled():
+                spot_finder.init_occupancy()
+                await self.add_materialized_occurrences(
+                    session, spot_finder, user_ids, after, before
+                )
+                return spot_finder.search_spots(max_results, min_gap_minutes)
+
+            events = (
+                await session.execute(
+                    self.get_event_query_for_user_ids(user_ids, after, before)
+                )
+            ).scalars()
 
-        return self.after + relativedelta(minutes=start)
+            if settings.FREE_SPOT_COLUMNAR_EXPANSION:
+                return await run_in_executor(
+                    spot_finder.find_many_columns,
+                    EventColumns.from_events(events),
+                    max_results,
+                    min_gap_minutes,
+                )
 
-    def get_diff_in_minutes(self, dt1: datetime.datetime, dt2: datetime.datetime):
-        return int((dt1 - dt2).total_seconds()) // 60
+            if get_executor() is not None:
+                # only fields needed for expansion are sent to worker
+                events = [CompactEvent.from_event(event) for event in events]
 
+            return await run_in_executor(
+                spot_finder.find_many, events, max_results, min_gap_minutes
+            )
 
-class EventService:
-    async def find_event_spot(
+    async def add_materialized_occurrences(
         self,
+        session: AsyncSession,
+        spot_finder: BaseFreeSpotFinder,
+        user_ids: set[uuid.UUID],
+        after: datetime.datetime,
+        before: datetime.datetime,
+    ):
+        """
+        Add occurrences of events of `user_ids` to `spot_finder`.
+
+        Occurrences of events materialized up to `before` are read with range query,
+        other events are expanded.
+        """
+        spot_finder.add_busy_intervals(
+            await session.execute(
+                select(EventOccurrence.start, EventOccurrence.end)
+                .join(Event)
+                .filter(
+                    self.get_visibility_filter(user_ids),
+                    Event.occurrences_until >= before,
+                    EventOccurrence.start <= before,
+                    EventOccurrence.end >= after,
+                )
+            )
+        )
+
+        events = (
+            await session.execute(
+                self.get_event_query_for_user_ids(user_ids, after, before).filter(
+                    or_(
+                        Event.occurrences_until.is_(None),
+                        Event.occurrences_until < before,
+                    )
+                )
+            )
+        ).scalars()
+        spot_finder.add_events(events)
+
+    async def add_cached_busy_bitmaps(
+        self,
+        session: AsyncSession,
+        spot_finder: BaseFreeSpotFinder,
         user_ids: set[uuid.UUID],
         after: datetime.datetime,
         before: datetime.datetime,
-        duration_minutes: int,
     ):
+        """
+        Add busy bitmaps of `user_ids` for days of `after`-`before` window to `spot_finder`.
+
+        Events are loaded and expanded only for users and days missing in `busy_cache`.
+        """
+        bitmaps = {
+            (user_id, day): busy_cache.get(user_id, day)
+            for user_id in user_ids
+            for day in get_days(after, before)
+        }
+        missing = [key for key, bitmap in bitmaps.items() if bitmap is None]
+
+        if missing:
+            missing_user_ids = {user_id for user_id, _ in missing}
+            missing_days = sorted({day for _, day in missing})
+            missing_after = get_day_start(missing_days[0])
+            missing_before = get_day_start(missing_days[-1]) + datetime.timedelta(
+                days=1
+            )
+
+            # events changed while they are read must not get into the cache
+            generations = {
+                user_id: busy_cache.get_generation(user_id)
+                for user_id in missing_user_ids
+            }
+            events = (
+                await session.execute(
+                    self.get_event_query_for_user_ids(
+                        missing_user_ids, missing_after, missing_before
+                    ).options(selectinload(Event.invites))
+                )
+            ).scalars()
+            busy_by_user = self.get_busy_intervals_by_user(
+                events, missing_user_ids, missing_after, missing_before
+            )
+
+            for user_id, day in missing:
+                bitmaps[user_id, day] = make_day_bitmap(day, busy_by_user[user_id])
+                busy_cache.set(
+                    user_id, day, bitmaps[user_id, day], generations[user_id]
+                )
+
+        for (_, day), bitmap in bitmaps.items():
+            spot_finder.add_busy_bitmap(get_day_start(day), bitmap)
+
+    async def find_event_spots_batch(
+        self, queries: list[dict], strategy: Optional[str] = None
+    ) -> list[list[datetime.datetime]]:
+        """
+        Run several `find_event_spots` queries sharing one event load.
+
+        Events of all users are loaded with one query and expanded once over the union
+        of queries windows, busy intervals of every user are then reused by each query.
+        Results are returned in `queries` order.
+        """
+        user_ids = set().union(
+            *(query["user_ids"] for query in queries),
+            *(query.get("optional_user_ids", set()) for query in queries),
+        )
+        after = min(query["after"] for query in queries)
+        before = max(query["before"] for query in queries)
         assert before > after
 
         async for session in get_async_session():
+            events = (
+                await session.execute(
+                    self.get_event_query_for_user_ids(user_ids, after, before).options(
+                        selectinload(Event.invites)
+                    )
+                )
+            ).scalars()
+
+            busy_by_user = self.get_busy_intervals_by_user(
+                events, user_ids, after, before
+            )
+
+        results = []
+        for query in queries:
+            if query.get("optional_user_ids") or query.get("min_available") is not None:
+                spot_finder = self.get_counting_spot_finder(
+                    busy_by_user,
+                    query["after"],
+                    query["before"],
+                    query["duration_minutes"],
+                    query["user_ids"],
+                    query.get("optional_user_ids", set()),
+                    query.get("min_available"),
+                    query.get("granularity_minutes"),
+                    query.get("working_hours"),
+                    query.get("user_working_hours"),
+                )
+                results.append(
+                    spot_finder.search_spots(
+                        query.get("max_results", 1), query.get("min_gap_minutes", 0)
+                    )
+                )
+                continue
+
+            spot_finder = self.get_spot_finder(
+                query["after"],
+                query["before"],
+                query["duration_minutes"],
+                query.get("granularity_minutes"),
+                strategy,
+            )
+            self.restrict_to_working_hours(
+                spot_finder,
+                query["user_ids"],
+                query.get("working_hours"),
+                query.get("user_working_hours"),
+            )
+            spot_finder.init_occupancy()
+            for user_id in query["user_ids"]:
+                spot_finder.add_busy_intervals(busy_by_user[user_id])
+
+            results.append(
+                spot_finder.search_spots(
+                    query.get("max_results", 1), query.get("min_gap_minutes", 0)
+                )
+            )
+
+        return results
+
+    def get_spot_finder(
+        self,
+        after: datetime.datetime,
+        before: datetime.datetime,
+        duration_minutes: int,
+        granularity_minutes: Optional[int] = None,
+        strategy: Optional[str] = None,
+    ) -> BaseFreeSpotFinder:
+        finder_class = FREE_SPOT_FINDERS[strategy or settings.FREE_SPOT_STRATEGY]
+        return finder_class(
+            after,
+            before,
+            duration_minutes,
+            granularity_minutes or settings.FREE_SPOT_GRANULARITY_MINUTES,
+        )
+
+    @staticmethod
+    def get_counting_spot_finder(
+        busy_by_user: dict[
+            uuid.UUID, list[tuple[datetime.datetime, datetime.datetime]]
+        ],
+        after: datetime.datetime,
+        before: datetime.datetime,
+        duration_minutes: int,
+        user_ids: set[uuid.UUID],
+        optional_user_ids: set[uuid.UUID],
+        min_available: Optional[int] = None,
+        granularity_minutes: Optional[int] = None,
+        working_hours: Optional[WorkingHoursSchema] = None,
+        user_working_hours: Optional[dict[uuid.UUID, WorkingHoursSchema]] = None,
+    ) -> CountingFreeSpotFinder:
+        """
+        Return counting finder with occupancy of required `user_ids` and `optional_user_ids`.
+
+        `min_available` defaults to required `user_ids`, so optional attendees
+        never block a spot unless it asks for them. Unlike `restrict_to_working_hours`,
+        every user is only unavailable outside of own working hours.
+        """
+        user_working_hours = user_working_hours or {}
+        spot_finder = CountingFreeSpotFinder(
+            after,
+            before,
+            duration_minutes,
+            granularity_minutes or settings.FREE_SPOT_GRANULARITY_MINUTES,
+            user_ids | optional_user_ids,
+            user_ids,
+            min_available,
+        )
+        spot_finder.init_occupancy()
+
+        for user_id in spot_finder.user_ids:
+            spot_finder.add_user_busy_intervals(user_id, busy_by_user[user_id])
+
+            hours = user_working_hours.get(user_id, working_hours)
+            if hours is not None:
+                spot_finder.add_user_disallowed(
+                    user_id,
+                    get_allowed_mask(
+                        hours,
+                        spot_finder.origin,
+                        spot_finder.length,
+                        spot_finder.granularity,
+                    ),
+                )
+
+        return spot_finder
+
+    async def get_availability_heatmap(
+        self,
+        user_ids: set[uuid.UUID],
+        after: datetime.datetime,
+        before: datetime.datetime,
+        granularity_minutes: int,
+        working_hours: Optional[WorkingHoursSchema] = None,
+        user_working_hours: Optional[dict[uuid.UUID, WorkingHoursSchema]] = None,
+    ) -> tuple[datetime.datetime, list[int]]:
+        """
+        Count `user_ids` free in every slot of `granularity_minutes` within `after`-`before`.
+
+        Return start of the first slot and counts, slots are aligned like in free spot search.
+        """
+        busy_by_user = await self.get_busy_intervals(user_ids, after, before)
+        # shortest duration makes finder cover every whole slot up to `before`
+        spot_finder = self.get_counting_spot_finder(
+            busy_by_user,
+            after,
+            before,
+            1,
+            set(),
+            user_ids,
+            granularity_minutes=granularity_minutes,
+            working_hours=working_hours,
+            user_working_hours=user_working_hours,
+        )
+        available, _ = spot_finder.count_available(1)
+        return spot_finder.origin, available.tolist()
 
+    @staticmethod
+    def restrict_to_working_hours(
+        spot_finder: BaseFreeSpotFinder,
+        user_ids: set[uuid.UUID],
+        working_hours: Optional[WorkingHoursSchema] = None,
+        user_working_hours: Optional[dict[uuid.UUID, WorkingHoursSchema]] = None,
+    ):
+        """
+        Restrict `spot_finder` to intersection of working hours of `user_ids`.
+
+        `user_working_hours` override `working_hours` for specific users,
+        users without any working hours are available all day.
+        """
+        user_working_hours = user_working_hours or {}
+        all_working_hours = {
+            user_working_hours.get(user_id, working_hours) for user_id in user_ids
+        } - {None}
+
+        for hours in all_working_hours:
+            spot_finder.restrict(
+                get_allowed_mask(
+                    hours,
+                    spot_finder.origin,
+                    spot_finder.length,
+                    spot_finder.granularity,
+                )
+            )
+
+    async def get_busy_intervals(
+        self,
+        user_ids: set[uuid.UUID],
+        after: datetime.datetime,
+        before: datetime.datetime,
+    ) -> dict[uuid.UUID, list[tuple[datetime.datetime, datetime.datetime]]]:
+        """Return merged busy intervals of each of `user_ids` clipped to `after`-`before`."""
+        async for session in get_async_session():
             events = (
                 await session.execute(
-                    self.get_event_query_for_user_ids(user_ids, before)
+                    self.get_event_query_for_user_ids(user_ids, after, before).options(
+                        selectinload(Event.invites)
+                    )
                 )
             ).scalars()
 
-            spot_finder = FreeSpotFinder(after, before, duration_minutes)
-            return spot_finder.find(events)
+            busy_by_user = self.get_busy_intervals_by_user(
+                events, user_ids, after, before
+            )
+
+        # intervals are sorted and do not overlap, clipping keeps it so
+        return {
+            user_id: [
+                (max(start, after), min(end, before))
+                for start, end in intervals
+                if end > after and start < before
+            ]
+            for user_id, intervals in busy_by_user.items()
+        }
+
+    @staticmethod
+    def get_busy_intervals_by_user(
+        events: Iterable[Event],
+        user_ids: set[uuid.UUID],
+        after: datetime.datetime,
+        before: datetime.datetime,
+    ) -> dict[uuid.UUID, list[tuple[datetime.datetime, datetime.datetime]]]:
+        """
+        Expand every event once and return merged busy intervals of each of `user_ids`.
+
+        Event makes busy its owner and users who accepted invite to it,
+        `Event.invites` should be loaded.
+        """
+        intervals_by_user = {user_id: [] for user_id in user_ids}
+
+        for event in events:
+            participants = {event.owner_id} | {
+                invite.user_id for invite in event.invites if invite.is_accepted
+            }
+            participants &= user_ids
+            if not participants:
+                continue
+
+            duration = relativedelta(minutes=event.duration_minutes)
+            intervals = [
+                (start, start + duration)
+                for start in event.generate_for_timeperiod(after, before)
+            ]
+            for user_id in participants:
+                intervals_by_user[user_id].extend(intervals)
+
+        return {
+            user_id: merge_busy_intervals(intervals)
+            for user_id, intervals in intervals_by_user.items()
+        }
 
     async def list_events_for_user(
         self,
@@ -104,55 +525,211 @@ class EventService:
         after: datetime.datetime,
         before: datetime.datetime,
         event_id_gt: int,
-    ) -> list[EventWithOccurrencesSchema]:
+        limit: Optional[int] = None,
+        occurrence_format: OccurrenceFormat = OccurrenceFormat.full,
+    ) -> list[Union[EventWithOccurrencesSchema, EventWithCompactOccurrencesSchema]]:
+        """
+        Return up to `limit` events with occurrences of user with ids after `event_id_gt`.
+
+        Events are loaded and expanded in id ordered batches, until `limit` events
+        with occurrences are found, so cost depends on page size, not on number of events.
+        """
+        batch_size = limit or settings.EVENT_LIST_BATCH_SIZE
+
         async for session in get_async_session():
+            events_with_occurrences = []
 
-            # TODO: find a way to load smaller set of events from DB
-            events = (
-                (
-                    await session.execute(
-                        self.get_event_query_for_user_ids({user_id}, before)
+            while limit is None or len(events_with_occurrences) < limit:
+                # ended series are filtered by `series_end`, recurring events without
+                # occurrences in the window are dropped by expansion
+                events = (
+                    await session.scalars(
+                        self.get_event_query_for_user_ids({user_id}, after, before)
                         .filter(Event.id > event_id_gt)
-                        .order_by("id")
-                        .options(joinedload(Event.invites))
+                        .order_by(Event.id)
+                        .limit(batch_size)
+                        .options(selectinload(Event.invites))
+                    )
+                ).all()
+
+                events_with_occurrences.extend(
+                    await self.expand_events(
+                        session, events, after, before, occurrence_format
                     )
                 )
-                .unique()
-                .scalars()
+
+                if len(events) < batch_size:
+                    break
+                event_id_gt = events[-1].id
+
+            return events_with_occurrences[:limit]
+
+    async def list_agenda_for_user(
+        self,
+        user_id: uuid.UUID,
+        after: datetime.datetime,
+        before: datetime.datetime,
+        limit: int,
+        cursor: Optional[tuple[datetime.datetime, int]] = None,
+    ) -> list[tuple[datetime.datetime, Event]]:
+        """
+        Return up to `limit` earliest (start, event) occurrences of user after `cursor`.
+
+        Occurrences are ordered by start and event id. Every event is expanded lazily
+        and merged through a heap, so expansion stops at the last returned occurrence.
+        """
+        if cursor is not None:
+            # occurrences before cursor were returned already
+            after = max(after, cursor[0])
+
+        async for session in get_async_session():
+            events = (
+                await session.scalars(
+                    self.get_event_query_for_user_ids({user_id}, after, before)
+                )
+            ).all()
+
+            agenda = list(
+                itertools.islice(
+                    heapq.merge(
+                        *(iter_agenda(event, after, before, cursor) for event in events)
+                    ),
+                    limit,
+                )
             )
 
-            events_with_occurrences = []
+            # invites are loaded only for events of returned occurrences
+            await session.scalars(
+                select(Event)
+                .filter(Event.id.in_({event_id for _, event_id, _ in agenda}))
+                .options(selectinload(Event.invites))
+            )
+
+            return [(start, event) for start, _, event in agenda]
+
+    async def stream_events_for_user(
+        self,
+        user_id: uuid.UUID,
+        after: datetime.datetime,
+        before: datetime.datetime,
+    ) -> AsyncIterator[EventWithOccurrencesSchema]:
+        """
+        Yield all events with occurrences of user ordered by id.
 
-            for event in events:
-                event_occurrences = []
+        Rows are read with a server side cursor in partitions of `EVENT_STREAM_BATCH_SIZE`
+        and expanded as they arrive. Session identity map holds loaded events weakly,
+        so memory does not grow with number of events.
+        """
+        async for session in get_async_session():
+            result = await session.stream_scalars(
+                self.get_event_query_for_user_ids({user_id}, after, before)
+                .order_by(Event.id)
+                .options(selectinload(Event.invites))
+                .execution_options(yield_per=settings.EVENT_STREAM_BATCH_SIZE)
+            )
 
-                for event_start in event.generate_for_timeperiod(after, before):
-                    event_occurrences.append(event_start)
+            async for events in result.partitions():
+                for event in await self.expand_events(session, events, after, before):
+                    yield event
 
-                if event_occurrences:
-                    event.occurrences = event_occurrences
-                    events_with_occurrences.append(
-                        EventWithOccurrencesSchema.from_orm(event)
-                    )
+    async def expand_events(
+        self,
+        session: AsyncSession,
+        events: list[Event],
+        after: datetime.datetime,
+        before: datetime.datetime,
+        occurrence_format: OccurrenceFormat = OccurrenceFormat.full,
+    ) -> list[Union[EventWithOccurrencesSchema, EventWithCompactOccurrencesSchema]]:
+        """
+        Return `events` having occurrences in `after`-`before`, with the occurrences.
 
-            return events_with_occurrences
+        `occurrence_format=compact` describes occurrences with `CompactOccurrencesSchema`.
+        """
+        materialized = await self.get_materialized_starts(
+            session,
+            [e.id for e in events if occurrences.is_materialized(e, before)],
+            after,
+            before,
+        )
 
-    def get_event_query_for_user_ids(self, user_ids, before):
-        """Return query for selecting event for specified user_ids."""
-        # TODO: filter only is_active events here
-        return (
-            select(Event)
+        events_with_occurrences = []
+
+        for event in events:
+            if event.id in materialized:
+                event_occurrences = materialized[event.id]
+            else:
+                event_occurrences = list(event.generate_for_timeperiod(after, before))
+
+            if not event_occurrences:
+                continue
+
+            if occurrence_format == OccurrenceFormat.compact:
+                event.occurrences = CompactOccurrencesSchema.from_datetimes(
+                    event_occurrences
+                )
+                events_with_occurrences.append(
+                    EventWithCompactOccurrencesSchema.from_orm(event)
+                )
+            else:
+                event.occurrences = event_occurrences
+                events_with_occurrences.append(
+                    EventWithOccurrencesSchema.from_orm(event)
+                )
+
+        return events_with_occurrences
+
+    @staticmethod
+    async def get_materialized_starts(
+        session: AsyncSession,
+        event_ids: list[int],
+        after: datetime.datetime,
+        before: datetime.datetime,
+    ) -> dict[int, list[datetime.datetime]]:
+        """Return starts of materialized occurrences of `event_ids` overlapping `after`-`before`."""
+        starts = {event_id: [] for event_id in event_ids}
+        if not event_ids:
+            return starts
+
+        rows = await session.execute(
+            select(EventOccurrence.event_id, EventOccurrence.start)
             .filter(
-                Event.owner_id.in_(user_ids)
-                | Event.id.in_(
-                    select(EventInvite.event_id)
-                    .filter(
-                        EventInvite.user_id.in_(user_ids),
-                        EventInvite.is_accepted == True,
-                    )
-                    .distinct()
+                EventOccurrence.event_id.in_(event_ids),
+                EventOccurrence.start <= before,
+                EventOccurrence.end >= after,
+            )
+            .order_by(EventOccurrence.event_id, EventOccurrence.start)
+        )
+        for event_id, start in rows:
+            starts[event_id].append(start)
+
+        return starts
+
+    def get_event_query_for_user_ids(self, user_ids, after, before):
+        """Return query for selecting events of specified user_ids overlapping `after`-`before`."""
+        # TODO: filter only is_active events here
+        time_filter = (
+            Event.start <= before,
+            or_(Event.series_end.is_(None), Event.series_end >= after),
+        )
+        return select(Event).filter(
+            self.get_visibility_filter(user_ids, *time_filter), *time_filter
+        )
+
+    @staticmethod
+    def get_visibility_filter(user_ids, *owned_filter):
+        """
+        Return filter of events owned by `user_ids` or with accepted invites of them.
+
+        Owned and invited event ids are selected by separate UNION ALL branches, so each
+        one is driven by its own index, `owned_filter` narrows owned events branch.
+        Duplicate ids are dropped by IN semi join, not by DISTINCT over whole rows.
+        """
+        return Event.id.in_(
+            union_all(
+                select(Event.id).filter(Event.owner_id.in_(user_ids), *owned_filter),
+                select(EventInvite.event_id).filter(
+                    EventInvite.user_id.in_(user_ids),
+                    EventInvite.is_accepted == True,
                 ),
-                Event.start <= before,
             )
-            .distinct()
         )
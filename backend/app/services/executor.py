@@ -0,0 +1,80 @@
+"""
+Process pool for CPU-bound work, like occurrences expansion and free spot search.
+
+Pool is started lazily with `FREE_SPOT_EXECUTOR_WORKERS` processes and is shared
+by all requests of the process, when the setting is 0 work is done in the event loop.
+"""
+import asyncio
+import datetime
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, NamedTuple, Optional, TypeVar
+
+from app.core.config import settings
+from app.models import Event
+from app.models.event import generate_event_occurrences
+from app.schemas.recurrence import RecurrenceSchema
+
+T = TypeVar("T")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class CompactEvent(NamedTuple):
+    """Event fields needed to generate its occurrences, cheap to send to worker."""
+
+    start: datetime.datetime
+    duration_minutes: int
+    recurrence: Optional[RecurrenceSchema]
+
+    @classmethod
+    def from_event(cls, event: Event) -> "CompactEvent":
+        return cls(event.start, event.duration_minutes, event.recurrence)
+
+    def generate_for_timeperiod(
+        self, after: datetime.datetime, before: datetime.datetime
+    ):
+        return generate_event_occurrences(
+            self.start, self.duration_minutes, self.recurrence, after, before
+        )
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+
+    if settings.FREE_SPOT_EXECUTOR_WORKERS <= 0:
+        return None
+
+    if _executor is None:
+        # forking a process with running event loop and db connections is not safe
+        _executor = ProcessPoolExecutor(
+            settings.FREE_SPOT_EXECUTOR_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+async def run_in_executor(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run `func` in worker process, or right away if executor is disabled.
+
+    `func` and its arguments are pickled, so they should be top-level functions,
+    bound methods of picklable objects and plain data.
+    """
+    executor = get_executor()
+    if executor is None:
+        return func(*args, **kwargs)
+
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, functools.partial(func, *args, **kwargs)
+    )
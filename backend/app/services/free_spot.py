@@ -0,0 +1,527 @@
+import bisect
+import datetime
+import heapq
+import uuid
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from bitarray import bitarray, frozenbitarray, util
+from dateutil.relativedelta import relativedelta
+
+from app.core.config import settings
+from app.models import Event
+from app.services.occurrence_batch import EventColumns, expand_events
+from app.services.spot_search import SEARCH_BACKENDS
+
+
+def ceil_div(a: int, b: int) -> int:
+    return -(-a // b)
+
+
+def merge_busy_intervals(
+    intervals: Iterable[tuple[datetime.datetime, datetime.datetime]]
+) -> list[tuple[datetime.datetime, datetime.datetime]]:
+    """Return sorted list of non-overlapping (start, end) intervals covering `intervals`."""
+    merged = []
+
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def iter_runs(bits: bitarray, value: int) -> Iterator[tuple[int, int]]:
+    """Yield (start, end) of every run of `value` bits."""
+    run_start = bits.find(value)
+
+    while run_start != -1:
+        run_end = bits.find(1 - value, run_start)
+        if run_end == -1:
+            run_end = len(bits)
+
+        yield run_start, run_end
+        run_start = bits.find(value, run_end)
+
+
+class BaseFreeSpotFinder:
+    """
+    Finder of free spots in schedule of multiple events.
+
+    Works by iterating over events and marking their occurrences as occupied,
+    the way occupancy is stored and searched is up to subclasses.
+
+    Occupancy is kept in slots of `granularity` minutes aligned to the grid
+    (multiples of `granularity` minutes since epoch), slot 0 starts at `origin`.
+    Slot is occupied if any of its minutes is occupied, so coarse grid never
+    returns busy spot, but may miss spots not aligned to the grid.
+
+    Spot is searched among first `length` slots after `origin`.
+
+    Search may be restricted to slots set in `allowed` mask, see `restrict`.
+    """
+
+    def __init__(
+        self,
+        after: datetime.datetime,
+        before: datetime.datetime,
+        duration: int,
+        granularity: int = 1,
+    ):
+        self.after = after
+        self.before = before
+        self.duration = duration
+        self.granularity = granularity
+
+        after_minute = int(after.timestamp()) // 60
+        self.origin = after + relativedelta(
+            minutes=ceil_div(after_minute, granularity) * granularity - after_minute
+        )
+        self.duration_slots = ceil_div(duration, granularity)
+        self.length = max(
+            self.get_diff_in_minutes(
+                self.before - relativedelta(minutes=self.duration - 1), self.origin
+            )
+            // granularity,
+            0,
+        )
+        self.allowed: Optional[frozenbitarray] = None
+
+    def restrict(self, mask: frozenbitarray):
+        """Allow spots only in slots set in `mask` of `length` bits, masks are ANDed."""
+        self.allowed = mask if self.allowed is None else self.allowed & mask
+
+    def find(self, events: Iterable[Event]) -> Optional[datetime.datetime]:
+        spots = self.find_many(events)
+        return spots[0] if spots else None
+
+    def find_many(
+        self, events: Iterable[Event], max_results: int = 1, min_gap_minutes: int = 0
+    ) -> list[datetime.datetime]:
+        """
+        Return up to `max_results` earliest non-overlapping spots.
+
+        Occupancy is built once, every next spot starts at least `min_gap_minutes`
+        after the end of the previous one.
+        """
+        self.init_occupancy()
+        self.add_events(events)
+        return self.search_spots(max_results, min_gap_minutes)
+
+    def add_events(self, events: Iterable[Event]):
+        for event in events:
+            for event_start in event.generate_for_timeperiod(self.after, self.before):
+                self.add_occurrence(event_start, event.duration_minutes)
+
+    def find_many_columns(
+        self, columns: EventColumns, max_results: int = 1, min_gap_minutes: int = 0
+    ) -> list[datetime.datetime]:
+        """Same as `find_many`, but events are expanded in batch, see `expand_events`."""
+        self.init_occupancy()
+        self.add_occurrence_arrays(
+            *expand_events(columns, self.after, self.before, self.origin)
+        )
+        return self.search_spots(max_results, min_gap_minutes)
+
+    def add_occurrence_arrays(self, starts: np.ndarray, durations: np.ndarray):
+        """Mark occurrences with `starts` in minutes since `origin` as occupied."""
+        slot_starts = starts // self.granularity
+        slot_ends = -(-(starts + durations) // self.granularity)
+
+        for start, end in zip(slot_starts.tolist(), slot_ends.tolist()):
+            self.add_busy(start, end)
+
+    def add_busy_intervals(
+        self, intervals: Iterable[tuple[datetime.datetime, datetime.datetime]]
+    ):
+        for start, end in intervals:
+            self.add_occurrence(start, self.get_diff_in_minutes(end, start))
+
+    def add_busy_bitmap(self, start: datetime.datetime, bitmap: frozenbitarray):
+        """Mark minutes set in `bitmap` as occupied, bit 0 is the minute starting at `start`."""
+        bias = self.get_diff_in_minutes(start, self.origin)
+
+        for run_start, run_end in iter_runs(bitmap, 1):
+            self.add_busy(
+                (bias + run_start) // self.granularity,
+                ceil_div(bias + run_end, self.granularity),
+            )
+
+    def add_disallowed(self):
+        """Mark slots not set in `allowed` mask as occupied."""
+        if self.allowed is None:
+            return
+
+        for run_start, run_end in iter_runs(self.allowed, 0):
+            self.add_busy(run_start, run_end)
+
+    def search_spots(
+        self, max_results: int = 1, min_gap_minutes: int = 0
+    ) -> list[datetime.datetime]:
+        """Search spots in occupancy built with `add_*` methods."""
+        spots = []
+        search_from = 0
+        gap_slots = ceil_div(min_gap_minutes, self.granularity)
+
+        while len(spots) < max_results:
+            start = self.find_spot_in_occupancy(search_from)
+            if start is None:
+                break
+
+            spots.append(self.origin + relativedelta(minutes=start * self.granularity))
+            search_from = start + self.duration_slots + gap_slots
+
+        return spots
+
+    def add_occurrence(self, start: datetime.datetime, duration_minutes: int):
+        """Mark every slot touched by occurrence as occupied."""
+        bias = self.get_diff_in_minutes(start, self.origin)
+        self.add_busy(
+            bias // self.granularity,
+            ceil_div(bias + duration_minutes, self.granularity),
+        )
+
+    def init_occupancy(self):
+        raise NotImplementedError
+
+    def add_busy(self, start: int, end: int):
+        """Mark slots from `start` to `end` (exclusive) as occupied, `start` may be negative."""
+        raise NotImplementedError
+
+    def find_spot_in_occupancy(self, start: int = 0) -> Optional[int]:
+        """Return first free spot at or after `start` slot."""
+        raise NotImplementedError
+
+    def get_diff_in_minutes(self, dt1: datetime.datetime, dt2: datetime.datetime):
+        return int((dt1 - dt2).total_seconds()) // 60
+
+
+class FreeSpotFinder(BaseFreeSpotFinder):
+    """
+    Keeps one bit per slot of the window.
+
+    Free spot is then looked up with one of `SEARCH_BACKENDS`.
+    """
+
+    def __init__(
+        self,
+        after: datetime.datetime,
+        before: datetime.datetime,
+        duration: int,
+        granularity: int = 1,
+        search_backend: Optional[str] = None,
+    ):
+        super().__init__(after, before, duration, granularity)
+        self.search = SEARCH_BACKENDS[
+            search_backend or settings.FREE_SPOT_SEARCH_BACKEND
+        ]
+        self.bitarray = None
+
+    def init_occupancy(self):
+        if self.allowed is not None:
+            self.bitarray = ~bitarray(self.allowed)
+            return
+
+        self.bitarray = bitarray(self.length)
+        self.bitarray.setall(0)
+
+    def add_busy(self, start: int, end: int):
+        self.bitarray[max(start, 0) : max(end, 0)] = 1
+
+    def add_busy_bitmap(self, start: datetime.datetime, bitmap: frozenbitarray):
+        if self.granularity != 1:
+            return super().add_busy_bitmap(start, bitmap)
+
+        # minutes are slots, OR overlapping part of bitmap right into occupancy
+        bias = self.get_diff_in_minutes(start, self.origin)
+        lo, hi = max(-bias, 0), min(len(bitmap), self.length - bias)
+        if lo < hi:
+            self.bitarray[bias + lo : bias + hi] |= bitmap[lo:hi]
+
+    def add_occurrence_arrays(self, starts: np.ndarray, durations: np.ndarray):
+        # occupancy counters are built from +1/-1 at ends of occurrences with cumsum
+        slot_starts = np.clip(starts // self.granularity, 0, self.length)
+        slot_ends = np.clip(
+            -(-(starts + durations) // self.granularity), 0, self.length
+        )
+        deltas = np.bincount(slot_starts, minlength=self.length + 1) - np.bincount(
+            slot_ends, minlength=self.length + 1
+        )
+
+        occupied = bitarray()
+        occupied.frombytes(np.packbits(np.cumsum(deltas[:-1]) > 0).tobytes())
+        self.bitarray |= occupied[: self.length]
+
+    def find_spot_in_occupancy(self, start: int = 0):
+        return self.search(self.bitarray, self.duration_slots, start)
+
+
+class IntervalFreeSpotFinder(BaseFreeSpotFinder):
+    """
+    Keeps list of occupied intervals and sweeps over them once sorted and merged.
+
+    Memory and time depend on number of occurrences, not on the window length,
+    which makes it cheap for long windows and sparse calendars.
+    """
+
+    def __init__(
+        self,
+        after: datetime.datetime,
+        before: datetime.datetime,
+        duration: int,
+        granularity: int = 1,
+    ):
+        super().__init__(after, before, duration, granularity)
+        self.intervals = None
+        self.merged = None
+
+    def init_occupancy(self):
+        self.intervals = []
+        self.merged = None
+        self.add_disallowed()
+
+    def add_busy(self, start: int, end: int):
+        start = max(start, 0)
+        if end > start:
+            self.intervals.append((start, end))
+
+    def merge_intervals(self):
+        """Sort intervals and merge overlapping ones into `merged` starts and ends."""
+        self.intervals.sort()
+        starts, ends = [], []
+
+        for start, end in self.intervals:
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+
+        self.merged = starts, ends
+
+    def find_spot_in_occupancy(self, start: int = 0):
+        if self.merged is None:
+            self.merge_intervals()
+
+        starts, ends = self.merged
+        free_from = start
+
+        # skip intervals ending before `start`, merged intervals do not overlap
+        for i in range(bisect.bisect_right(ends, start), len(starts)):
+            if starts[i] - free_from >= self.duration_slots:
+                break
+            free_from = max(free_from, ends[i])
+
+        if free_from + self.duration_slots > self.length:
+            return None
+
+        return free_from
+
+
+class LazyFreeSpotFinder(FreeSpotFinder):
+    """
+    Advances through the window in chunks and stops as soon as spots are found.
+
+    Occurrences are pulled from events generators only up to the end of current
+    chunk, so events are expanded only as far as needed. Chunk is searched together
+    with trailing free slots of the previous one, so spots crossing chunk borders
+    are found too.
+
+    Occupancy of busy intervals and bitmaps is not lazy and is inherited from
+    `FreeSpotFinder`.
+    """
+
+    def __init__(
+        self,
+        after: datetime.datetime,
+        before: datetime.datetime,
+        duration: int,
+        granularity: int = 1,
+        search_backend: Optional[str] = None,
+        chunk_minutes: Optional[int] = None,
+    ):
+        super().__init__(after, before, duration, granularity, search_backend)
+        self.chunk_slots = ceil_div(
+            chunk_minutes or settings.FREE_SPOT_LAZY_CHUNK_MINUTES, granularity
+        )
+
+    def find_many(
+        self, events: Iterable[Event], max_results: int = 1, min_gap_minutes: int = 0
+    ) -> list[datetime.datetime]:
+        occurrences = heapq.merge(*(self.iter_busy(event) for event in events))
+        pending = next(occurrences, None)
+        # end of occupancy of occurrences from previous chunks
+        busy_until = 0
+
+        spots = []
+        search_from = 0
+        gap_slots = ceil_div(min_gap_minutes, self.granularity)
+        chunk_start = 0
+        carry = 0
+
+        while chunk_start < self.length and len(spots) < max_results:
+            chunk_end = min(chunk_start + self.chunk_slots, self.length)
+            # chunk[0] is `offset` slot, first `carry` slots are free slots of previous chunk
+            offset = chunk_start - carry
+            chunk = bitarray(chunk_end - offset)
+            chunk.setall(0)
+            if self.allowed is not None:
+                chunk[carry:] = ~self.allowed[chunk_start:chunk_end]
+            chunk[carry : max(busy_until - offset, carry)] = 1
+
+            while pending is not None and pending[0] < chunk_end:
+                start, end = pending
+                chunk[max(start - offset, 0) : max(end - offset, 0)] = 1
+                busy_until = max(busy_until, end)
+                pending = next(occurrences, None)
+
+            while len(spots) < max_results:
+                spot = self.search(
+                    chunk, self.duration_slots, max(search_from - offset, 0)
+                )
+                if spot is None:
+                    break
+
+                spots.append(
+                    self.origin
+                    + relativedelta(minutes=(offset + spot) * self.granularity)
+                )
+                search_from = offset + spot + self.duration_slots + gap_slots
+
+            carry = max(
+                min(
+                    self.get_trailing_free(chunk),
+                    chunk_end - search_from,
+                    self.duration_slots - 1,
+                ),
+                0,
+            )
+            chunk_start = chunk_end
+
+        return spots
+
+    def iter_busy(self, event: Event) -> Iterator[tuple[int, int]]:
+        """Yield busy (start, end) slots of event occurrences in chronological order."""
+        for event_start in event.generate_for_timeperiod(self.after, self.before):
+            bias = self.get_diff_in_minutes(event_start, self.origin)
+            yield bias // self.granularity, ceil_div(
+                bias + event.duration_minutes, self.granularity
+            )
+
+    @staticmethod
+    def get_trailing_free(bits: bitarray) -> int:
+        try:
+            return len(bits) - 1 - util.rindex(bits, 1)
+        except ValueError:
+            return len(bits)
+
+
+def get_window_free(busy: np.ndarray, window: int) -> np.ndarray:
+    """Return whether every `window` slots long run starting at each slot of `busy` is free."""
+    busy_before = np.concatenate(([0], np.cumsum(busy, dtype=np.int32)))
+    return busy_before[window:] == busy_before[:-window]
+
+
+class CountingFreeSpotFinder(BaseFreeSpotFinder):
+    """
+    Keeps busy slots of every user and counts users available for each spot.
+
+    Spot is found if all `required_user_ids` and at least `min_available` of
+    `user_ids` are free for its whole duration, so spots for k of n attendees
+    are found in one pass. `min_available` defaults to number of required users,
+    so other users never block a spot unless it asks for them.
+    Occupancy added with `add_busy` applies to all users, busy slots of specific
+    users are added with `add_user_busy_intervals`.
+    """
+
+    def __init__(
+        self,
+        after: datetime.datetime,
+        before: datetime.datetime,
+        duration: int,
+        granularity: int = 1,
+        user_ids: Iterable[uuid.UUID] = (),
+        required_user_ids: Iterable[uuid.UUID] = (),
+        min_available: Optional[int] = None,
+    ):
+        super().__init__(after, before, duration, granularity)
+        self.user_ids = list(user_ids)
+        self.required_user_ids = set(required_user_ids)
+        self.min_available = (
+            len(self.required_user_ids) if min_available is None else min_available
+        )
+        self.common_busy = None
+        self.user_busy = None
+        self.spots = None
+
+    def init_occupancy(self):
+        self.common_busy = np.zeros(self.length, dtype=bool)
+        self.user_busy = {
+            user_id: np.zeros(self.length, dtype=bool) for user_id in self.user_ids
+        }
+        self.spots = None
+        self.add_disallowed()
+
+    def add_busy(self, start: int, end: int):
+        self.common_busy[max(start, 0) : max(end, 0)] = True
+
+    def add_user_busy_intervals(
+        self,
+        user_id: uuid.UUID,
+        intervals: Iterable[tuple[datetime.datetime, datetime.datetime]],
+    ):
+        """Mark every slot touched by `intervals` as occupied for `user_id`."""
+        busy = self.user_busy[user_id]
+        for start, end in intervals:
+            bias = self.get_diff_in_minutes(start, self.origin)
+            slot_start = max(bias // self.granularity, 0)
+            slot_end = max(
+                ceil_div(bias + self.get_diff_in_minutes(end, start), self.granularity),
+                0,
+            )
+            busy[slot_start:slot_end] = True
+
+    def add_user_disallowed(self, user_id: uuid.UUID, allowed: frozenbitarray):
+        """Mark slots not set in `allowed` mask as occupied for `user_id`."""
+        self.user_busy[user_id] |= ~np.frombuffer(allowed.unpack(), dtype=bool)
+
+    def count_available(self, window: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Count users free for `window` slots starting at each slot.
+
+        Return number of available users and whether all required users are
+        available, for every slot a run of `window` slots fits from.
+        """
+        starts = max(self.length - window + 1, 0)
+        available = np.zeros(starts, dtype=np.int32)
+        required_available = np.ones(starts, dtype=bool)
+
+        for user_id, busy in self.user_busy.items():
+            user_free = get_window_free(busy | self.common_busy, window)
+            available += user_free
+            if user_id in self.required_user_ids:
+                required_available &= user_free
+
+        return available, required_available
+
+    def find_spot_in_occupancy(self, start: int = 0) -> Optional[int]:
+        if self.spots is None:
+            available, required_available = self.count_available(self.duration_slots)
+            self.spots = (
+                required_available
+                & (available >= self.min_available)
+                & get_window_free(self.common_busy, self.duration_slots)
+            )
+
+        found = np.flatnonzero(self.spots[start:])
+        return start + int(found[0]) if len(found) else None
+
+
+FREE_SPOT_FINDERS: dict[str, type[BaseFreeSpotFinder]] = {
+    "bitarray": FreeSpotFinder,
+    "interval": IntervalFreeSpotFinder,
+    "lazy": LazyFreeSpotFinder,
+}
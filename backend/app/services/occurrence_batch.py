@@ -0,0 +1,150 @@
+"""
+Columnar expansion of event occurrences with NumPy.
+
+Events are turned into columns once, occurrences of the whole window are then
+returned as int arrays, so no `datetime` is made per occurrence. Daily and weekly
+rules of events in fixed offset timezones are expanded with `numpy.arange`,
+other rules fall back to generating occurrences one by one.
+"""
+import datetime
+from typing import Iterable, NamedTuple, Optional, Union
+
+import numpy as np
+from dateutil import rrule
+
+from app.schemas.recurrence import (
+    DailyRule,
+    RecurrenceSchema,
+    SkipAheadRule,
+    WeeklyRule,
+    generate_rule_occurrences,
+)
+from app.services.rrule_cache import rrule_cache
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def get_timestamp(dt: datetime.datetime) -> int:
+    return int(dt.timestamp())
+
+
+class EventColumns(NamedTuple):
+    """Events as columns, `Event` and `CompactEvent` rows are both accepted."""
+
+    starts: np.ndarray  # seconds since epoch
+    durations: np.ndarray  # minutes
+    is_recurring: np.ndarray
+    recurrences: list[Optional[RecurrenceSchema]]
+    start_datetimes: list[datetime.datetime]
+
+    @classmethod
+    def from_events(cls, events: Iterable) -> "EventColumns":
+        start_datetimes, durations, recurrences = [], [], []
+        for event in events:
+            start_datetimes.append(event.start)
+            durations.append(event.duration_minutes)
+            recurrences.append(event.recurrence)
+
+        return cls(
+            starts=np.array([get_timestamp(dt) for dt in start_datetimes], np.int64),
+            durations=np.array(durations, np.int64),
+            is_recurring=np.array([r is not None for r in recurrences], bool),
+            recurrences=recurrences,
+            start_datetimes=start_datetimes,
+        )
+
+
+def expand_events(
+    columns: EventColumns,
+    after: datetime.datetime,
+    before: datetime.datetime,
+    origin: datetime.datetime,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return (start_minute_offset, duration) arrays of occurrences overlapping `after`-`before`.
+
+    Offsets are minutes since `origin`, occurrences are the same as generated
+    by `Event.generate_for_timeperiod`, but are not sorted.
+    """
+    before_ts = get_timestamp(before)
+    # lowest start of occurrence of every event still overlapping `after`
+    lows = get_timestamp(after) - columns.durations * 60
+    in_window = columns.starts <= before_ts
+
+    single = ~columns.is_recurring & in_window & (columns.starts >= lows)
+    starts = [columns.starts[single]]
+    durations = [columns.durations[single]]
+
+    for i in np.flatnonzero(columns.is_recurring & in_window).tolist():
+        duration = int(columns.durations[i])
+        rule = rrule_cache.get_rule(columns.recurrences[i], columns.start_datetimes[i])
+
+        occurrences = expand_rule(rule, int(lows[i]), before_ts)
+        if occurrences is None:
+            occurrences = np.fromiter(
+                (
+                    get_timestamp(occurrence)
+                    for occurrence in generate_rule_occurrences(
+                        rule, after, before, duration
+                    )
+                ),
+                np.int64,
+            )
+
+        starts.append(occurrences)
+        durations.append(np.full(len(occurrences), duration, np.int64))
+
+    return (
+        (np.concatenate(starts) - get_timestamp(origin)) // 60,
+        np.concatenate(durations),
+    )
+
+
+def expand_rule(
+    rule: Union[SkipAheadRule, rrule.rrule], low: int, high: int
+) -> Optional[np.ndarray]:
+    """
+    Return timestamps of occurrences of `rule` from `low` to `high` inclusive.
+
+    Returns None if rule is not a fixed step one, occurrences are then
+    generated one by one.
+    """
+    if not isinstance(rule, (DailyRule, WeeklyRule)):
+        return None
+    # wall clock and absolute time steps differ in timezones with DST
+    if not isinstance(rule.start.tzinfo, datetime.timezone):
+        return None
+
+    # occurrence is `period_start + period * step + offsets[j]`,
+    # first `skip` offsets of period 0 are before the start of series
+    if isinstance(rule, DailyRule):
+        period_start = get_timestamp(rule.start)
+        step = rule.interval * DAY_SECONDS
+        offsets = np.zeros(1, np.int64)
+        skip = 0
+    else:
+        period_start = get_timestamp(rule.combine(rule.week_start))
+        step = rule.interval * 7 * DAY_SECONDS
+        offsets = np.array(rule.day_offsets, np.int64) * DAY_SECONDS
+        skip = len(offsets) - rule.first_week_count
+
+    if rule.until:
+        high = min(high, get_timestamp(rule.until))
+
+    first_period = max((low - period_start - int(offsets[-1])) // step, 0)
+    last_period = (high - period_start - int(offsets[0])) // step
+    if rule.count:
+        last_period = min(last_period, (rule.count + skip - 1) // len(offsets))
+
+    if last_period < first_period:
+        return np.zeros(0, np.int64)
+
+    periods = np.arange(first_period, last_period + 1, dtype=np.int64)[:, None]
+    occurrences = period_start + periods * step + offsets
+    index = periods * len(offsets) + np.arange(len(offsets)) - skip
+
+    valid = (index >= 0) & (occurrences >= low) & (occurrences <= high)
+    if rule.count:
+        valid &= index < rule.count
+
+    return occurrences[valid]
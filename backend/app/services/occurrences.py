@@ -0,0 +1,123 @@
+"""
+Materialized occurrences of events.
+
+Occurrences of every event are written to `event_occurrence` table up to a rolling
+horizon of `OCCURRENCE_HORIZON_DAYS` and `Event.occurrences_until` is set to it.
+Background maintenance task extends them as time goes and rewrites stale ones,
+tasks of several workers share the work by row locks.
+
+Reads use rows of events materialized up to the end of the window and fall back
+to live expansion of other events, so results do not depend on materialization.
+"""
+import asyncio
+import datetime
+from typing import Optional
+
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.deps.db import get_async_session
+from app.models import Event, EventOccurrence
+
+# materialized events are extended only when lagging behind horizon by this much
+EXTEND_STEP = datetime.timedelta(days=1)
+
+
+def is_enabled() -> bool:
+    return settings.OCCURRENCE_HORIZON_DAYS > 0
+
+
+def get_horizon(now: Optional[datetime.datetime] = None) -> datetime.datetime:
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return now + datetime.timedelta(days=settings.OCCURRENCE_HORIZON_DAYS)
+
+
+def is_materialized(event: Event, before: datetime.datetime) -> bool:
+    """Whether all occurrences of `event` starting up to `before` are materialized."""
+    return event.occurrences_until is not None and event.occurrences_until >= before
+
+
+async def write_occurrences(
+    session: AsyncSession, event: Event, until: datetime.datetime
+):
+    """
+    Materialize occurrences of `event` starting up to `until`.
+
+    Only missing occurrences are written if `event` is already materialized,
+    otherwise (new event or stale occurrences) all of them are rewritten.
+    """
+    since = event.occurrences_until
+    if since is not None and since >= until:
+        return
+
+    if since is None:
+        await session.execute(
+            delete(EventOccurrence).where(EventOccurrence.event_id == event.id)
+        )
+
+    duration = datetime.timedelta(minutes=event.duration_minutes)
+    rows = [
+        {"event_id": event.id, "start": start, "end": start + duration}
+        for start in event.generate_for_timeperiod(since or event.start, until)
+        if since is None or start > since
+    ]
+    if rows:
+        await session.execute(insert(EventOccurrence), rows)
+
+    event.occurrences_until = until
+
+
+async def extend_occurrences(
+    session: AsyncSession, horizon: datetime.datetime, batch_size: int = 100
+) -> int:
+    """
+    Materialize occurrences of all events up to `horizon`, return number of updated events.
+
+    Batches are locked with SKIP LOCKED, so maintenance tasks of several workers
+    split events between them instead of writing the same occurrences.
+    """
+    updated = 0
+
+    while True:
+        events = (
+            await session.scalars(
+                select(Event)
+                .filter(
+                    or_(
+                        Event.occurrences_until.is_(None),
+                        and_(
+                            Event.occurrences_until < horizon - EXTEND_STEP,
+                            # every occurrence of ended series is written already
+                            or_(
+                                Event.series_end.is_(None),
+                                Event.series_end > Event.occurrences_until,
+                            ),
+                        ),
+                    )
+                )
+                .order_by(Event.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+        if not events:
+            return updated
+
+        for event in events:
+            await write_occurrences(session, event, horizon)
+        await session.commit()
+        updated += len(events)
+
+
+async def run_maintenance(interval: int):
+    """Extend materialized occurrences every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async for session in get_async_session():
+                updated = await extend_occurrences(session, get_horizon())
+                logger.info(f"materialized occurrences of {updated} events")
+        except Exception:
+            logger.exception("failed to materialize occurrences")
@@ -0,0 +1,62 @@
+import datetime
+from collections import OrderedDict
+from typing import Union
+
+from dateutil import rrule
+
+from app.core.config import settings
+from app.schemas.recurrence import RecurrenceSchema, SkipAheadRule
+
+
+class RRuleCache:
+    """
+    LRU cache of compiled recurrence rules, keyed by (immutable) recurrence and start.
+
+    Popular recurring events are parsed and compiled once per process
+    instead of once per request. Cache is disabled when `max_entries` is 0.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.rules: OrderedDict[
+            tuple[RecurrenceSchema, datetime.datetime],
+            Union[SkipAheadRule, rrule.rrule],
+        ] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_rule(
+        self, recurrence: RecurrenceSchema, start: datetime.datetime
+    ) -> Union[SkipAheadRule, rrule.rrule]:
+        """Return compiled rule of `recurrence` starting at `start`."""
+        if self.max_entries <= 0:
+            return self.compile(recurrence, start)
+
+        key = (recurrence, start)
+        rule = self.rules.get(key)
+
+        if rule is not None:
+            self.hits += 1
+            self.rules.move_to_end(key)
+            return rule
+
+        self.misses += 1
+        rule = self.rules[key] = self.compile(recurrence, start)
+        if len(self.rules) > self.max_entries:
+            self.rules.popitem(last=False)
+
+        return rule
+
+    @staticmethod
+    def compile(
+        recurrence: RecurrenceSchema, start: datetime.datetime
+    ) -> Union[SkipAheadRule, rrule.rrule]:
+        return recurrence.description.get_rule(start)
+
+    def clear(self):
+        self.rules.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+rrule_cache = RRuleCache(settings.RRULE_CACHE_MAX_ENTRIES)
@@ -0,0 +1,93 @@
+"""
+Search backends for free spots in occupancy bitarray.
+
+Every backend has the same signature: ``search(bits, length, start=0)`` and
+returns index of the first run of ``length`` free (zero) bits which starts at
+or after ``start``, or None if there is no such run.
+"""
+from typing import Callable, Optional
+
+from bitarray import bitarray
+
+SearchBackend = Callable[[bitarray, int, int], Optional[int]]
+
+
+def search_loop(bits: bitarray, length: int, start: int = 0) -> Optional[int]:
+    """
+    Reference implementation, walks bitarray one bit at a time.
+
+    Too slow for real windows, kept to check other backends against it.
+    """
+    current_len = 0
+    run_start = None
+
+    for i in range(start, len(bits)):
+        if bits[i] == 0:
+            if run_start is None:
+                run_start = i
+            current_len += 1
+        else:
+            run_start = None
+            current_len = 0
+
+        if current_len == length:
+            return run_start
+
+    return None
+
+
+def search_runs(bits: bitarray, length: int, start: int = 0) -> Optional[int]:
+    """
+    Jump from one run of free bits to another with native `bitarray.find`.
+
+    Number of python iterations is bounded by number of busy runs before the spot.
+    """
+    end = len(bits)
+
+    while True:
+        run_start = bits.find(0, start)
+        if run_start == -1 or run_start + length > end:
+            return None
+
+        busy = bits.find(1, run_start, run_start + length)
+        if busy == -1:
+            return run_start
+
+        start = busy + 1
+
+
+def and_window(bits: bitarray, length: int) -> bitarray:
+    """
+    Return bitarray where bit `i` is AND of `length` bits starting from `i`.
+
+    Takes O(log(length)) whole-array operations, bits past the end count as 0.
+    """
+    result = bits.copy()
+    span = 1
+
+    while span < length:
+        # result[i] is AND of `span` bits starting from i, extend it by `shift` bits
+        shift = min(span, length - span)
+        result &= result << shift
+        span += shift
+
+    return result
+
+
+def search_shift(bits: bitarray, length: int, start: int = 0) -> Optional[int]:
+    """
+    Shift-and-AND search.
+
+    Bit `i` of `free` is set when `length` bits starting from `i` are free.
+    """
+    free = and_window(~bits[start:], length)
+
+    index = free.find(1)
+    return None if index == -1 else start + index
+
+
+SEARCH_BACKENDS: dict[str, SearchBackend] = {
+    "loop": search_loop,
+    "runs": search_runs,
+    "shift": search_shift,
+}
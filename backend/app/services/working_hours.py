@@ -0,0 +1,62 @@
+import datetime
+import functools
+import zoneinfo
+
+from bitarray import bitarray, frozenbitarray
+
+from app.core.config import settings
+from app.schemas.free_spot import WorkingHoursSchema
+from app.schemas.recurrence import WEEKDAY_TO_INT
+from app.services.busy_cache import DAY, MINUTES_IN_DAY, get_day_start, get_days
+from app.services.spot_search import and_window
+
+
+@functools.lru_cache(maxsize=settings.WORKING_HOURS_MASK_CACHE_SIZE)
+def get_day_mask(
+    working_hours: WorkingHoursSchema, day: datetime.date
+) -> frozenbitarray:
+    """Return mask of `MINUTES_IN_DAY` bits, set for working minutes of UTC `day`."""
+    day_start = get_day_start(day)
+    tz = zoneinfo.ZoneInfo(working_hours.timezone)
+    int_weekdays = {WEEKDAY_TO_INT[wd] for wd in working_hours.weekdays}
+
+    mask = bitarray(MINUTES_IN_DAY)
+    mask.setall(0)
+
+    # working hours of local days neighbouring UTC day may overlap it
+    local_day = day_start.astimezone(tz).date() - DAY
+    for _ in range(3):
+        if local_day.weekday() in int_weekdays:
+            start = datetime.datetime.combine(local_day, working_hours.start, tz)
+            end = datetime.datetime.combine(local_day, working_hours.end, tz)
+            # only whole minutes are working
+            start_minute = -(-int((start - day_start).total_seconds()) // 60)
+            end_minute = int((end - day_start).total_seconds()) // 60
+            mask[max(start_minute, 0) : max(end_minute, 0)] = 1
+        local_day += DAY
+
+    return frozenbitarray(mask)
+
+
+@functools.lru_cache(maxsize=settings.WORKING_HOURS_MASK_CACHE_SIZE)
+def get_allowed_mask(
+    working_hours: WorkingHoursSchema,
+    origin: datetime.datetime,
+    length: int,
+    granularity: int,
+) -> frozenbitarray:
+    """
+    Return mask of `length` slots of `granularity` minutes starting from `origin`.
+
+    Slot is set if all its minutes are working minutes.
+    """
+    days = get_days(origin, origin + datetime.timedelta(minutes=length * granularity))
+
+    minutes = bitarray()
+    for day in days:
+        minutes.extend(get_day_mask(working_hours, day))
+
+    bias = int((origin - get_day_start(days[0])).total_seconds()) // 60
+    minutes = minutes[bias : bias + length * granularity]
+
+    return frozenbitarray(and_window(minutes, granularity)[::granularity])
@@ -0,0 +1,70 @@
+"""
+Compare per-event expansion cost with recurrence validated on every call and once per row.
+
+Run with `python -m benchmarks.event_expansion` from backend directory.
+"""
+import datetime
+import timeit
+
+from app.models.event import generate_event_occurrences
+from app.schemas.recurrence import RecurrenceSchema
+from app.services.rrule_cache import rrule_cache
+
+START = datetime.datetime(2020, 1, 6, 9, 0, tzinfo=datetime.timezone.utc)
+AFTER = datetime.datetime(2022, 6, 1, 0, 0, tzinfo=datetime.timezone.utc)
+BEFORE = AFTER + datetime.timedelta(days=1)
+DURATION_MINUTES = 30
+NUMBER = 20_000
+
+RECURRENCES = {
+    "daily": {"description": {"type": "daily", "interval": 1}},
+    "weekly": {
+        "description": {
+            "type": "weekly",
+            "interval": 1,
+            "weekdays": ["mon", "tue", "wed", "thu", "fri"],
+        }
+    },
+    "monthly": {
+        "description": {"type": "monthly", "interval": 1, "mode": "by_weekday"}
+    },
+}
+
+
+def expand_validating(recurrence: dict):
+    """Expansion as it was done with raw dict loaded from db."""
+    return list(
+        generate_event_occurrences(
+            START,
+            DURATION_MINUTES,
+            RecurrenceSchema(**recurrence),
+            AFTER,
+            BEFORE,
+        )
+    )
+
+
+def expand_loaded(recurrence: RecurrenceSchema):
+    return list(
+        generate_event_occurrences(START, DURATION_MINUTES, recurrence, AFTER, BEFORE)
+    )
+
+
+def main():
+    print(f"{'type':>8} {'validate':>12} {'expand':>12} {'speedup':>8}")
+
+    for name, recurrence in RECURRENCES.items():
+        model = RecurrenceSchema(**recurrence)
+        rrule_cache.clear()
+
+        validating = timeit.timeit(lambda: expand_validating(recurrence), number=NUMBER)
+        loaded = timeit.timeit(lambda: expand_loaded(model), number=NUMBER)
+
+        print(
+            f"{name:>8} {validating / NUMBER * 1e6:10.2f}us {loaded / NUMBER * 1e6:10.2f}us "
+            f"{validating / loaded:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Compare building and encoding of `GET /events` page by FastAPI (response model validation
+and `jsonable_encoder`) and by `FastJSONResponse`, with full and compact occurrences.
+
+Run with `python -m benchmarks.event_list_json` from backend directory.
+"""
+import asyncio
+import datetime
+import timeit
+import uuid
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from app.api.events import get_events, router
+from app.api.responses import FastJSONResponse
+from app.schemas.event import (
+    CompactOccurrencesSchema,
+    EventWithCompactOccurrencesSchema,
+    EventWithOccurrencesSchema,
+)
+from app.schemas.recurrence import RecurrenceSchema
+
+START = datetime.datetime(2022, 1, 3, 9, 0, tzinfo=datetime.timezone.utc)
+NUMBER = 20
+
+RECURRENCES = {
+    "weekly": RecurrenceSchema(
+        description={
+            "type": "weekly",
+            "interval": 1,
+            "weekdays": ["mon", "tue", "wed", "thu", "fri"],
+        }
+    ),
+    "daily": RecurrenceSchema(description={"type": "daily", "interval": 1}),
+}
+
+PAGES = {
+    # default page size, work week events over a month
+    "typical": {"events": 10, "recurrence": "weekly", "days": 31, "invites": 3},
+    # max page size, daily events over a year
+    "worst": {"events": 50, "recurrence": "daily", "days": 365, "invites": 20},
+}
+
+LOOP = asyncio.new_event_loop()
+RESPONSE_FIELD = next(
+    route.response_field for route in router.routes if route.endpoint is get_events
+)
+
+
+def make_rows(events: int, recurrence: str, days: int, invites: int) -> list[dict]:
+    """Return events with occurrences as they are before building response schemas."""
+    recurrence = RECURRENCES[recurrence]
+    occurrences = list(
+        recurrence.generate_for_timeperiod(
+            START, START + datetime.timedelta(days=days), START, 30
+        )
+    )
+    return [
+        {
+            "id": i,
+            "name": f"event {i}",
+            "start": START,
+            "duration_minutes": 30,
+            "recurrence": recurrence,
+            "owner_id": uuid.uuid4(),
+            "invites": [
+                {"user_id": uuid.uuid4(), "is_accepted": True} for _ in range(invites)
+            ],
+            "occurrences": occurrences,
+        }
+        for i in range(events)
+    ]
+
+
+def build_full(rows: list[dict]) -> dict:
+    return {
+        "events_with_occurrences": [EventWithOccurrencesSchema(**row) for row in rows],
+        "offset": len(rows),
+    }
+
+
+def build_compact(rows: list[dict]) -> dict:
+    return {
+        "events_with_occurrences": [
+            EventWithCompactOccurrencesSchema(
+                **{
+                    **row,
+                    "occurrences": CompactOccurrencesSchema.from_datetimes(
+                        row["occurrences"]
+                    ),
+                }
+            )
+            for row in rows
+        ],
+        "offset": len(rows),
+    }
+
+
+def encode_default(content: dict) -> bytes:
+    content = LOOP.run_until_complete(
+        serialize_response(field=RESPONSE_FIELD, response_content=content)
+    )
+    return JSONResponse(content).body
+
+
+def encode_fast(content: dict) -> bytes:
+    return FastJSONResponse(content).body
+
+
+def main():
+    print(
+        f"{'page':>8} {'format':>8} {'size':>9} {'default':>10} {'fast':>10} "
+        f"{'speedup':>8}"
+    )
+
+    for name, params in PAGES.items():
+        rows = make_rows(**params)
+
+        for format_name, build in (("full", build_full), ("compact", build_compact)):
+            body = encode_default(build(rows))
+            assert encode_fast(build(rows)) == body
+
+            default = timeit.timeit(lambda: encode_default(build(rows)), number=NUMBER)
+            fast = timeit.timeit(lambda: encode_fast(build(rows)), number=NUMBER)
+
+            print(
+                f"{name:>8} {format_name:>8} {len(body) / 1024:7.1f}KB "
+                f"{default / NUMBER * 1e3:8.2f}ms {fast / NUMBER * 1e3:8.2f}ms "
+                f"{default / fast:7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Compare free spot search backends across window sizes and fragmentation levels.
+
+Run with `python -m benchmarks.spot_search` from backend directory.
+"""
+import timeit
+
+from bitarray import bitarray
+
+from app.services.spot_search import SEARCH_BACKENDS
+
+WINDOWS_DAYS = [1, 7, 30, 90]
+# length of busy blocks, smaller blocks mean more fragmented schedule
+FRAGMENTATION = [480, 60, 5, 1]
+DURATION_MINUTES = 60
+
+
+def make_bitarray(size: int, block: int) -> bitarray:
+    """
+    Make occupancy bitarray with the only free spot at the very end.
+
+    Busy blocks are separated by gaps one minute shorter than the spot,
+    so every backend has to scan the whole window.
+    """
+    period = block + DURATION_MINUTES - 1
+    bits = bitarray(([1] * block + [0] * (DURATION_MINUTES - 1)) * (size // period))
+    bits.extend([0] * (size - len(bits)))
+    bits[-DURATION_MINUTES - 1] = 1
+    return bits
+
+
+def main():
+    print(f"{'window':>8} {'block':>6} " + "".join(f"{b:>12}" for b in SEARCH_BACKENDS))
+
+    for days in WINDOWS_DAYS:
+        for block in FRAGMENTATION:
+            bits = make_bitarray(days * 24 * 60, block)
+
+            timings = []
+            for search in SEARCH_BACKENDS.values():
+                number = 5
+                total = timeit.timeit(
+                    lambda: search(bits, DURATION_MINUTES), number=number
+                )
+                timings.append(f"{total / number * 1000:10.3f}ms")
+
+            print(f"{days:>7}d {block:>6} " + "".join(f"{t:>12}" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
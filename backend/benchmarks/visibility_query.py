@@ -0,0 +1,160 @@
+"""
+Compare visibility query of events as OR of owner and invite subquery with DISTINCT
+over whole rows and as UNION ALL of owned and invited ids, on 1M seeded events.
+
+Run with `python -m benchmarks.visibility_query` from backend directory, database
+of `DATABASE_URL` has to be migrated. Seeded rows are rolled back at the end.
+"""
+import datetime
+import time
+
+from sqlalchemy import or_, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connection, create_engine
+
+from app.core.config import settings
+from app.models import Event, EventInvite
+from app.services.event import EventService
+
+USERS = 10_000
+EVENTS_PER_USER = 100
+INVITES_PER_EVENT = 2
+NUMBER = 20
+
+START = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+
+QUERIES = {
+    # first page of `GET /events` over a month
+    "page": {"users": 1, "days": 31, "page": True},
+    # all events of user over seeded two years
+    "user": {"users": 1, "days": 730, "page": False},
+    # free spot search of a meeting over a week
+    "meeting": {"users": 10, "days": 7, "page": False},
+}
+
+
+def get_or_distinct_query(user_ids, after, before):
+    """Return visibility query as it was before UNION ALL branches."""
+    return (
+        select(Event)
+        .filter(
+            Event.owner_id.in_(user_ids)
+            | Event.id.in_(
+                select(EventInvite.event_id)
+                .filter(
+                    EventInvite.user_id.in_(user_ids),
+                    EventInvite.is_accepted == True,
+                )
+                .distinct()
+            ),
+            Event.start <= before,
+            or_(Event.series_end.is_(None), Event.series_end >= after),
+        )
+        .distinct()
+    )
+
+
+def seed(connection: Connection):
+    """Seed users with events spread over two years, half of invites accepted."""
+    connection.execute(
+        text(
+            "INSERT INTO users (id, email, hashed_password, is_active, "
+            "is_superuser, is_verified) "
+            "SELECT gen_random_uuid(), 'bench' || i || '@example.com', '', "
+            "true, false, true FROM generate_series(1, :users) i"
+        ),
+        {"users": USERS},
+    )
+    connection.execute(
+        text(
+            "INSERT INTO event (owner_id, name, start, duration_minutes) "
+            "SELECT id, 'event', "
+            "'2022-01-01'::timestamptz + random() * interval '730 days', 60 "
+            "FROM users, generate_series(1, :events)"
+        ),
+        {"events": EVENTS_PER_USER},
+    )
+    connection.execute(
+        text(
+            "INSERT INTO event_invite (event_id, user_id, is_accepted) "
+            "SELECT DISTINCT ON (event.id, user_id) event.id, "
+            "ids[1 + floor(random() * :users)::int] AS user_id, random() < 0.5 "
+            "FROM event, generate_series(1, :invites), "
+            "(SELECT array_agg(id) AS ids FROM users) users"
+        ),
+        {"users": USERS, "invites": INVITES_PER_EVENT},
+    )
+    connection.execute(text("ANALYZE users, event, event_invite"))
+
+
+def compile_query(query) -> tuple[str, dict]:
+    compiled = query.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"render_postcompile": True}
+    )
+    return str(compiled), compiled.params
+
+
+def run(connection: Connection, query) -> tuple[float, int, str]:
+    """Return mean time, number of rows and top plan node of `query`."""
+    sql, params = compile_query(query)
+    plan = connection.exec_driver_sql(f"EXPLAIN {sql}", params).first()[0]
+
+    rows = 0
+    started = time.perf_counter()
+    for _ in range(NUMBER):
+        rows = len(connection.exec_driver_sql(sql, params).fetchall())
+    return (time.perf_counter() - started) / NUMBER, rows, plan.split("  (")[0]
+
+
+def main():
+    engine = create_engine(settings.DATABASE_URL)
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            started = time.perf_counter()
+            seed(connection)
+            print(f"seeded in {time.perf_counter() - started:.1f}s")
+
+            user_ids = [
+                str(user_id)
+                for user_id, in connection.execute(
+                    text("SELECT id FROM users WHERE email LIKE 'bench%' LIMIT 10")
+                )
+            ]
+
+            print(
+                f"{'query':>8} {'rows':>6} {'or distinct':>12} {'union all':>12} "
+                f"{'speedup':>8}  plans"
+            )
+            for name, params in QUERIES.items():
+                args = (
+                    user_ids[: params["users"]],
+                    START,
+                    START + datetime.timedelta(days=params["days"]),
+                )
+                queries = [
+                    get_or_distinct_query(*args),
+                    EventService().get_event_query_for_user_ids(*args),
+                ]
+                if params["page"]:
+                    queries = [
+                        query.filter(Event.id > 0).order_by(Event.id).limit(100)
+                        for query in queries
+                    ]
+
+                (old, old_rows, old_plan), (new, new_rows, new_plan) = [
+                    run(connection, query) for query in queries
+                ]
+                assert old_rows == new_rows
+
+                print(
+                    f"{name:>8} {new_rows:>6} {old * 1e3:10.2f}ms {new * 1e3:10.2f}ms "
+                    f"{old / new:7.1f}x  {old_plan} -> {new_plan}"
+                )
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,26 @@
+import datetime
+import json
 import unittest.mock
+import uuid
+from zoneinfo import ZoneInfo
 
+import pytest
+from sqlalchemy import select
 from sqlalchemy.orm.session import Session
 from starlette.testclient import TestClient
 
 from app.core.config import settings
-from tests.factories import EventInviteFactory
+from app.models import Event, EventOccurrence
+from app.schemas.event import CompactOccurrencesSchema
+from app.schemas.recurrence import RecurrenceSchema, Weekdays
+from app.services.busy_cache import busy_cache
+from app.services.event import EventService
+from tests.factories import (
+    DailyRecurrenceSchemaFactory,
+    EventFactory,
+    EventInviteFactory,
+    WeeklyRecurrenceSchemaFactory,
+)
 from tests.utils import get_jwt_header
 
 
@@ -70,6 +86,190 @@ class TestGetEvents:
         }
 
 
+class TestCompactOccurrences:
+    @pytest.mark.parametrize("fast_json", [False, True])
+    def test_compact(
+        self, db: Session, client: TestClient, user, event, fast_json, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "EVENTS_FAST_JSON_RESPONSE", fast_json)
+        EventFactory(
+            owner=user,
+            recurrence=RecurrenceSchema(
+                description=WeeklyRecurrenceSchemaFactory(
+                    weekdays={Weekdays.mon, Weekdays.wed}
+                )
+            ),
+        )
+        jwt_header = get_jwt_header(user)
+        params = {"after": "2022-01-01T00:00Z", "before": "2022-03-01T00:00Z"}
+
+        full = client.get(
+            settings.API_PATH + "/events", headers=jwt_header, params=params
+        ).json()
+        resp = client.get(
+            settings.API_PATH + "/events",
+            headers=jwt_header,
+            params={**params, "occurrence_format": "compact"},
+        )
+
+        assert resp.status_code == 200
+        compact = resp.json()
+        assert compact["events_with_occurrences"][0]["occurrences"] == {
+            "first": "2022-01-01T00:00:00+00:00",
+            "count": 1,
+            "step_minutes": 0,
+            "offsets_minutes": None,
+        }
+        assert [
+            [
+                o.isoformat()
+                for o in CompactOccurrencesSchema.parse_obj(
+                    e.pop("occurrences")
+                ).to_datetimes()
+            ]
+            for e in compact["events_with_occurrences"]
+        ] == [e.pop("occurrences") for e in full["events_with_occurrences"]]
+        assert compact == full
+
+
+class TestFastJSONResponse:
+    def test_byte_compatible(
+        self, db: Session, client: TestClient, user, event, monkeypatch
+    ):
+        EventFactory(
+            owner=user,
+            name="встреча 🗓",
+            start=datetime.datetime(
+                2022, 1, 3, 9, 30, tzinfo=ZoneInfo("Europe/Berlin")
+            ),
+            recurrence=RecurrenceSchema(
+                description=WeeklyRecurrenceSchemaFactory(
+                    weekdays={Weekdays.mon, Weekdays.wed, Weekdays.fri},
+                    until=datetime.datetime(2022, 2, 1, tzinfo=ZoneInfo("UTC")),
+                )
+            ),
+        )
+        EventInviteFactory(event=event, is_accepted=None)
+        EventInviteFactory(user=user)
+        jwt_header = get_jwt_header(user)
+        params = {
+            "after": "2022-01-01T00:00Z",
+            "before": "2022-01-31T00:00Z",
+            "limit": 2,
+        }
+
+        monkeypatch.setattr(settings, "EVENTS_FAST_JSON_RESPONSE", False)
+        expected = client.get(
+            settings.API_PATH + "/events", headers=jwt_header, params=params
+        )
+        monkeypatch.setattr(settings, "EVENTS_FAST_JSON_RESPONSE", True)
+        resp = client.get(
+            settings.API_PATH + "/events", headers=jwt_header, params=params
+        )
+
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == expected.headers["content-type"]
+        assert len(resp.json()["events_with_occurrences"]) == 2
+        assert resp.json()["offset"] is not None
+        assert resp.content == expected.content
+
+
+class TestAgenda:
+    def test_agenda(self, db: Session, client: TestClient, user, event):
+        daily = EventFactory(
+            owner=user,
+            start=datetime.datetime(2022, 1, 1, 1, 0, tzinfo=ZoneInfo("UTC")),
+            recurrence=RecurrenceSchema(description=DailyRecurrenceSchemaFactory()),
+        )
+        jwt_header = get_jwt_header(user)
+        params = {"after": "2022-01-01T00:00Z", "before": "2022-01-03T00:00Z"}
+
+        resp = client.get(
+            settings.API_PATH + "/events/agenda",
+            headers=jwt_header,
+            params={**params, "limit": 2},
+        )
+        assert resp.status_code == 200, resp.text
+        assert "ETag" in resp.headers
+        assert resp.json() == {
+            "occurrences": [
+                {"start": "2022-01-01T00:00:00+00:00", "event_id": event.id},
+                {"start": "2022-01-01T01:00:00+00:00", "event_id": daily.id},
+            ],
+            "events": [
+                {
+                    "start": "2022-01-01T00:00:00+00:00",
+                    "name": event.name,
+                    "duration_minutes": 120,
+                    "recurrence": None,
+                    "id": event.id,
+                    "owner_id": str(user.id),
+                    "invites": [],
+                },
+                {
+                    "start": "2022-01-01T01:00:00+00:00",
+                    "name": daily.name,
+                    "duration_minutes": 120,
+                    "recurrence": unittest.mock.ANY,
+                    "id": daily.id,
+                    "owner_id": str(user.id),
+                    "invites": [],
+                },
+            ],
+            "cursor": {"start": "2022-01-01T01:00:00+00:00", "event_id": daily.id},
+        }
+
+        resp = client.get(
+            settings.API_PATH + "/events/agenda",
+            headers=jwt_header,
+            params={
+                **params,
+                "limit": 2,
+                "cursor_start": "2022-01-01T01:00:00+00:00",
+                "cursor_event_id": daily.id,
+            },
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["occurrences"] == [
+            {"start": "2022-01-02T01:00:00+00:00", "event_id": daily.id},
+        ]
+        assert [e["id"] for e in resp.json()["events"]] == [daily.id]
+        assert resp.json()["cursor"] is None
+
+
+class TestStreamEvents:
+    def test_stream_events(
+        self, db: Session, client: TestClient, user, event, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "EVENT_STREAM_BATCH_SIZE", 1)
+        EventInviteFactory(user=user)
+        EventInviteFactory(user=user)
+        jwt_header = get_jwt_header(user)
+        params = {"after": "2022-01-01T00:00Z", "before": "2022-01-01T00:00Z"}
+
+        resp = client.get(
+            settings.API_PATH + "/events/stream", headers=jwt_header, params=params
+        )
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+
+        resp = client.get(
+            settings.API_PATH + "/events",
+            headers=jwt_header,
+            params={**params, "limit": 50},
+        )
+        assert len(lines) == 3
+        assert lines == resp.json()["events_with_occurrences"]
+
+    def test_stream_events_not_logged_in(self, client: TestClient):
+        resp = client.get(
+            settings.API_PATH + "/events/stream",
+            params={"after": "2022-01-01T00:00Z", "before": "2022-01-01T00:00Z"},
+        )
+        assert resp.status_code == 401
+
+
 class TestGetSingleEvent:
     def test_get_single_event(self, db: Session, client: TestClient, user, event):
         jwt_header = get_jwt_header(user)
@@ -80,6 +280,536 @@ class TestGetSingleEvent:
         assert data["name"] == event.name
 
 
+class TestFindFreeSpot:
+    def test_find_free_spot(self, db: Session, client: TestClient, user, event):
+        resp = client.post(
+            settings.API_PATH + "/events/find-free-spot",
+            json={
+                "after": "2022-01-01T01:00Z",
+                "before": "2022-01-01T06:00Z",
+                "duration_minutes": 60,
+                "user_ids": [str(user.id)],
+                "max_results": 3,
+                "min_gap_minutes": 10,
+            },
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.json() == {
+            "timeslot": "2022-01-01T02:00:00+00:00",
+            "timeslots": ["2022-01-01T02:00:00+00:00", "2022-01-01T03:10:00+00:00"],
+        }
+
+    def test_working_hours(self, db: Session, client: TestClient, user, event):
+        resp = client.post(
+            settings.API_PATH + "/events/find-free-spot",
+            json={
+                "after": "2022-01-01T00:00Z",
+                "before": "2022-01-01T06:00Z",
+                "duration_minutes": 60,
+                "user_ids": [str(user.id)],
+                "max_results": 3,
+                "user_working_hours": {
+                    str(user.id): {
+                        "timezone": "Asia/Tokyo",
+                        "start": "12:00",
+                        "end": "14:00",
+                        "weekdays": ["sat"],
+                    }
+                },
+            },
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.json() == {
+            "timeslot": "2022-01-01T03:00:00+00:00",
+            "timeslots": ["2022-01-01T03:00:00+00:00", "2022-01-01T04:00:00+00:00"],
+        }
+
+    @pytest.mark.parametrize(
+        "working_hours",
+        [
+            {"timezone": "Mars/Olympus", "start": "09:00", "end": "17:00"},
+            {"timezone": "UTC", "start": "17:00", "end": "09:00"},
+            {"timezone": "UTC", "start": "09:00+01:00", "end": "17:00"},
+        ],
+    )
+    def test_invalid_working_hours(
+        self, db: Session, client: TestClient, user, working_hours
+    ):
+        resp = client.post(
+            settings.API_PATH + "/events/find-free-spot",
+            json={
+                "after": "2022-01-01T00:00Z",
+                "before": "2022-01-01T06:00Z",
+                "duration_minutes": 60,
+                "user_ids": [str(user.id)],
+                "working_hours": working_hours,
+            },
+        )
+        assert resp.status_code == 422, resp.text
+
+
+class TestQuorumFreeSpot:
+    @pytest.fixture
+    def attendees(self, user, event):
+        # user is busy 00:00-02:00, others 02:00-04:00 and 04:00-06:00
+        return [user] + [
+            EventFactory(
+                start=datetime.datetime(2022, 1, 1, hour, 0, tzinfo=ZoneInfo("UTC"))
+            ).owner
+            for hour in (2, 4)
+        ]
+
+    @pytest.mark.parametrize(
+        "min_available, timeslot",
+        [
+            # optional attendees do not block by default
+            (None, "2022-01-01T02:00:00+00:00"),
+            (3, "2022-01-01T06:00:00+00:00"),
+            (2, "2022-01-01T02:00:00+00:00"),
+            (1, "2022-01-01T02:00:00+00:00"),
+        ],
+    )
+    def test_min_available(
+        self, db: Session, client: TestClient, attendees, min_available, timeslot
+    ):
+        user, *others = attendees
+        resp = client.post(
+            settings.API_PATH + "/events/find-free-spot",
+            json={
+                "after": "2022-01-01T00:00Z",
+                "before": "2022-01-01T08:00Z",
+                "duration_minutes": 60,
+                "user_ids": [str(user.id)],
+                "optional_user_ids": [str(u.id) for u in others],
+                "min_available": min_available,
+            },
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["timeslot"] == timeslot
+
+    def test_batch(self, db: Session, client: TestClient, attendees):
+        query = {
+            "after": "2022-01-01T00:00Z",
+            "before": "2022-01-01T08:00Z",
+            "duration_minutes": 60,
+            "user_ids": [str(u.id) for u in attendees],
+        }
+        resp = client.post(
+            settings.API_PATH + "/events/find-free-spot/batch",
+            json={
+                "queries": [
+                    query,
+                    # all required users must be free anyway
+                    {**query, "min_available": 2},
+                    {
+                        **query,
+                        "user_ids": [str(attendees[0].id)],
+                        "optional_user_ids": [str(u.id) for u in attendees[1:]],
+                        "min_available": 2,
+                    },
+                ]
+            },
+        )
+        assert resp.status_code == 200, resp.text
+        assert [r["timeslot"] for r in resp.json()["results"]] == [
+            "2022-01-01T06:00:00+00:00",
+            "2022-01-01T06:00:00+00:00",
+            "2022-01-01T02:00:00+00:00",
+        ]
+
+    def test_too_many_available(self, db: Session, client: TestClient, attendees):
+        resp = client.post(
+            settings.API_PATH + "/events/find-free-spot",
+            json={
+                "after": "2022-01-01T00:00Z",
+                "before": "2022-01-01T08:00Z",
+                "duration_minutes": 60,
+                "user_ids": [str(u.id) for u in attendees],
+                "min_available": 4,
+            },
+        )
+        assert resp.status_code == 422, resp.text
+
+
+class TestAvailabilityHeatmap:
+    def test_heatmap(self, db: Session, client: TestClient, user, event):
+        other_user = EventFactory(
+            start=datetime.datetime(2022, 1, 1, 1, 0, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=60,
+        ).owner
+
+        resp = client.post(
+            settings.API_PATH + "/events/availability-heatmap",
+            json={
+                "after": "2022-01-01T00:00Z",
+                "before": "2022-01-01T05:00Z",
+                "user_ids": [str(user.id), str(other_user.id)],
+                "granularity_minutes": 60,
+                "user_working_hours": {
+                    str(other_user.id): {
+                        "timezone": "UTC",
+                        "start": "00:00",
+                        "end": "04:00",
+                        "weekdays": ["sat"],
+                    }
+                },
+            },
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.json() == {
+            "origin": "2022-01-01T00:00:00+00:00",
+            "granularity_minutes": 60,
+            "available": [1, 0, 2, 2, 1],
+        }
+
+
+class TestFindFreeSpotBatch:
+    def test_find_free_spot_batch(self, db: Session, client: TestClient, user, event):
+        query = {
+            "after": "2022-01-01T01:00Z",
+            "before": "2022-01-01T06:00Z",
+            "duration_minutes": 60,
+            "user_ids": [str(user.id)],
+        }
+        resp = client.post(
+            settings.API_PATH + "/events/find-free-spot/batch",
+            json={"queries": [query, {**query, "after": "2022-01-01T03:00Z"}]},
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.json() == {
+            "results": [
+                {
+                    "timeslot": "2022-01-01T02:00:00+00:00",
+                    "timeslots": ["2022-01-01T02:00:00+00:00"],
+                },
+                {
+                    "timeslot": "2022-01-01T03:00:00+00:00",
+                    "timeslots": ["2022-01-01T03:00:00+00:00"],
+                },
+            ]
+        }
+
+    def test_unknown_user(self, db: Session, client: TestClient):
+        resp = client.post(
+            settings.API_PATH + "/events/find-free-spot/batch",
+            json={
+                "queries": [
+                    {
+                        "after": "2022-01-01T01:00Z",
+                        "before": "2022-01-01T06:00Z",
+                        "duration_minutes": 60,
+                        "user_ids": [str(uuid.uuid4())],
+                    }
+                ]
+            },
+        )
+        assert resp.status_code == 422, resp.text
+
+
+class TestFreeBusy:
+    def test_free_busy(self, db: Session, client: TestClient, user, event):
+        other_user = EventFactory(
+            start=datetime.datetime(2022, 1, 1, 3, 0, tzinfo=ZoneInfo("UTC"))
+        ).owner
+        params = {
+            "after": "2022-01-01T01:00Z",
+            "before": "2022-01-01T06:00Z",
+            "user_ids": [str(user.id), str(other_user.id)],
+        }
+
+        resp = client.post(settings.API_PATH + "/events/free-busy", json=params)
+        assert resp.status_code == 200, resp.text
+        assert resp.json() == {
+            "busy_by_user": {
+                str(user.id): [
+                    {
+                        "start": "2022-01-01T01:00:00+00:00",
+                        "end": "2022-01-01T02:00:00+00:00",
+                    }
+                ],
+                str(other_user.id): [
+                    {
+                        "start": "2022-01-01T03:00:00+00:00",
+                        "end": "2022-01-01T05:00:00+00:00",
+                    }
+                ],
+            },
+            "busy": None,
+        }
+
+        resp = client.post(
+            settings.API_PATH + "/events/free-busy",
+            json={**params, "merge_users": True},
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.json() == {
+            "busy_by_user": {},
+            "busy": [
+                {
+                    "start": "2022-01-01T01:00:00+00:00",
+                    "end": "2022-01-01T02:00:00+00:00",
+                },
+                {
+                    "start": "2022-01-01T03:00:00+00:00",
+                    "end": "2022-01-01T05:00:00+00:00",
+                },
+            ],
+        }
+
+    def test_unknown_user(self, db: Session, client: TestClient):
+        resp = client.post(
+            settings.API_PATH + "/events/free-busy",
+            json={
+                "after": "2022-01-01T01:00Z",
+                "before": "2022-01-01T06:00Z",
+                "user_ids": [str(uuid.uuid4())],
+            },
+        )
+        assert resp.status_code == 422
+
+
+class TestBusyCacheInvalidation:
+    @pytest.fixture(autouse=True)
+    def enable_cache(self, monkeypatch):
+        monkeypatch.setattr(busy_cache, "max_entries", 100)
+        yield
+        busy_cache.clear()
+
+    def find_free_spot(self, client, user):
+        resp = client.post(
+            settings.API_PATH + "/events/find-free-spot",
+            json={
+                "after": "2022-01-01T01:00Z",
+                "before": "2022-01-01T06:00Z",
+                "duration_minutes": 60,
+                "user_ids": [str(user.id)],
+            },
+        )
+        assert resp.status_code == 200, resp.text
+        return resp.json()["timeslot"]
+
+    def test_create_and_delete(self, db: Session, client: TestClient, user, event):
+        jwt_header = get_jwt_header(user)
+        assert self.find_free_spot(client, user) == "2022-01-01T02:00:00+00:00"
+
+        resp = client.post(
+            settings.API_PATH + "/events",
+            headers=jwt_header,
+            json={
+                "start": "2022-01-01T02:00Z",
+                "name": "event_test",
+                "duration_minutes": 60,
+                "invitee_ids": [],
+            },
+        )
+        assert resp.status_code == 201, resp.text
+        assert self.find_free_spot(client, user) == "2022-01-01T03:00:00+00:00"
+
+        resp = client.delete(
+            settings.API_PATH + f"/events/{resp.json()['id']}", headers=jwt_header
+        )
+        assert resp.status_code == 200, resp.text
+        assert self.find_free_spot(client, user) == "2022-01-01T02:00:00+00:00"
+
+    def test_accept_invite(self, db: Session, client: TestClient):
+        event_invite = EventInviteFactory(is_accepted=None)
+        user = event_invite.user
+        assert self.find_free_spot(client, user) == "2022-01-01T01:00:00+00:00"
+
+        resp = client.patch(
+            settings.API_PATH + f"/events/{event_invite.event_id}/invite",
+            headers=get_jwt_header(user),
+            json={"is_accepted": True},
+        )
+        assert resp.status_code == 200, resp.text
+        assert self.find_free_spot(client, user) == "2022-01-01T02:00:00+00:00"
+
+
+class TestConditionalGet:
+    params = {"after": "2022-01-01T00:00Z", "before": "2022-01-02T00:00Z"}
+
+    def get_events(self, client, user, etag=None, **params):
+        headers = get_jwt_header(user)
+        if etag:
+            headers["If-None-Match"] = etag
+        return client.get(
+            settings.API_PATH + "/events",
+            headers=headers,
+            params={**self.params, **params},
+        )
+
+    def test_not_modified(self, db: Session, client: TestClient, user, event):
+        resp = self.get_events(client, user)
+        assert resp.status_code == 200
+        etag = resp.headers["ETag"]
+
+        with unittest.mock.patch.object(
+            EventService, "list_events_for_user"
+        ) as list_events:
+            resp = self.get_events(client, user, etag)
+
+        assert resp.status_code == 304
+        assert resp.headers["ETag"] == etag
+        assert resp.content == b""
+        list_events.assert_not_called()
+
+        # ETag depends on request params
+        resp = self.get_events(client, user, etag, limit=1)
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+
+    def test_create_and_delete(self, db: Session, client: TestClient, user):
+        invite = EventInviteFactory(event__owner=user)
+        invitee = invite.user
+        etags = {
+            u.id: self.get_events(client, u).headers["ETag"] for u in (user, invitee)
+        }
+
+        resp = client.post(
+            settings.API_PATH + "/events",
+            headers=get_jwt_header(user),
+            json={
+                "start": "2022-01-01T02:00Z",
+                "name": "event_test",
+                "duration_minutes": 60,
+                "invitee_ids": [str(invitee.id)],
+            },
+        )
+        assert resp.status_code == 201, resp.text
+        assert self.get_events(client, user, etags[user.id]).status_code == 200
+        # not accepted invite does not change invitee listing
+        assert self.get_events(client, invitee, etags[invitee.id]).status_code == 304
+
+        etags = {
+            u.id: self.get_events(client, u).headers["ETag"] for u in (user, invitee)
+        }
+        resp = client.delete(
+            settings.API_PATH + f"/events/{invite.event_id}",
+            headers=get_jwt_header(user),
+        )
+        assert resp.status_code == 200, resp.text
+        assert self.get_events(client, user, etags[user.id]).status_code == 200
+        assert self.get_events(client, invitee, etags[invitee.id]).status_code == 200
+
+    def test_accept_invite(self, db: Session, client: TestClient):
+        invite = EventInviteFactory(is_accepted=None)
+        other_invite = EventInviteFactory(event=invite.event)
+        users = (invite.user, invite.event.owner, other_invite.user)
+        etags = [self.get_events(client, u).headers["ETag"] for u in users]
+        event_url = settings.API_PATH + f"/events/{invite.event_id}"
+        event_etag = client.get(event_url).headers["ETag"]
+
+        resp = client.patch(
+            event_url + "/invite",
+            headers=get_jwt_header(invite.user),
+            json={"is_accepted": True},
+        )
+        assert resp.status_code == 200, resp.text
+
+        for user, etag in zip(users, etags):
+            assert self.get_events(client, user, etag).status_code == 200
+        resp = client.get(event_url, headers={"If-None-Match": event_etag})
+        assert resp.status_code == 200
+        assert resp.json()["invites"][0]["is_accepted"] is True
+
+    def test_single_event(self, db: Session, client: TestClient, event):
+        event_url = settings.API_PATH + f"/events/{event.id}"
+        resp = client.get(event_url)
+        assert resp.status_code == 200
+        etag = resp.headers["ETag"]
+
+        resp = client.get(event_url, headers={"If-None-Match": f'"other", {etag}'})
+        assert resp.status_code == 304
+        assert resp.headers["ETag"] == etag
+
+        resp = client.get(
+            settings.API_PATH + "/events/0", headers={"If-None-Match": "*"}
+        )
+        assert resp.status_code == 404
+
+
+class TestMaterializedOccurrences:
+    def test_create_and_delete(
+        self, db: Session, client: TestClient, user, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "OCCURRENCE_HORIZON_DAYS", 180)
+        jwt_header = get_jwt_header(user)
+
+        resp = client.post(
+            settings.API_PATH + "/events",
+            headers=jwt_header,
+            json={
+                "start": "2022-01-01T02:00Z",
+                "name": "event_test",
+                "duration_minutes": 60,
+                "invitee_ids": [],
+                "recurrence": {
+                    "description": {"type": "daily", "interval": 1, "count": 3}
+                },
+            },
+        )
+        assert resp.status_code == 201, resp.text
+        event_id = resp.json()["id"]
+
+        def get_starts():
+            return db.scalars(
+                select(EventOccurrence.start)
+                .filter(EventOccurrence.event_id == event_id)
+                .order_by(EventOccurrence.start)
+            ).all()
+
+        assert get_starts() == [
+            datetime.datetime(2022, 1, day, 2, 0, tzinfo=datetime.timezone.utc)
+            for day in (1, 2, 3)
+        ]
+
+        resp = client.delete(
+            settings.API_PATH + f"/events/{event_id}", headers=jwt_header
+        )
+        assert resp.status_code == 200, resp.text
+        assert get_starts() == []
+
+    def test_start_offset_matches_live_expansion(
+        self, db: Session, client: TestClient, user, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "OCCURRENCE_HORIZON_DAYS", 180)
+
+        resp = client.post(
+            settings.API_PATH + "/events",
+            headers=get_jwt_header(user),
+            json={
+                "start": "2022-01-02T23:30-02:00",
+                "name": "event_test",
+                "duration_minutes": 30,
+                "invitee_ids": [],
+                "recurrence": {
+                    "description": {
+                        "type": "weekly",
+                        "interval": 1,
+                        "weekdays": ["sun"],
+                        "count": 4,
+                    }
+                },
+            },
+        )
+        assert resp.status_code == 201, resp.text
+
+        event = db.get(Event, resp.json()["id"])
+        materialized = db.scalars(
+            select(EventOccurrence.start)
+            .filter(EventOccurrence.event_id == event.id)
+            .order_by(EventOccurrence.start)
+        ).all()
+
+        assert materialized == list(
+            event.generate_for_timeperiod(event.start, event.series_end)
+        )
+        assert materialized == [
+            datetime.datetime(2022, 1, day, 1, 30, tzinfo=datetime.timezone.utc)
+            for day in (9, 16, 23, 30)
+        ]
+
+
 class TestCreateEvent:
     def test_create_event(self, db: Session, client: TestClient, user):
         jwt_header = get_jwt_header(user)
@@ -106,6 +836,43 @@ class TestCreateEvent:
         assert resp.status_code == 201, resp.text
         assert resp.json()["id"]
 
+    def test_start_offset_does_not_change_series(
+        self, db: Session, client: TestClient, user
+    ):
+        jwt_header = get_jwt_header(user)
+
+        # sunday in -02:00 is monday in UTC, start is stored and expanded in UTC
+        resp = client.post(
+            settings.API_PATH + "/events",
+            headers=jwt_header,
+            json={
+                "start": "2022-01-02T23:30-02:00",
+                "name": "event_test",
+                "duration_minutes": 30,
+                "recurrence": {
+                    "description": {
+                        "type": "weekly",
+                        "interval": 1,
+                        "weekdays": ["sun"],
+                        "until": "2022-01-30T12:00Z",
+                    }
+                },
+                "invitee_ids": [],
+            },
+        )
+        assert resp.status_code == 201, resp.text
+        assert resp.json()["start"] == "2022-01-03T01:30:00+00:00"
+
+        resp = client.get(
+            settings.API_PATH + "/events",
+            headers=jwt_header,
+            params={"after": "2022-01-29T00:00Z", "before": "2022-01-31T00:00Z"},
+        )
+        assert resp.status_code == 200, resp.text
+        assert [
+            event["occurrences"] for event in resp.json()["events_with_occurrences"]
+        ] == [["2022-01-30T01:30:00+00:00"]]
+
 
 class TestDeleteEvent:
     def test_delete_event(self, db: Session, client: TestClient, user, event):
@@ -0,0 +1,38 @@
+import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm.session import Session
+
+from app.models import Event
+from app.schemas.recurrence import RecurrenceSchema, Weekdays
+from tests.factories import EventFactory, WeeklyRecurrenceSchemaFactory
+
+
+def test_recurrence_round_trip(db: Session, user):
+    recurrence = RecurrenceSchema(
+        description=WeeklyRecurrenceSchemaFactory(
+            weekdays={Weekdays.mon},
+            until=datetime.datetime(2022, 3, 1, tzinfo=datetime.timezone.utc),
+        )
+    )
+    event_ids = [
+        EventFactory(owner=user, recurrence=recurrence).id,
+        # dict is validated on save
+        EventFactory(owner=user, recurrence=recurrence.dict()).id,
+    ]
+    db.expire_all()
+
+    events = db.scalars(select(Event).filter(Event.id.in_(event_ids))).all()
+
+    assert [event.recurrence for event in events] == [recurrence, recurrence]
+    # equal values are parsed once and shared
+    assert events[0].recurrence is events[1].recurrence
+    with pytest.raises(TypeError):
+        events[0].recurrence.description.interval = 2
+
+
+def test_invalid_dict_is_not_saved(db: Session, user):
+    with pytest.raises(Exception):
+        EventFactory(owner=user, recurrence={"description": {"type": "hourly"}})
+    db.rollback()
@@ -3,6 +3,7 @@ from zoneinfo import ZoneInfo
 
 import pytest
 
+from app.schemas.event import CompactOccurrencesSchema
 from app.schemas.recurrence import MonthlyRecurrenceMode, RecurrenceSchema
 
 
@@ -161,3 +162,58 @@ class TestYearlyRecurrence:
             datetime.datetime(2022, 5, 1, 12, 0, tzinfo=ZoneInfo("UTC")),
             datetime.datetime(2023, 5, 1, 12, 0, tzinfo=ZoneInfo("UTC")),
         ]
+
+
+class TestCompactOccurrences:
+    def test_regular(self):
+        start = datetime.datetime(2022, 1, 1, 9, 0, tzinfo=ZoneInfo("UTC"))
+        occurrences = [start + datetime.timedelta(days=i) for i in range(90)]
+
+        compact = CompactOccurrencesSchema.from_datetimes(occurrences)
+
+        assert compact == CompactOccurrencesSchema(
+            first=start, count=90, step_minutes=24 * 60
+        )
+        assert compact.to_datetimes() == occurrences
+
+    def test_single(self):
+        start = datetime.datetime(2022, 1, 1, 9, 0, tzinfo=ZoneInfo("UTC"))
+
+        compact = CompactOccurrencesSchema.from_datetimes([start])
+
+        assert compact == CompactOccurrencesSchema(first=start, count=1, step_minutes=0)
+        assert compact.to_datetimes() == [start]
+
+    def test_irregular(self):
+        start = datetime.datetime(2022, 1, 3, 9, 0, tzinfo=ZoneInfo("UTC"))
+        # mondays and wednesdays
+        occurrences = [
+            start + datetime.timedelta(days=week * 7 + day)
+            for week in range(3)
+            for day in (0, 2)
+        ]
+
+        compact = CompactOccurrencesSchema.from_datetimes(occurrences)
+
+        assert compact.step_minutes is None
+        assert compact.offsets_minutes == [
+            (o - start) // datetime.timedelta(minutes=1) for o in occurrences
+        ]
+        assert compact.to_datetimes() == occurrences
+
+    def test_dst(self):
+        tz = ZoneInfo("Europe/Berlin")
+        # daily at 9:00 local time across DST change on 2022-03-27
+        occurrences = [
+            datetime.datetime(2022, 3, day, 9, 0, tzinfo=tz) for day in range(25, 30)
+        ]
+
+        compact = CompactOccurrencesSchema.from_datetimes(occurrences)
+        result = CompactOccurrencesSchema.parse_raw(compact.json()).to_datetimes()
+
+        assert compact.offsets_minutes is not None
+        # JSON keeps only utc offset of `first`, instants are the same
+        assert result == occurrences
+        assert [r.utcoffset() for r in compact.to_datetimes()] == [
+            o.utcoffset() for o in occurrences
+        ]
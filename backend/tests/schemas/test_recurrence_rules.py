@@ -0,0 +1,157 @@
+import calendar
+import datetime
+import itertools
+import random
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.schemas.recurrence import (
+    DailyRecurrenceSchema,
+    DailyRule,
+    MonthlyRecurrenceMode,
+    MonthlyRecurrenceSchema,
+    SkipAheadRule,
+    Weekdays,
+    WeeklyRecurrenceSchema,
+    YearlyRecurrenceSchema,
+)
+
+TIMEZONES = ["UTC", "Europe/Berlin", "America/New_York"]
+
+
+def make_random_schema(rnd, start):
+    params = dict(
+        count=rnd.choice([None, None, rnd.randint(2, 30)]),
+        until=rnd.choice([None, start + datetime.timedelta(days=rnd.randint(0, 1000))]),
+    )
+    kind = rnd.choice(["daily", "weekly", "monthly", "yearly"])
+
+    if kind == "daily":
+        return DailyRecurrenceSchema(type=kind, interval=rnd.randint(1, 10), **params)
+    if kind == "weekly":
+        return WeeklyRecurrenceSchema(
+            type=kind,
+            interval=rnd.randint(1, 4),
+            weekdays=set(rnd.sample(list(Weekdays), rnd.randint(1, 7))),
+            **params,
+        )
+    if kind == "monthly":
+        return MonthlyRecurrenceSchema(
+            type=kind,
+            interval=rnd.randint(1, 13),
+            mode=rnd.choice(list(MonthlyRecurrenceMode)),
+            **params,
+        )
+    return YearlyRecurrenceSchema(type=kind, interval=rnd.randint(1, 4), **params)
+
+
+def make_random_start(rnd):
+    year, month = rnd.randint(2015, 2024), rnd.randint(1, 12)
+    if rnd.random() < 0.2:
+        # last days of month are skipped in some months
+        day = calendar.monthrange(year, month)[1]
+    else:
+        day = rnd.randint(1, calendar.monthrange(year, month)[1])
+
+    return datetime.datetime(
+        year,
+        month,
+        day,
+        rnd.randint(0, 23),
+        rnd.choice([0, 30]),
+        tzinfo=ZoneInfo(rnd.choice(TIMEZONES)),
+    )
+
+
+def take(occurrences, n=25):
+    return [(o, o.utcoffset()) for o in itertools.islice(occurrences, n)]
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_matches_dateutil(seed):
+    rnd = random.Random(seed)
+    start = make_random_start(rnd)
+    schema = make_random_schema(rnd, start)
+    dt = (start + datetime.timedelta(days=rnd.randint(-30, 3000))).astimezone(
+        ZoneInfo("UTC")
+    )
+    inc = rnd.choice([True, False])
+
+    expected = take(schema.get_rrule(start).xafter(dt, inc=inc))
+
+    assert take(schema.get_rule(start).xafter(dt, inc=inc)) == expected
+
+
+@pytest.mark.parametrize(
+    "schema, start",
+    [
+        (
+            MonthlyRecurrenceSchema(type="monthly", interval=1, count=5, mode="by_day"),
+            datetime.datetime(2022, 1, 31, tzinfo=ZoneInfo("UTC")),
+        ),
+        (
+            YearlyRecurrenceSchema(type="yearly", interval=1, count=3),
+            datetime.datetime(2020, 2, 29, tzinfo=ZoneInfo("UTC")),
+        ),
+    ],
+)
+def test_fallback_for_skipped_periods_with_count(schema, start):
+    assert not isinstance(schema.get_rule(start), SkipAheadRule)
+    schema = schema.copy(update={"count": None})
+    assert isinstance(schema.get_rule(start), SkipAheadRule)
+
+
+def test_skips_to_window():
+    # dateutil would walk every day since year 1
+    rule = DailyRule(datetime.datetime(1, 1, 1, 9, tzinfo=ZoneInfo("UTC")), 1)
+    dt = datetime.datetime(2022, 6, 1, 12, tzinfo=ZoneInfo("UTC"))
+
+    assert take(rule.xafter(dt), 1) == [
+        (datetime.datetime(2022, 6, 2, 9, tzinfo=ZoneInfo("UTC")), datetime.timedelta())
+    ]
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_last_occurrence_matches_walk(seed):
+    rnd = random.Random(seed)
+    start = make_random_start(rnd)
+    schema = make_random_schema(rnd, start)
+    if not schema.count and not schema.until:
+        schema = schema.copy(update={"count": rnd.randint(2, 30)})
+
+    occurrences = list(schema.get_rrule(start).xafter(start, inc=True))
+    expected = occurrences[-1] if occurrences else start
+
+    assert schema.get_last_occurrence(start) == expected
+
+
+@pytest.mark.parametrize(
+    "schema, expected",
+    [
+        (
+            DailyRecurrenceSchema(type="daily", interval=1, count=10**6),
+            datetime.datetime(4759, 12, 28, 9, tzinfo=ZoneInfo("UTC")),
+        ),
+        (
+            WeeklyRecurrenceSchema(
+                type="weekly",
+                interval=1,
+                weekdays={Weekdays.mon, Weekdays.fri},
+                until=datetime.datetime(9999, 1, 1, tzinfo=ZoneInfo("UTC")),
+            ),
+            datetime.datetime(9998, 12, 28, 9, tzinfo=ZoneInfo("UTC")),
+        ),
+        (
+            MonthlyRecurrenceSchema(
+                type="monthly", interval=1, count=10**6, mode="by_day"
+            ),
+            # beyond range of datetime, so the series is infinite
+            None,
+        ),
+    ],
+)
+def test_last_occurrence_does_not_walk_series(schema, expected):
+    start = datetime.datetime(2022, 1, 31, 9, tzinfo=ZoneInfo("UTC"))
+
+    assert schema.get_last_occurrence(start) == expected
@@ -0,0 +1,158 @@
+import datetime
+import uuid
+from zoneinfo import ZoneInfo
+
+import pytest
+from bitarray import bitarray
+
+from app.services.busy_cache import (
+    MINUTES_IN_DAY,
+    BusyBitmapCache,
+    busy_cache,
+    make_day_bitmap,
+)
+from app.services.event import EventService
+from tests.factories import EventFactory
+
+
+def make_bitmap(busy_minutes=()):
+    bitmap = bitarray(MINUTES_IN_DAY)
+    bitmap.setall(0)
+    for minute in busy_minutes:
+        bitmap[minute] = 1
+    return bitmap
+
+
+class TestBusyBitmapCache:
+    def test_lru_eviction(self):
+        cache = BusyBitmapCache(max_entries=2)
+        user_id = uuid.uuid4()
+        days = [datetime.date(2022, 1, day) for day in (1, 2, 3)]
+
+        cache.set(user_id, days[0], make_bitmap())
+        cache.set(user_id, days[1], make_bitmap())
+        assert cache.get(user_id, days[0]) is not None
+        cache.set(user_id, days[2], make_bitmap())
+
+        assert cache.get(user_id, days[0]) is not None
+        assert cache.get(user_id, days[1]) is None
+        assert cache.get(user_id, days[2]) is not None
+
+    def test_invalidate(self):
+        cache = BusyBitmapCache(max_entries=10)
+        user_id, other_user_id = uuid.uuid4(), uuid.uuid4()
+        days = [datetime.date(2022, 1, day) for day in (1, 2)]
+        for day in days:
+            cache.set(user_id, day, make_bitmap())
+            cache.set(other_user_id, day, make_bitmap())
+
+        cache.invalidate({user_id}, [days[0]])
+        assert cache.get(user_id, days[0]) is None
+        assert cache.get(user_id, days[1]) is not None
+
+        cache.invalidate({other_user_id})
+        assert cache.get(other_user_id, days[0]) is None
+        assert cache.get(other_user_id, days[1]) is None
+        assert cache.get(user_id, days[1]) is not None
+
+    def test_set_skips_invalidated_generation(self):
+        cache = BusyBitmapCache(max_entries=10)
+        user_id = uuid.uuid4()
+        day = datetime.date(2022, 1, 1)
+
+        generation = cache.get_generation(user_id)
+        cache.invalidate({user_id}, [day])
+        cache.set(user_id, day, make_bitmap(), generation)
+        assert cache.get(user_id, day) is None
+
+        cache.set(user_id, day, make_bitmap(), cache.get_generation(user_id))
+        assert cache.get(user_id, day) is not None
+
+
+def test_make_day_bitmap():
+    day = datetime.date(2022, 1, 2)
+    utc = ZoneInfo("UTC")
+    bitmap = make_day_bitmap(
+        day,
+        [
+            (
+                datetime.datetime(2022, 1, 1, 23, 0, tzinfo=utc),
+                datetime.datetime(2022, 1, 2, 0, 2, tzinfo=utc),
+            ),
+            (
+                datetime.datetime(2022, 1, 2, 10, 0, 30, tzinfo=utc),
+                datetime.datetime(2022, 1, 2, 10, 1, 30, tzinfo=utc),
+            ),
+            (
+                datetime.datetime(2022, 1, 2, 23, 59, tzinfo=utc),
+                datetime.datetime(2022, 1, 3, 1, 0, tzinfo=utc),
+            ),
+        ],
+    )
+
+    assert bitmap == make_bitmap([0, 1, 600, 601, MINUTES_IN_DAY - 1])
+
+
+class TestCachedFindFreeSpot:
+    @pytest.fixture(autouse=True)
+    def enable_cache(self, monkeypatch):
+        monkeypatch.setattr(busy_cache, "max_entries", 100)
+        yield
+        busy_cache.clear()
+
+    @pytest.fixture(scope="class")
+    def find_event_spot(self, async_loop):
+        def run_find_event_spot(*args, **kwargs):
+            return async_loop.run_until_complete(
+                EventService().find_event_spot(*args, **kwargs)
+            )
+
+        return run_find_event_spot
+
+    def test_cache(self, user, event, find_event_spot):
+        params = dict(
+            user_ids={user.id},
+            after=datetime.datetime(2022, 1, 1, 1, 0, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 3, 0, 0, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=60,
+        )
+        spot = datetime.datetime(2022, 1, 1, 2, 0, tzinfo=ZoneInfo("UTC"))
+
+        assert find_event_spot(**params) == spot
+        assert busy_cache.get(user.id, datetime.date(2022, 1, 1)) is not None
+
+        # event created bypassing API is not seen until cache is invalidated
+        new_event = EventFactory(
+            owner=user,
+            start=datetime.datetime(2022, 1, 1, 2, 0, tzinfo=ZoneInfo("UTC")),
+        )
+        assert find_event_spot(**params) == spot
+
+        busy_cache.invalidate_event(new_event, {user.id})
+        assert find_event_spot(**params) == datetime.datetime(
+            2022, 1, 1, 4, 0, tzinfo=ZoneInfo("UTC")
+        )
+
+    def test_invalidated_while_reading_is_not_cached(
+        self, user, event, find_event_spot, monkeypatch
+    ):
+        get_busy_intervals_by_user = EventService.get_busy_intervals_by_user
+
+        def invalidate_while_reading(*args):
+            # another request changes event after it is read
+            busy_cache.invalidate_event(event, {user.id})
+            return get_busy_intervals_by_user(*args)
+
+        monkeypatch.setattr(
+            EventService,
+            "get_busy_intervals_by_user",
+            staticmethod(invalidate_while_reading),
+        )
+        find_event_spot(
+            user_ids={user.id},
+            after=datetime.datetime(2022, 1, 1, 1, 0, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 3, 0, 0, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=60,
+        )
+
+        assert busy_cache.get(user.id, datetime.date(2022, 1, 1)) is None
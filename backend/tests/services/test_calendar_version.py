@@ -0,0 +1,75 @@
+import pytest
+
+from app.deps.db import get_async_session
+from app.services import calendar_version
+from tests.factories import EventInviteFactory, UserFactory
+
+
+@pytest.fixture
+def run_in_session(async_loop):
+    def run(func, *args):
+        async def run_func():
+            async for session in get_async_session():
+                result = await func(session, *args)
+                await session.commit()
+                return result
+
+        return async_loop.run_until_complete(run_func())
+
+    return run
+
+
+def test_bump(db, run_in_session):
+    user, other_user, untouched_user = UserFactory(), UserFactory(), UserFactory()
+
+    run_in_session(calendar_version.bump, {user.id, other_user.id})
+    run_in_session(calendar_version.bump, {user.id})
+
+    for u in (user, other_user, untouched_user):
+        db.refresh(u)
+    assert user.calendar_version == 2
+    assert other_user.calendar_version == 1
+    assert untouched_user.calendar_version == 0
+
+
+def test_get_event_version(db, run_in_session, event):
+    run_in_session(calendar_version.bump, {event.owner_id})
+
+    assert run_in_session(calendar_version.get_event_version, event.id) == 1
+    assert run_in_session(calendar_version.get_event_version, 0) is None
+
+
+def test_get_viewer_ids(db):
+    invite = EventInviteFactory()
+    EventInviteFactory(event=invite.event, is_accepted=None)
+    EventInviteFactory(event=invite.event, is_accepted=False)
+
+    assert calendar_version.get_viewer_ids(invite.event) == {
+        invite.event.owner_id,
+        invite.user_id,
+    }
+
+
+@pytest.mark.parametrize(
+    "if_none_match, matches",
+    [
+        (None, False),
+        ("", False),
+        ("*", True),
+        ('W/"abc"', True),
+        ('"abc"', True),
+        ('"other", W/"abc"', True),
+        ('"other"', False),
+        ('W/"abcd"', False),
+    ],
+)
+def test_etag_matches(if_none_match, matches):
+    assert calendar_version.etag_matches(if_none_match, 'W/"abc"') is matches
+
+
+def test_make_etag():
+    etag = calendar_version.make_etag("user", 1)
+
+    assert etag.startswith('W/"')
+    assert etag == calendar_version.make_etag("user", 1)
+    assert etag != calendar_version.make_etag("user", 2)
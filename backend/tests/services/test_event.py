@@ -1,24 +1,32 @@
 import datetime
+import uuid
 from zoneinfo import ZoneInfo
 
 import pytest
 from sqlalchemy.orm.session import Session
 
+from app.core.config import settings
+from app.deps.db import get_async_session
+from app.models import Event
+from app.schemas.free_spot import WorkingHoursSchema
 from app.schemas.recurrence import RecurrenceSchema, Weekdays
 from app.services.event import EventService
+from app.services.free_spot import FREE_SPOT_FINDERS
 from tests.factories import (
+    DailyRecurrenceSchemaFactory,
     EventFactory,
     EventInviteFactory,
+    UserFactory,
     WeeklyRecurrenceSchemaFactory,
 )
 
 
 class TestFindFreeSpot:
-    @pytest.fixture(scope="class")
-    def find_event_spot(self, async_loop):
+    @pytest.fixture(scope="class", params=sorted(FREE_SPOT_FINDERS))
+    def find_event_spot(self, async_loop, request):
         def run_find_event_spot(*args, **kwargs):
             return async_loop.run_until_complete(
-                EventService().find_event_spot(*args, **kwargs)
+                EventService().find_event_spot(*args, strategy=request.param, **kwargs)
             )
 
         return run_find_event_spot
@@ -162,6 +170,213 @@ class TestFindFreeSpot:
         assert result == datetime.datetime(2022, 1, 1, 0, 21, tzinfo=ZoneInfo("UTC"))
 
 
+class TestFindFreeSpots:
+    @pytest.fixture(scope="class", params=sorted(FREE_SPOT_FINDERS))
+    def find_event_spots(self, async_loop, request):
+        def run_find_event_spots(*args, **kwargs):
+            return async_loop.run_until_complete(
+                EventService().find_event_spots(*args, strategy=request.param, **kwargs)
+            )
+
+        return run_find_event_spots
+
+    def test_multiple_spots(self, event, find_event_spots):
+        result = find_event_spots(
+            user_ids={event.owner_id},
+            after=datetime.datetime(2022, 1, 1, 1, 0, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 1, 5, 0, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=30,
+            max_results=3,
+        )
+        assert result == [
+            datetime.datetime(2022, 1, 1, 2, 0, tzinfo=ZoneInfo("UTC")),
+            datetime.datetime(2022, 1, 1, 2, 30, tzinfo=ZoneInfo("UTC")),
+            datetime.datetime(2022, 1, 1, 3, 0, tzinfo=ZoneInfo("UTC")),
+        ]
+
+    def test_min_gap(self, event, find_event_spots):
+        result = find_event_spots(
+            user_ids={event.owner_id},
+            after=datetime.datetime(2022, 1, 1, 1, 0, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 1, 5, 0, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=30,
+            max_results=5,
+            min_gap_minutes=45,
+        )
+        assert result == [
+            datetime.datetime(2022, 1, 1, 2, 0, tzinfo=ZoneInfo("UTC")),
+            datetime.datetime(2022, 1, 1, 3, 15, tzinfo=ZoneInfo("UTC")),
+        ]
+
+    def test_granularity(self, event, find_event_spots):
+        result = find_event_spots(
+            user_ids={event.owner_id},
+            after=datetime.datetime(2022, 1, 1, 1, 50, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 1, 5, 0, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=20,
+            max_results=2,
+            min_gap_minutes=1,
+            granularity_minutes=15,
+        )
+        assert result == [
+            datetime.datetime(2022, 1, 1, 2, 0, tzinfo=ZoneInfo("UTC")),
+            datetime.datetime(2022, 1, 1, 2, 45, tzinfo=ZoneInfo("UTC")),
+        ]
+
+    def test_columnar_expansion(self, event, find_event_spots, monkeypatch):
+        monkeypatch.setattr(settings, "FREE_SPOT_COLUMNAR_EXPANSION", True)
+        result = find_event_spots(
+            user_ids={event.owner_id},
+            after=datetime.datetime(2022, 1, 1, 1, 0, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 1, 5, 0, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=30,
+            max_results=2,
+        )
+        assert result == [
+            datetime.datetime(2022, 1, 1, 2, 0, tzinfo=ZoneInfo("UTC")),
+            datetime.datetime(2022, 1, 1, 2, 30, tzinfo=ZoneInfo("UTC")),
+        ]
+
+    def test_working_hours(self, event, find_event_spots):
+        working_hours = WorkingHoursSchema(
+            timezone="Europe/Berlin",
+            start=datetime.time(1, 30),
+            end=datetime.time(5),
+            weekdays=set(Weekdays),
+        )
+        result = find_event_spots(
+            user_ids={event.owner_id},
+            after=datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 1, 6, 0, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=60,
+            max_results=3,
+            working_hours=working_hours,
+        )
+        # working hours are 00:30-04:00 UTC, event ends at 02:00 UTC
+        assert result == [
+            datetime.datetime(2022, 1, 1, 2, 0, tzinfo=ZoneInfo("UTC")),
+            datetime.datetime(2022, 1, 1, 3, 0, tzinfo=ZoneInfo("UTC")),
+        ]
+
+    def test_user_working_hours(self, event, find_event_spots):
+        result = find_event_spots(
+            user_ids={event.owner_id},
+            after=datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 2, 0, 0, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=60,
+            working_hours=WorkingHoursSchema(
+                timezone="UTC", start=datetime.time(0), end=datetime.time(23)
+            ),
+            user_working_hours={
+                event.owner_id: WorkingHoursSchema(
+                    timezone="America/New_York",
+                    start=datetime.time(9),
+                    end=datetime.time(17),
+                    weekdays={Weekdays.sat},
+                )
+            },
+        )
+        assert result == [datetime.datetime(2022, 1, 1, 14, 0, tzinfo=ZoneInfo("UTC"))]
+
+
+class TestFindFreeSpotsBatch:
+    @pytest.fixture(scope="class", params=sorted(FREE_SPOT_FINDERS))
+    def find_event_spots_batch(self, async_loop, request):
+        def run_find_event_spots_batch(*args, **kwargs):
+            return async_loop.run_until_complete(
+                EventService().find_event_spots_batch(
+                    *args, strategy=request.param, **kwargs
+                )
+            )
+
+        return run_find_event_spots_batch
+
+    @pytest.fixture
+    def other_user(self, user):
+        EventFactory(
+            start=datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=10,
+            owner=user,
+        )
+
+        other_user = UserFactory()
+        event = EventFactory(
+            start=datetime.datetime(2022, 1, 1, 0, 10, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=110,
+        )
+        EventInviteFactory(event=event, user=other_user)
+        # Not accepted invite does not make user busy
+        EventInviteFactory(event=event, user=user, is_accepted=None)
+        return other_user
+
+    def test_batch(self, user, other_user, find_event_spots_batch):
+        result = find_event_spots_batch(
+            [
+                dict(
+                    user_ids={user.id},
+                    after=datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC")),
+                    before=datetime.datetime(2022, 1, 1, 3, 0, tzinfo=ZoneInfo("UTC")),
+                    duration_minutes=30,
+                    max_results=2,
+                ),
+                dict(
+                    user_ids={other_user.id},
+                    after=datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC")),
+                    before=datetime.datetime(2022, 1, 1, 3, 0, tzinfo=ZoneInfo("UTC")),
+                    duration_minutes=30,
+                ),
+                dict(
+                    user_ids={user.id, other_user.id},
+                    after=datetime.datetime(2022, 1, 1, 1, 0, tzinfo=ZoneInfo("UTC")),
+                    before=datetime.datetime(2022, 1, 2, 0, 0, tzinfo=ZoneInfo("UTC")),
+                    duration_minutes=30,
+                    granularity_minutes=15,
+                ),
+            ]
+        )
+
+        assert result == [
+            [
+                datetime.datetime(2022, 1, 1, 0, 10, tzinfo=ZoneInfo("UTC")),
+                datetime.datetime(2022, 1, 1, 0, 40, tzinfo=ZoneInfo("UTC")),
+            ],
+            [datetime.datetime(2022, 1, 1, 2, 0, tzinfo=ZoneInfo("UTC"))],
+            [datetime.datetime(2022, 1, 1, 2, 0, tzinfo=ZoneInfo("UTC"))],
+        ]
+
+
+class TestCountingSpotFinder:
+    after = datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC"))
+    before = datetime.datetime(2022, 1, 1, 4, 0, tzinfo=ZoneInfo("UTC"))
+
+    def test_optional_users_do_not_block_by_default(self):
+        required, optional = uuid.uuid4(), uuid.uuid4()
+        spot_finder = EventService.get_counting_spot_finder(
+            {required: [], optional: [(self.after, self.before)]},
+            self.after,
+            self.before,
+            60,
+            {required},
+            {optional},
+        )
+
+        assert spot_finder.search_spots() == [self.after]
+
+    def test_min_available_asks_for_optional_users(self):
+        required, optional = uuid.uuid4(), uuid.uuid4()
+        spot_finder = EventService.get_counting_spot_finder(
+            {required: [], optional: [(self.after, self.before)]},
+            self.after,
+            self.before,
+            60,
+            {required},
+            {optional},
+            min_available=2,
+        )
+
+        assert spot_finder.search_spots() == []
+
+
 class TestListEvents:
     @pytest.fixture(scope="class")
     def list_events(self, async_loop):
@@ -286,6 +501,54 @@ class TestListEvents:
             ),
         )
 
+    def test_limit(self, user, list_events, events_with_invites):
+        result = list_events(
+            user_id=user.id,
+            after=datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 12, 0, 0, tzinfo=ZoneInfo("UTC")),
+            event_id_gt=0,
+            limit=2,
+        )
+
+        assert [e.name for e in result] == ["event_a", "event_b"]
+
+    def test_owned_and_invited_event_is_listed_once(
+        self, user, list_events, events_with_invites
+    ):
+        _, _, event_c = events_with_invites
+        EventInviteFactory(event=event_c, user=user)
+
+        result = list_events(
+            user_id=user.id,
+            after=datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 12, 0, 0, tzinfo=ZoneInfo("UTC")),
+            event_id_gt=0,
+        )
+
+        assert [e.name for e in result] == ["event_a", "event_b", "event_c"]
+
+    def test_skips_events_without_occurrences(
+        self, user, list_events, events_with_invites, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "EVENT_LIST_BATCH_SIZE", 1)
+
+        # event_c is only on mondays and tuesdays, the window has none
+        result = list_events(
+            user_id=user.id,
+            after=datetime.datetime(2022, 1, 5, 0, 0, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 10, 0, 11, tzinfo=ZoneInfo("UTC")),
+            event_id_gt=0,
+        )
+        assert [e.name for e in result] == ["event_b"]
+
+        result = list_events(
+            user_id=user.id,
+            after=datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC")),
+            before=datetime.datetime(2022, 1, 12, 0, 0, tzinfo=ZoneInfo("UTC")),
+            event_id_gt=0,
+        )
+        assert [e.name for e in result] == ["event_a", "event_b", "event_c"]
+
     def test_empty(self, user, list_events, events_with_invites):
         _, _, event_c = events_with_invites
         result = list_events(
@@ -303,3 +566,200 @@ class TestListEvents:
             event_id_gt=event_c.id,
         )
         assert result == []
+
+
+class TestBusyIntervals:
+    def test_busy_intervals(self, db: Session, async_loop, user):
+        other_user = UserFactory()
+        # overlapping and touching events of user are merged
+        EventFactory(owner=user, duration_minutes=60)
+        EventFactory(
+            owner=user,
+            start=datetime.datetime(2022, 1, 1, 0, 30, tzinfo=ZoneInfo("UTC")),
+            duration_minutes=60,
+        )
+        EventInviteFactory(
+            user=user,
+            event__owner=other_user,
+            event__start=datetime.datetime(2022, 1, 1, 1, 30, tzinfo=ZoneInfo("UTC")),
+            event__duration_minutes=30,
+        )
+        # not accepted invite does not make user busy
+        EventInviteFactory(
+            user=other_user,
+            is_accepted=None,
+            event__start=datetime.datetime(2022, 1, 1, 3, 0, tzinfo=ZoneInfo("UTC")),
+        )
+        # daily event clipped by window
+        EventFactory(
+            owner=other_user,
+            start=datetime.datetime(2021, 12, 31, 23, 0, tzinfo=ZoneInfo("UTC")),
+            recurrence=RecurrenceSchema(description=DailyRecurrenceSchemaFactory()),
+        )
+
+        result = async_loop.run_until_complete(
+            EventService().get_busy_intervals(
+                {user.id, other_user.id},
+                datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC")),
+                datetime.datetime(2022, 1, 2, 0, 0, tzinfo=ZoneInfo("UTC")),
+            )
+        )
+
+        utc = ZoneInfo("UTC")
+        assert result == {
+            user.id: [
+                (
+                    datetime.datetime(2022, 1, 1, 0, 0, tzinfo=utc),
+                    datetime.datetime(2022, 1, 1, 2, 0, tzinfo=utc),
+                )
+            ],
+            other_user.id: [
+                (
+                    datetime.datetime(2022, 1, 1, 0, 0, tzinfo=utc),
+                    datetime.datetime(2022, 1, 1, 1, 0, tzinfo=utc),
+                ),
+                (
+                    datetime.datetime(2022, 1, 1, 1, 30, tzinfo=utc),
+                    datetime.datetime(2022, 1, 1, 2, 0, tzinfo=utc),
+                ),
+                (
+                    datetime.datetime(2022, 1, 1, 23, 0, tzinfo=utc),
+                    datetime.datetime(2022, 1, 2, 0, 0, tzinfo=utc),
+                ),
+            ],
+        }
+
+
+class TestAgenda:
+    after = datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC"))
+    before = datetime.datetime(2022, 1, 15, 0, 0, tzinfo=ZoneInfo("UTC"))
+
+    @pytest.fixture(scope="class")
+    def list_agenda(self, async_loop):
+        def run_list_agenda(*args, **kwargs):
+            return async_loop.run_until_complete(
+                EventService().list_agenda_for_user(*args, **kwargs)
+            )
+
+        return run_list_agenda
+
+    @pytest.fixture
+    def events(self, user, event):
+        daily = EventFactory(
+            owner=user,
+            start=datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC")),
+            recurrence=RecurrenceSchema(
+                description=DailyRecurrenceSchemaFactory(interval=2)
+            ),
+        )
+        weekly = EventFactory(
+            start=datetime.datetime(2022, 1, 3, 9, 0, tzinfo=ZoneInfo("UTC")),
+            recurrence=RecurrenceSchema(description=WeeklyRecurrenceSchemaFactory()),
+        )
+        EventInviteFactory(event=weekly, user=user)
+        # not visible to user
+        EventFactory(start=datetime.datetime(2022, 1, 2, tzinfo=ZoneInfo("UTC")))
+        return event, daily, weekly
+
+    def get_expected(self, events):
+        return sorted(
+            (start, e.id)
+            for e in events
+            for start in e.generate_for_timeperiod(self.after, self.before)
+        )
+
+    def test_order(self, user, list_agenda, events):
+        result = list_agenda(user.id, self.after, self.before, limit=100)
+
+        assert [(start, e.id) for start, e in result] == self.get_expected(events)
+        # single event and daily one start at the same time
+        assert result[0][1].id < result[1][1].id
+        # invites are loaded
+        weekly = next(e for _, e in result if e.id == events[2].id)
+        assert [i.user_id for i in weekly.invites] == [user.id]
+
+    def test_cursor(self, user, list_agenda, events):
+        expected = self.get_expected(events)
+        result, cursor = [], None
+
+        while True:
+            page = list_agenda(user.id, self.after, self.before, limit=3, cursor=cursor)
+            result.extend((start, e.id) for start, e in page)
+            if len(page) < 3:
+                break
+            cursor = result[-1]
+
+        assert result == expected
+
+    def test_expansion_is_bounded(self, user, list_agenda, events, monkeypatch):
+        generated = []
+        generate_for_timeperiod = Event.generate_for_timeperiod
+
+        def counting_generate(event, after, before):
+            for start in generate_for_timeperiod(event, after, before):
+                generated.append(start)
+                yield start
+
+        monkeypatch.setattr(Event, "generate_for_timeperiod", counting_generate)
+        before = datetime.datetime(2032, 1, 1, tzinfo=ZoneInfo("UTC"))
+
+        result = list_agenda(user.id, self.after, before, limit=5)
+
+        assert len(result) == 5
+        # besides returned ones, at most one look ahead occurrence per event
+        assert len(generated) <= 5 + len(events)
+
+
+class TestSeriesEnd:
+    @pytest.mark.parametrize(
+        "recurrence, expected",
+        [
+            (None, datetime.datetime(2022, 1, 1, 2, 0, tzinfo=ZoneInfo("UTC"))),
+            (
+                # saturday start is not an occurrence
+                WeeklyRecurrenceSchemaFactory(count=3),
+                datetime.datetime(2022, 1, 10, 2, 0, tzinfo=ZoneInfo("UTC")),
+            ),
+            (
+                WeeklyRecurrenceSchemaFactory(
+                    until=datetime.datetime(2022, 1, 20, tzinfo=ZoneInfo("UTC"))
+                ),
+                datetime.datetime(2022, 1, 18, 2, 0, tzinfo=ZoneInfo("UTC")),
+            ),
+            (WeeklyRecurrenceSchemaFactory(), None),
+        ],
+    )
+    def test_computed_on_write(self, db: Session, user, recurrence, expected):
+        event = EventFactory(
+            owner=user,
+            recurrence=recurrence and RecurrenceSchema(description=recurrence),
+        )
+        assert event.series_end == expected
+
+        event.duration_minutes = 60
+        db.commit()
+        if expected:
+            assert event.series_end == expected - datetime.timedelta(hours=1)
+
+    def test_ended_events_are_not_loaded(self, db: Session, async_loop, user):
+        ended = EventFactory(owner=user)
+        infinite = EventFactory(
+            owner=user,
+            recurrence=RecurrenceSchema(description=WeeklyRecurrenceSchemaFactory()),
+        )
+
+        async def load_ids():
+            async for session in get_async_session():
+                return set(
+                    await session.scalars(
+                        EventService().get_event_query_for_user_ids(
+                            {user.id},
+                            datetime.datetime(2022, 2, 1, tzinfo=ZoneInfo("UTC")),
+                            datetime.datetime(2022, 2, 2, tzinfo=ZoneInfo("UTC")),
+                        )
+                    )
+                )
+
+        loaded_ids = {event.id for event in async_loop.run_until_complete(load_ids())}
+        assert infinite.id in loaded_ids
+        assert ended.id not in loaded_ids
@@ -0,0 +1,61 @@
+import datetime
+import pickle
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.core.config import settings
+from app.models.event import generate_event_occurrences
+from app.schemas.recurrence import RecurrenceSchema
+from app.services.event import EventService
+from app.services.executor import CompactEvent, get_executor, shutdown_executor
+from tests.factories import EventFactory, WeeklyRecurrenceSchemaFactory
+
+AFTER = datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC"))
+
+
+def test_compact_event_pickles():
+    recurrence = RecurrenceSchema(description=WeeklyRecurrenceSchemaFactory(count=3))
+    event = CompactEvent(AFTER, 30, recurrence)
+    before = AFTER + datetime.timedelta(days=30)
+
+    assert list(
+        pickle.loads(pickle.dumps(event)).generate_for_timeperiod(AFTER, before)
+    ) == list(generate_event_occurrences(AFTER, 30, recurrence, AFTER, before))
+
+
+class TestExecutor:
+    @pytest.fixture
+    def enable_executor(self, monkeypatch):
+        monkeypatch.setattr(settings, "FREE_SPOT_EXECUTOR_WORKERS", 2)
+        yield
+        shutdown_executor()
+
+    def test_disabled(self):
+        assert get_executor() is None
+
+    def test_find_event_spots(self, async_loop, enable_executor, user):
+        EventFactory(
+            owner=user,
+            start=AFTER,
+            duration_minutes=60,
+            recurrence=RecurrenceSchema(
+                description=WeeklyRecurrenceSchemaFactory(weekdays={"sat", "sun"})
+            ),
+        )
+
+        result = async_loop.run_until_complete(
+            EventService().find_event_spots(
+                {user.id},
+                AFTER,
+                AFTER + datetime.timedelta(days=2),
+                duration_minutes=30,
+                max_results=2,
+            )
+        )
+
+        assert get_executor() is not None
+        assert result == [
+            AFTER + datetime.timedelta(hours=1),
+            AFTER + datetime.timedelta(hours=1, minutes=30),
+        ]
@@ -0,0 +1,273 @@
+import datetime
+import random
+from zoneinfo import ZoneInfo
+
+import pytest
+from bitarray import bitarray, frozenbitarray
+
+from app.services.free_spot import (
+    CountingFreeSpotFinder,
+    FreeSpotFinder,
+    IntervalFreeSpotFinder,
+    LazyFreeSpotFinder,
+)
+
+AFTER = datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC"))
+
+
+class SingleOccurrenceEvent:
+    def __init__(self, start: datetime.datetime, duration_minutes: int):
+        self.start = start
+        self.duration_minutes = duration_minutes
+
+    def generate_for_timeperiod(self, after, before):
+        yield self.start
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_interval_finder_matches_bitarray_finder(seed):
+    rnd = random.Random(seed)
+    before = AFTER + datetime.timedelta(minutes=rnd.randint(60, 24 * 60))
+    duration = rnd.randint(1, 60)
+    occurrences = [
+        (
+            AFTER + datetime.timedelta(minutes=rnd.randint(-120, 24 * 60)),
+            rnd.randint(1, 120),
+        )
+        for _ in range(rnd.randint(0, 50))
+    ]
+
+    results = []
+    for finder_class in (FreeSpotFinder, IntervalFreeSpotFinder):
+        finder = finder_class(AFTER, before, duration)
+        finder.init_occupancy()
+        for start, duration_minutes in occurrences:
+            # `generate_for_timeperiod` yields only occurrences ending after `after`
+            if start + datetime.timedelta(minutes=duration_minutes) >= AFTER:
+                finder.add_occurrence(start, duration_minutes)
+        results.append(finder.find_spot_in_occupancy())
+
+    assert results[0] == results[1]
+
+
+@pytest.mark.parametrize(
+    "finder_class", [FreeSpotFinder, IntervalFreeSpotFinder, CountingFreeSpotFinder]
+)
+def test_granularity_aligns_spot_to_grid(finder_class):
+    finder = finder_class(
+        AFTER + datetime.timedelta(minutes=7),
+        AFTER + datetime.timedelta(hours=2),
+        duration=20,
+        granularity=15,
+    )
+    # occupies 00:15-00:30 slot partially
+    event = SingleOccurrenceEvent(AFTER + datetime.timedelta(minutes=7), 10)
+
+    assert finder.find_many([event], max_results=2) == [
+        AFTER + datetime.timedelta(minutes=30),
+        AFTER + datetime.timedelta(minutes=60),
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("finder_class", [FreeSpotFinder, IntervalFreeSpotFinder])
+def test_granularity_spot_is_free(finder_class, seed):
+    rnd = random.Random(seed)
+    after = AFTER + datetime.timedelta(minutes=rnd.randint(0, 59))
+    before = after + datetime.timedelta(minutes=rnd.randint(120, 24 * 60))
+    duration = rnd.randint(1, 60)
+    granularity = rnd.choice([5, 15, 30])
+    occurrences = [
+        (
+            after + datetime.timedelta(minutes=rnd.randint(0, 24 * 60)),
+            rnd.randint(1, 90),
+        )
+        for _ in range(rnd.randint(0, 20))
+    ]
+
+    finder = finder_class(after, before, duration, granularity)
+    finder.init_occupancy()
+    for start, duration_minutes in occurrences:
+        finder.add_occurrence(start, duration_minutes)
+    spot = finder.find_spot_in_occupancy()
+    if spot is None:
+        return
+
+    spot_start = finder.origin + datetime.timedelta(minutes=spot * granularity)
+    spot_end = spot_start + datetime.timedelta(minutes=duration)
+    assert int(spot_start.timestamp()) // 60 % granularity == 0
+    assert after <= spot_start and spot_end <= before
+    for start, duration_minutes in occurrences:
+        end = start + datetime.timedelta(minutes=duration_minutes)
+        assert end <= spot_start or spot_end <= start
+
+
+class RepeatingEvent:
+    """Event occurring every `period` minutes, counts generated occurrences."""
+
+    def __init__(self, start: datetime.datetime, duration_minutes: int, period: int):
+        self.start = start
+        self.duration_minutes = duration_minutes
+        self.period = period
+        self.generated = 0
+
+    def generate_for_timeperiod(self, after, before):
+        start = self.start
+        while start <= before:
+            if start + datetime.timedelta(minutes=self.duration_minutes) >= after:
+                self.generated += 1
+                yield start
+            start += datetime.timedelta(minutes=self.period)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_lazy_finder_matches_bitarray_finder(seed):
+    rnd = random.Random(seed)
+    after = AFTER + datetime.timedelta(minutes=rnd.randint(0, 59))
+    before = after + datetime.timedelta(minutes=rnd.randint(60, 3 * 24 * 60))
+    params = dict(duration=rnd.randint(1, 120), granularity=rnd.choice([1, 1, 5, 15]))
+    events = [
+        RepeatingEvent(
+            AFTER + datetime.timedelta(minutes=rnd.randint(-120, 24 * 60)),
+            rnd.randint(1, 180),
+            rnd.randint(200, 24 * 60),
+        )
+        for _ in range(rnd.randint(0, 10))
+    ]
+    search = dict(max_results=rnd.randint(1, 5), min_gap_minutes=rnd.randint(0, 30))
+
+    expected = FreeSpotFinder(after, before, **params).find_many(events, **search)
+    lazy_finder = LazyFreeSpotFinder(
+        after, before, **params, chunk_minutes=rnd.randint(1, 300)
+    )
+
+    assert lazy_finder.find_many(events, **search) == expected
+
+
+def test_lazy_finder_stops_early():
+    event = RepeatingEvent(AFTER, duration_minutes=30, period=60)
+    finder = LazyFreeSpotFinder(
+        AFTER, AFTER + datetime.timedelta(days=90), 30, chunk_minutes=24 * 60
+    )
+
+    assert finder.find_many([event]) == [AFTER + datetime.timedelta(minutes=30)]
+    assert event.generated <= 25
+
+
+@pytest.mark.parametrize(
+    "finder_factory",
+    [
+        FreeSpotFinder,
+        IntervalFreeSpotFinder,
+        lambda *args: LazyFreeSpotFinder(*args, chunk_minutes=25),
+        CountingFreeSpotFinder,
+    ],
+)
+def test_restrict(finder_factory):
+    finder = finder_factory(AFTER, AFTER + datetime.timedelta(hours=2), 30)
+    allowed = bitarray(finder.length)
+    allowed.setall(0)
+    allowed[10:80] = 1
+    finder.restrict(frozenbitarray(allowed))
+    # spots are only allowed in 00:10-01:20
+    event = SingleOccurrenceEvent(AFTER + datetime.timedelta(minutes=20), 20)
+
+    assert finder.find_many([event], max_results=2) == [
+        AFTER + datetime.timedelta(minutes=40)
+    ]
+
+
+def make_user_intervals(rnd, before, users):
+    return {
+        user_id: [
+            (start, start + datetime.timedelta(minutes=rnd.randint(1, 120)))
+            for start in (
+                AFTER + datetime.timedelta(minutes=rnd.randint(-60, 8 * 60))
+                for _ in range(rnd.randint(0, 6))
+            )
+        ]
+        for user_id in range(users)
+    }
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_counting_finder_matches_bitarray_finder_for_all_users(seed):
+    rnd = random.Random(seed)
+    before = AFTER + datetime.timedelta(hours=8)
+    duration, granularity = rnd.randint(1, 90), rnd.choice([1, 5, 15])
+    intervals = make_user_intervals(rnd, before, rnd.randint(1, 5))
+
+    finder = FreeSpotFinder(AFTER, before, duration, granularity)
+    finder.init_occupancy()
+    for user_intervals in intervals.values():
+        finder.add_busy_intervals(user_intervals)
+
+    counting_finder = CountingFreeSpotFinder(
+        AFTER,
+        before,
+        duration,
+        granularity,
+        user_ids=intervals,
+        required_user_ids=intervals,
+    )
+    counting_finder.init_occupancy()
+    for user_id, user_intervals in intervals.items():
+        counting_finder.add_user_busy_intervals(user_id, user_intervals)
+
+    assert counting_finder.search_spots(5, 10) == finder.search_spots(5, 10)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_counting_finder_quorum(seed):
+    rnd = random.Random(seed)
+    before = AFTER + datetime.timedelta(hours=8)
+    duration, granularity = rnd.randint(1, 90), rnd.choice([1, 15])
+    intervals = make_user_intervals(rnd, before, 6)
+    required = set(rnd.sample(sorted(intervals), rnd.randint(0, 2)))
+    min_available = rnd.randint(1, 6)
+
+    finder = CountingFreeSpotFinder(
+        AFTER, before, duration, granularity, intervals, required, min_available
+    )
+    finder.init_occupancy()
+    for user_id, user_intervals in intervals.items():
+        finder.add_user_busy_intervals(user_id, user_intervals)
+
+    def is_free(user_id, spot):
+        spot_end = spot + datetime.timedelta(
+            minutes=finder.duration_slots * granularity
+        )
+        return all(
+            end <= spot or start >= spot_end for start, end in intervals[user_id]
+        )
+
+    expected = None
+    for slot in range(finder.length - finder.duration_slots + 1):
+        spot = finder.origin + datetime.timedelta(minutes=slot * granularity)
+        free = {user_id for user_id in intervals if is_free(user_id, spot)}
+        if required <= free and len(free) >= min_available:
+            expected = spot
+            break
+
+    assert finder.search_spots() == ([expected] if expected else [])
+
+
+def test_counting_finder_heatmap():
+    def interval(start, end):
+        return (
+            AFTER + datetime.timedelta(minutes=start),
+            AFTER + datetime.timedelta(minutes=end),
+        )
+
+    finder = CountingFreeSpotFinder(
+        AFTER, AFTER + datetime.timedelta(hours=2), 1, 30, user_ids=["a", "b"]
+    )
+    finder.init_occupancy()
+    finder.add_user_busy_intervals("a", [interval(20, 40)])
+    finder.add_user_busy_intervals("b", [interval(30, 45)])
+    finder.add_user_disallowed("b", frozenbitarray("1110"))
+
+    available, required_available = finder.count_available(1)
+
+    assert available.tolist() == [1, 0, 2, 1]
+    assert required_available.all()
@@ -0,0 +1,76 @@
+import datetime
+import random
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+from app.schemas.recurrence import RecurrenceSchema
+from app.services.executor import CompactEvent
+from app.services.free_spot import FREE_SPOT_FINDERS
+from app.services.occurrence_batch import EventColumns, expand_events
+from tests.schemas.test_recurrence_rules import make_random_schema
+
+AFTER = datetime.datetime(2022, 3, 1, 0, 0, tzinfo=datetime.timezone.utc)
+TIMEZONES = [
+    datetime.timezone.utc,
+    datetime.timezone(datetime.timedelta(hours=3)),
+    ZoneInfo("Europe/Berlin"),
+]
+
+
+def make_random_events(rnd, n):
+    events = []
+    for _ in range(n):
+        start = datetime.datetime(
+            2022, rnd.randint(1, 4), rnd.randint(1, 28), rnd.randint(0, 23), 0
+        ).replace(tzinfo=rnd.choice(TIMEZONES))
+        recurrence = None
+        if rnd.random() < 0.7:
+            recurrence = RecurrenceSchema(description=make_random_schema(rnd, start))
+        events.append(CompactEvent(start, rnd.randint(1, 180), recurrence))
+    return events
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_expand_events_matches_generate(seed):
+    rnd = random.Random(seed)
+    events = make_random_events(rnd, rnd.randint(0, 20))
+    after = AFTER + datetime.timedelta(minutes=rnd.randint(0, 24 * 60))
+    before = after + datetime.timedelta(minutes=rnd.randint(60, 30 * 24 * 60))
+
+    starts, durations = expand_events(
+        EventColumns.from_events(events), after, before, AFTER
+    )
+
+    expected = sorted(
+        (int((start - AFTER).total_seconds()) // 60, event.duration_minutes)
+        for event in events
+        for start in event.generate_for_timeperiod(after, before)
+    )
+    assert sorted(zip(starts.tolist(), durations.tolist())) == expected
+
+
+def test_expand_events_empty():
+    starts, durations = expand_events(
+        EventColumns.from_events([]), AFTER, AFTER + datetime.timedelta(days=1), AFTER
+    )
+    assert starts.dtype == np.int64 and len(starts) == len(durations) == 0
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("strategy", sorted(FREE_SPOT_FINDERS))
+def test_find_many_columns_matches_find_many(strategy, seed):
+    rnd = random.Random(seed)
+    events = make_random_events(rnd, rnd.randint(0, 20))
+    before = AFTER + datetime.timedelta(minutes=rnd.randint(60, 7 * 24 * 60))
+    params = dict(duration=rnd.randint(1, 120), granularity=rnd.choice([1, 5, 15]))
+    search = dict(max_results=rnd.randint(1, 5), min_gap_minutes=rnd.randint(0, 30))
+
+    finder_class = FREE_SPOT_FINDERS[strategy]
+    expected = finder_class(AFTER, before, **params).find_many(events, **search)
+    finder = finder_class(AFTER, before, **params)
+
+    assert finder.find_many_columns(EventColumns.from_events(events), **search) == (
+        expected
+    )
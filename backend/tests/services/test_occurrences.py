@@ -0,0 +1,188 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.deps.db import get_async_session
+from app.models import Event, EventOccurrence
+from app.schemas.recurrence import RecurrenceSchema, Weekdays
+from app.services import occurrences
+from app.services.event import EventService
+from tests.factories import (
+    DailyRecurrenceSchemaFactory,
+    EventFactory,
+    WeeklyRecurrenceSchemaFactory,
+)
+
+START = datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC"))
+
+
+@pytest.fixture
+def run_in_session(async_loop):
+    def run(func, *args):
+        async def run_func():
+            async for session in get_async_session():
+                return await func(session, *args)
+
+        return async_loop.run_until_complete(run_func())
+
+    return run
+
+
+async def get_starts(session, event_id):
+    return (
+        await session.scalars(
+            select(EventOccurrence.start)
+            .filter(EventOccurrence.event_id == event_id)
+            .order_by(EventOccurrence.start)
+        )
+    ).all()
+
+
+@pytest.fixture
+def enable_materialization(monkeypatch):
+    monkeypatch.setattr(settings, "OCCURRENCE_HORIZON_DAYS", 180)
+
+
+@pytest.fixture
+def daily_event(user):
+    return EventFactory(
+        owner=user,
+        start=START,
+        duration_minutes=60,
+        recurrence=RecurrenceSchema(description=DailyRecurrenceSchemaFactory()),
+    )
+
+
+def test_write_and_extend(run_in_session, daily_event):
+    async def write(session, until):
+        event = await session.get(Event, daily_event.id)
+        await occurrences.write_occurrences(session, event, until)
+        await session.commit()
+        return await get_starts(session, event.id)
+
+    starts = run_in_session(write, START + datetime.timedelta(days=2))
+    assert starts == [START + datetime.timedelta(days=i) for i in range(3)]
+
+    starts = run_in_session(write, START + datetime.timedelta(days=4, hours=1))
+    assert starts == [START + datetime.timedelta(days=i) for i in range(5)]
+
+
+def test_change_rewrites_occurrences(run_in_session, daily_event):
+    async def change(session):
+        event = await session.get(Event, daily_event.id)
+        await occurrences.write_occurrences(
+            session, event, START + datetime.timedelta(days=14)
+        )
+        await session.commit()
+
+        event.recurrence = RecurrenceSchema(
+            description=WeeklyRecurrenceSchemaFactory(weekdays={Weekdays.sat})
+        )
+        assert event.occurrences_until is None
+        await session.commit()
+
+        await occurrences.extend_occurrences(
+            session, START + datetime.timedelta(days=14)
+        )
+        return await get_starts(session, event.id)
+
+    assert run_in_session(change) == [
+        START,
+        START + datetime.timedelta(days=7),
+        START + datetime.timedelta(days=14),
+    ]
+
+
+def test_extend_occurrences(run_in_session, user, event, daily_event):
+    horizon = START + datetime.timedelta(days=10)
+
+    async def extend(session):
+        await occurrences.extend_occurrences(session, horizon)
+        # nothing to do on the next run
+        assert await occurrences.extend_occurrences(session, horizon) == 0
+
+        return {
+            event_id: (until, count)
+            for event_id, until, count in await session.execute(
+                select(Event.id, Event.occurrences_until, func.count())
+                .join(EventOccurrence)
+                .filter(Event.owner_id == user.id)
+                .group_by(Event.id)
+            )
+        }
+
+    assert run_in_session(extend) == {
+        event.id: (horizon, 1),
+        daily_event.id: (horizon, 11),
+    }
+
+
+def test_extend_reaches_event_past_horizon(run_in_session, user):
+    event = EventFactory(owner=user, start=START + datetime.timedelta(days=20))
+
+    async def extend(session, horizon):
+        await occurrences.extend_occurrences(session, horizon)
+        return await get_starts(session, event.id)
+
+    assert run_in_session(extend, START + datetime.timedelta(days=10)) == []
+    assert run_in_session(extend, START + datetime.timedelta(days=30)) == [
+        START + datetime.timedelta(days=20)
+    ]
+
+
+def test_extend_skips_locked_events(db, run_in_session, daily_event):
+    horizon = START + datetime.timedelta(days=10)
+    # maintenance task of another worker holds the event
+    db.execute(select(Event).filter(Event.id == daily_event.id).with_for_update())
+
+    async def extend(session):
+        await occurrences.extend_occurrences(session, horizon)
+        return await get_starts(session, daily_event.id)
+
+    assert run_in_session(extend) == []
+
+    db.rollback()
+    assert len(run_in_session(extend)) == 11
+
+
+class TestMaterializedReads:
+    @pytest.fixture
+    def materialize(self, run_in_session, enable_materialization, daily_event):
+        async def extend(session, horizon):
+            await occurrences.extend_occurrences(session, horizon)
+
+        # window inside horizon is read from table, outside is expanded
+        run_in_session(extend, START + datetime.timedelta(days=3))
+
+    def test_find_event_spots(self, async_loop, user, materialize):
+        def find(after):
+            return async_loop.run_until_complete(
+                EventService().find_event_spots(
+                    {user.id},
+                    after,
+                    after + datetime.timedelta(hours=4),
+                    duration_minutes=60,
+                    max_results=2,
+                )
+            )
+
+        for after in [START, START + datetime.timedelta(days=5)]:
+            assert find(after) == [
+                after + datetime.timedelta(hours=1),
+                after + datetime.timedelta(hours=2),
+            ]
+
+    def test_list_events(self, async_loop, user, daily_event, materialize):
+        def list_starts(before):
+            events = async_loop.run_until_complete(
+                EventService().list_events_for_user(user.id, START, before, 0)
+            )
+            return [e.occurrences for e in events if e.id == daily_event.id][0]
+
+        for days in [2, 5]:
+            assert list_starts(START + datetime.timedelta(days=days)) == [
+                START + datetime.timedelta(days=i) for i in range(days + 1)
+            ]
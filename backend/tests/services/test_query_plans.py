@@ -0,0 +1,114 @@
+import datetime
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm.session import Session
+
+from app.models import Event, EventInvite
+from app.services.event import EventService
+
+USERS = 1000
+EVENTS_PER_USER = 50
+INVITES_PER_EVENT = 2
+
+
+def explain(db: Session, query) -> str:
+    """Return plan of `query` as chosen by Postgres."""
+    compiled = query.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"render_postcompile": True}
+    )
+    rows = db.connection().exec_driver_sql(f"EXPLAIN {compiled}", compiled.params)
+    return "\n".join(row[0] for row in rows)
+
+
+class TestVisibilityIndexes:
+    @pytest.fixture
+    def user_ids(self, db: Session):
+        """Seed users with events spread over two years, half of invites accepted."""
+        db.execute(
+            text(
+                "INSERT INTO users (id, email, hashed_password, is_active, "
+                "is_superuser, is_verified) "
+                "SELECT gen_random_uuid(), 'user' || i || '@example.com', '', "
+                "true, false, true FROM generate_series(1, :users) i"
+            ),
+            {"users": USERS},
+        )
+        db.execute(
+            text(
+                "INSERT INTO event (owner_id, name, start, duration_minutes) "
+                "SELECT id, 'event', "
+                "'2022-01-01'::timestamptz + random() * interval '730 days', 60 "
+                "FROM users, generate_series(1, :events)"
+            ),
+            {"events": EVENTS_PER_USER},
+        )
+        db.execute(
+            text(
+                "INSERT INTO event_invite (event_id, user_id, is_accepted) "
+                "SELECT DISTINCT ON (event.id, user_id) event.id, "
+                "ids[1 + floor(random() * :users)::int] AS user_id, random() < 0.5 "
+                "FROM event, generate_series(1, :invites), "
+                "(SELECT array_agg(id) AS ids FROM users) users"
+            ),
+            {"users": USERS, "invites": INVITES_PER_EVENT},
+        )
+        db.execute(text("ANALYZE users, event, event_invite"))
+        user_ids = db.execute(select(text("id::text")).select_from(text("users")))
+        yield [row[0] for row in user_ids.fetchmany(3)]
+        db.rollback()
+
+    def test_owner_events_use_owner_start_index(self, db: Session, user_ids):
+        plan = explain(
+            db,
+            select(Event).filter(
+                Event.owner_id.in_(user_ids),
+                Event.start
+                <= datetime.datetime(2022, 2, 1, tzinfo=datetime.timezone.utc),
+            ),
+        )
+
+        assert "ix_event_owner_id_start" in plan
+
+    def test_accepted_invites_use_partial_index(self, db: Session, user_ids):
+        plan = explain(
+            db,
+            select(EventInvite.event_id).filter(
+                EventInvite.user_id.in_(user_ids), EventInvite.is_accepted == True
+            ),
+        )
+
+        assert "ix_event_invite_user_id_event_id_accepted" in plan
+
+    def test_visibility_query_uses_indexes(self, db: Session, user_ids):
+        plan = explain(
+            db,
+            EventService().get_event_query_for_user_ids(
+                user_ids,
+                datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc),
+                datetime.datetime(2022, 2, 1, tzinfo=datetime.timezone.utc),
+            ),
+        )
+
+        assert "ix_event_owner_id_start" in plan
+        assert "ix_event_invite_user_id_event_id_accepted" in plan
+        assert "Seq Scan" not in plan
+
+    def test_events_page_uses_indexes(self, db: Session, user_ids):
+        plan = explain(
+            db,
+            EventService()
+            .get_event_query_for_user_ids(
+                user_ids[:1],
+                datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc),
+                datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+            )
+            .filter(Event.id > 0)
+            .order_by(Event.id)
+            .limit(100),
+        )
+
+        assert "ix_event_owner_id_start" in plan
+        assert "ix_event_invite_user_id_event_id_accepted" in plan
+        assert "Seq Scan" not in plan
@@ -0,0 +1,46 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+from app.schemas.recurrence import RecurrenceSchema
+from app.services.rrule_cache import RRuleCache
+from tests.factories import DailyRecurrenceSchemaFactory, WeeklyRecurrenceSchemaFactory
+
+START = datetime.datetime(2022, 1, 1, 0, 0, tzinfo=ZoneInfo("UTC"))
+
+DAILY = RecurrenceSchema(description=DailyRecurrenceSchemaFactory())
+WEEKLY = RecurrenceSchema(description=WeeklyRecurrenceSchemaFactory())
+
+
+def test_hits_and_misses():
+    cache = RRuleCache(max_entries=10)
+
+    rule = cache.get_rule(DAILY, START)
+    # equal recurrences of different events share rule
+    assert cache.get_rule(DAILY.copy(deep=True), START) is rule
+    assert cache.get_rule(DAILY, START + datetime.timedelta(hours=1)) is not rule
+
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert list(rule.xafter(START, count=2, inc=True)) == [
+        START,
+        START + datetime.timedelta(days=1),
+    ]
+
+
+def test_lru_eviction():
+    cache = RRuleCache(max_entries=2)
+
+    daily_rule = cache.get_rule(DAILY, START)
+    cache.get_rule(WEEKLY, START)
+    cache.get_rule(DAILY, START)
+    cache.get_rule(WEEKLY, START + datetime.timedelta(days=1))
+
+    assert cache.get_rule(DAILY, START) is daily_rule
+    cache.get_rule(WEEKLY, START)
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_disabled():
+    cache = RRuleCache(max_entries=0)
+
+    assert cache.get_rule(DAILY, START) is not cache.get_rule(DAILY, START)
+    assert (cache.hits, cache.misses) == (0, 0)
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+from bitarray import bitarray
+
+from app.services.spot_search import SEARCH_BACKENDS, search_loop
+
+
+@pytest.fixture(params=sorted(SEARCH_BACKENDS))
+def search(request):
+    return SEARCH_BACKENDS[request.param]
+
+
+@pytest.mark.parametrize(
+    "bits, length, start, expected",
+    [
+        ("", 1, 0, None),
+        ("0", 1, 0, 0),
+        ("1", 1, 0, None),
+        ("0000", 4, 0, 0),
+        ("0000", 5, 0, None),
+        ("1001000", 3, 0, 4),
+        ("1001000", 2, 0, 1),
+        ("1001000", 2, 2, 4),
+        ("0110", 1, 1, 3),
+        ("11111110", 1, 0, 7),
+    ],
+)
+def test_search(search, bits, length, start, expected):
+    assert search(bitarray(bits), length, start) == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_search_matches_reference(search, seed):
+    rnd = random.Random(seed)
+    bits = bitarray(rnd.choice((0, 0, 0, 1)) for _ in range(rnd.randint(1, 500)))
+    length = rnd.randint(1, 10)
+    start = rnd.randint(0, len(bits))
+
+    assert search(bits, length, start) == search_loop(bits, length, start)
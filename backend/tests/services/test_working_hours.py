@@ -0,0 +1,89 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from bitarray import bitarray
+
+from app.schemas.free_spot import WorkingHoursSchema
+from app.services.working_hours import get_allowed_mask, get_day_mask
+
+BERLIN_HOURS = WorkingHoursSchema(
+    timezone="Europe/Berlin", start=datetime.time(9), end=datetime.time(17)
+)
+
+
+def get_set_ranges(bits):
+    ranges = []
+    for i, bit in enumerate(bits):
+        if not bit:
+            continue
+        if ranges and ranges[-1][1] == i:
+            ranges[-1][1] = i + 1
+        else:
+            ranges.append([i, i + 1])
+    return [tuple(r) for r in ranges]
+
+
+@pytest.mark.parametrize(
+    "working_hours, day, expected",
+    [
+        # monday, UTC+1
+        (BERLIN_HOURS, datetime.date(2022, 1, 3), [(8 * 60, 16 * 60)]),
+        # saturday
+        (BERLIN_HOURS, datetime.date(2022, 1, 1), []),
+        # friday before and monday after switch to summer time
+        (BERLIN_HOURS, datetime.date(2022, 3, 25), [(8 * 60, 16 * 60)]),
+        (BERLIN_HOURS, datetime.date(2022, 3, 28), [(7 * 60, 15 * 60)]),
+        # UTC+13, local monday starts on UTC sunday
+        (
+            WorkingHoursSchema(
+                timezone="Pacific/Auckland",
+                start=datetime.time(9),
+                end=datetime.time(17),
+            ),
+            datetime.date(2022, 1, 2),
+            [(20 * 60, 24 * 60)],
+        ),
+        (
+            WorkingHoursSchema(
+                timezone="Pacific/Auckland",
+                start=datetime.time(9),
+                end=datetime.time(17, 30),
+            ),
+            datetime.date(2022, 1, 7),
+            [(0, 4 * 60 + 30)],
+        ),
+        # partially covered minutes are not working
+        (
+            WorkingHoursSchema(
+                timezone="UTC",
+                start=datetime.time(9, 0, 30),
+                end=datetime.time(9, 3, 30),
+                weekdays={"sat"},
+            ),
+            datetime.date(2022, 1, 1),
+            [(9 * 60 + 1, 9 * 60 + 3)],
+        ),
+    ],
+)
+def test_day_mask(working_hours, day, expected):
+    mask = get_day_mask(working_hours, day)
+
+    assert len(mask) == 24 * 60
+    assert get_set_ranges(mask) == expected
+
+
+def test_allowed_mask_crosses_days():
+    # monday 15:00 - tuesday 09:00 UTC
+    origin = datetime.datetime(2022, 1, 3, 15, tzinfo=ZoneInfo("UTC"))
+    mask = get_allowed_mask(BERLIN_HOURS, origin, 18 * 60, 1)
+
+    assert get_set_ranges(mask) == [(0, 60), (17 * 60, 18 * 60)]
+
+
+def test_allowed_mask_granularity():
+    # slots start at 07:30, 07:50, 08:10, 08:30, working hours start at 08:00 UTC
+    origin = datetime.datetime(2022, 1, 3, 7, 30, tzinfo=ZoneInfo("UTC"))
+    mask = get_allowed_mask(BERLIN_HOURS, origin, 4, 20)
+
+    assert mask == bitarray("0011")